@@ -0,0 +1,286 @@
+"""Ridership analytics kept up to date as bookings happen.
+
+Every booking, cancellation and capacity change adjusts a few counters, so
+the admin dashboard reads load factors, recent booking rates and the busiest
+origin towns without scanning the booking list:
+
+- load factor per route: seats sold over seats offered on the departures
+  that carried at least one passenger, at the route's current capacity;
+- bookings per hour (last 24 hours) and per day (last 30 days), by the time
+  the booking was made, kept in fixed-size rings;
+- origin towns ranked by bookings, kept sorted as counts change by one.
+"""
+import threading
+from collections import Counter
+from datetime import date as Date, datetime
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from route_model import route_endpoints
+
+
+class RollingCounts:
+    """Counts for the last ``slots`` periods (hours, days) in a ring buffer"""
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self.counts = [0] * slots
+        self.latest: Optional[int] = None
+
+    def _advance(self, period: int):
+        if self.latest is None:
+            self.latest = period
+            return
+        # Clear the slots of the periods skipped since the last one seen
+        for skipped in range(self.latest + 1, min(period, self.latest + self.slots) + 1):
+            self.counts[skipped % self.slots] = 0
+        self.latest = max(self.latest, period)
+
+    def add(self, period: int, delta: int = 1):
+        self._advance(period)
+        if period > self.latest - self.slots:
+            self.counts[period % self.slots] += delta
+
+    def series(self, now: int) -> List[int]:
+        """Counts of the periods ending with ``now``, oldest first"""
+        self._advance(now)
+        return [self.counts[p % self.slots] for p in range(now - self.slots + 1, now + 1)]
+
+    def clear(self):
+        self.counts = [0] * self.slots
+        self.latest = None
+
+    def state(self) -> tuple:
+        return self.slots, list(self.counts), self.latest
+
+    def load_state(self, state: tuple) -> bool:
+        slots, counts, latest = state
+        if slots != self.slots:
+            return False
+        self.counts, self.latest = list(counts), latest
+        return True
+
+
+class RankedCounter:
+    """Counter whose keys stay sorted by count under +1/-1 updates
+
+    Keys with equal counts form a contiguous block, so an increment swaps the
+    key with the first of its block (a decrement with the last) and moves
+    the block boundary: O(1) per update, O(n) for the top n.
+    """
+
+    def __init__(self):
+        self.items: List[Hashable] = []
+        self.count: Dict[Hashable, int] = {}
+        self._pos: Dict[Hashable, int] = {}
+        self._first: Dict[int, int] = {}
+        self._last: Dict[int, int] = {}
+
+    def _swap(self, i: int, j: int):
+        a, b = self.items[i], self.items[j]
+        self.items[i], self.items[j] = b, a
+        self._pos[a], self._pos[b] = j, i
+
+    def increment(self, key: Hashable):
+        if key not in self._pos:
+            # Zero is the lowest count, so new keys go at the end
+            self._pos[key] = len(self.items)
+            self.items.append(key)
+            self.count[key] = 0
+            self._first.setdefault(0, self._pos[key])
+            self._last[0] = self._pos[key]
+        c = self.count[key]
+        j = self._first[c]
+        self._swap(self._pos[key], j)
+        if self._last[c] == j:
+            del self._first[c], self._last[c]
+        else:
+            self._first[c] = j + 1
+        self.count[key] = c + 1
+        if c + 1 in self._first:
+            self._last[c + 1] = j
+        else:
+            self._first[c + 1] = self._last[c + 1] = j
+
+    def decrement(self, key: Hashable):
+        c = self.count.get(key, 0)
+        if c == 0:
+            return
+        j = self._last[c]
+        self._swap(self._pos[key], j)
+        if self._first[c] == j:
+            del self._first[c], self._last[c]
+        else:
+            self._last[c] = j - 1
+        self.count[key] = c - 1
+        if c - 1 in self._first:
+            self._first[c - 1] = j
+        else:
+            self._first[c - 1] = self._last[c - 1] = j
+
+    def load(self, counts: Dict[Hashable, int]):
+        """Replace every count at once, sorting once instead of stepping"""
+        self.clear()
+        self.items = sorted(counts, key=counts.get, reverse=True)
+        for i, key in enumerate(self.items):
+            c = self.count[key] = counts[key]
+            self._pos[key] = i
+            self._first.setdefault(c, i)
+            self._last[c] = i
+
+    def top(self, n: int) -> List[Tuple[Hashable, int]]:
+        return [(key, self.count[key]) for key in self.items[:n] if self.count[key]]
+
+    def clear(self):
+        self.__init__()
+
+
+def _hour_and_day(booked_at: str) -> Tuple[int, int]:
+    """Hour and day numbers of a "YYYY-MM-DDTHH[:MM:SS]" timestamp"""
+    day = Date.fromisoformat(booked_at[:10]).toordinal()
+    return day * 24 + int(booked_at[11:13]), day
+
+
+class RidershipStats:
+    """Incrementally maintained booking statistics; every read is O(1) in bookings"""
+
+    def __init__(self, routes: Dict[int, Dict], hours: int = 24, days: int = 30,
+                 now: Callable[[], datetime] = datetime.now):
+        self.routes = routes
+        self._now = now
+        self.capacity: Dict[int, int] = {}
+        self.sold: Dict[int, int] = {}
+        self.departures: Dict[int, int] = {}
+        self._departure_sold: Dict[Tuple[int, str], int] = {}
+        self.per_hour = RollingCounts(hours)
+        self.per_day = RollingCounts(days)
+        self.origins = RankedCounter()
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def _count(self, booking: Dict, delta: int):
+        route_id = booking['route_id']
+        departure = (route_id, booking['date'])
+        before = self._departure_sold.get(departure, 0)
+        if before + delta:
+            self._departure_sold[departure] = before + delta
+        else:
+            del self._departure_sold[departure]
+        # A departure counts as run while anyone is booked on it
+        if not before or not before + delta:
+            self.departures[route_id] = self.departures.get(route_id, 0) + delta
+        self.sold[route_id] = self.sold.get(route_id, 0) + delta
+        self.total += delta
+
+        if booking.get('booked_at'):
+            hour, day = _hour_and_day(booking['booked_at'])
+            self.per_hour.add(hour, delta)
+            self.per_day.add(day, delta)
+        if route_id in self.routes:
+            origin = route_endpoints(self.routes[route_id])[0]
+            if delta > 0:
+                self.origins.increment(origin)
+            else:
+                self.origins.decrement(origin)
+
+    def record(self, booking: Dict):
+        with self._lock:
+            self._count(booking, 1)
+
+    def remove(self, booking: Dict):
+        """Take back a cancelled booking"""
+        with self._lock:
+            self._count(booking, -1)
+
+    def set_capacity(self, route_id: int, seats: int):
+        with self._lock:
+            self.capacity[route_id] = seats
+
+    def rebuild(self, bookings: Iterable[Dict], capacities: Dict[int, int]):
+        """Recount everything from a booking list, aggregating in bulk"""
+        bookings = list(bookings)
+        departure_sold = Counter((b['route_id'], b['date']) for b in bookings)
+        # Bucket by "YYYY-MM-DDTHH" first so each distinct hour is parsed once
+        stamps = Counter(b['booked_at'][:13] for b in bookings if b.get('booked_at'))
+        hours: Dict[int, int] = Counter()
+        for stamp, count in stamps.items():
+            hours[_hour_and_day(stamp)[0]] += count
+        self.load_counts(departure_sold, hours, capacities)
+
+    def load_counts(self, departure_sold: Dict[Tuple[int, str], int], hours: Dict[int, int],
+                    capacities: Dict[int, int]):
+        """Recount everything from bookings per (route_id, date) and per hour
+        they were made in (day ordinal * 24 + hour)"""
+        with self._lock:
+            self.capacity = dict(capacities)
+            self.sold.clear()
+            self.departures.clear()
+            self._departure_sold = dict(departure_sold)
+            for (route_id, _), count in departure_sold.items():
+                self.sold[route_id] = self.sold.get(route_id, 0) + count
+                self.departures[route_id] = self.departures.get(route_id, 0) + 1
+            self.total = sum(departure_sold.values())
+
+            self.per_hour.clear()
+            self.per_day.clear()
+            for hour, count in sorted(hours.items()):
+                self.per_hour.add(hour, count)
+                self.per_day.add(hour // 24, count)
+            self._load_origins()
+
+    def _load_origins(self):
+        origins: Dict[str, int] = {}
+        for route_id, count in self.sold.items():
+            if route_id in self.routes:
+                origin = route_endpoints(self.routes[route_id])[0]
+                origins[origin] = origins.get(origin, 0) + count
+        self.origins.load(origins)
+
+    # Snapshots
+
+    def state(self) -> tuple:
+        """Every counter, for marshal; origins follow from the counts per route"""
+        with self._lock:
+            return (dict(self.capacity), dict(self.sold), dict(self.departures),
+                    dict(self._departure_sold), self.per_hour.state(), self.per_day.state(),
+                    self.total)
+
+    def load_state(self, state: tuple) -> bool:
+        """Restore a state(); False (and nothing changed) if the ring sizes differ"""
+        capacity, sold, departures, departure_sold, per_hour, per_day, total = state
+        if per_hour[0] != self.per_hour.slots or per_day[0] != self.per_day.slots:
+            return False
+        with self._lock:
+            self.capacity = dict(capacity)
+            self.sold = dict(sold)
+            self.departures = dict(departures)
+            self._departure_sold = dict(departure_sold)
+            self.per_hour.load_state(per_hour)
+            self.per_day.load_state(per_day)
+            self.total = total
+            self._load_origins()
+        return True
+
+    # Reads
+
+    def load_factor(self, route_id: int) -> float:
+        offered = self.capacity.get(route_id, 0) * self.departures.get(route_id, 0)
+        return self.sold.get(route_id, 0) / offered if offered else 0.0
+
+    def busiest_routes(self, n: int = 5) -> List[Tuple[int, float]]:
+        """Routes with the highest load factor (a sort over routes, not bookings)"""
+        with self._lock:
+            factors = [(route_id, self.load_factor(route_id)) for route_id in self.departures]
+        return sorted(factors, key=lambda item: item[1], reverse=True)[:n]
+
+    def bookings_per_hour(self) -> List[int]:
+        now = self._now()
+        with self._lock:
+            return self.per_hour.series(now.toordinal() * 24 + now.hour)
+
+    def bookings_per_day(self) -> List[int]:
+        with self._lock:
+            return self.per_day.series(self._now().toordinal())
+
+    def top_origins(self, n: int = 5) -> List[Tuple[str, int]]:
+        with self._lock:
+            return self.origins.top(n)
@@ -0,0 +1,326 @@
+"""Headless HTTP/JSON API over the booking engine, for phones and kiosks.
+
+A small HTTP/1.1 server on asyncio streams (stdlib only) with keep-alive
+connections. It works on the same BookingEngine and AuthService as the Tk
+window: ``transconnect.main()`` starts it in a background thread when
+TRANSCONNECT_API_PORT is set, and ``python api_server.py`` runs it alone
+against the same SQLite database.
+
+Endpoints (JSON in and out):
+
+    GET  /routes                  all routes with today's seats left
+    GET  /routes?q=TEXT           routes matching typed text, best first
+    GET  /routes/<id>?date=D      one route with seats left on date D (default today)
+    GET  /dates                   dates open for booking
+    POST /register                {"name", "email", "password"}
+    POST /login                   {"email", "password"} -> {"token"}
+    GET  /bookings                the caller's bookings
+    POST /bookings                {"route_id"} or {"route_ids": [...]}, optional "date"
+    DELETE /bookings/<id>         cancel one of the caller's bookings
+    GET  /waitlist                departures the caller is waiting for
+    POST /waitlist                {"route_id"}, optional "date" and home "barangay"
+    DELETE /waitlist/<id>?date=D  leave the waitlist of route <id> on date D
+
+Booking, cancelling, the waitlist and listing need an ``Authorization: Bearer <token>`` header.
+"""
+import asyncio
+import json
+import logging
+import secrets
+import threading
+from http import HTTPStatus
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from auth import AuthService
+from booking_engine import BookingEngine, BookingError
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+KEEP_ALIVE_SECONDS = 15
+
+log = logging.getLogger(__name__)
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ApiServer:
+    def __init__(self, engine: BookingEngine, auth: AuthService,
+                 host: str = "127.0.0.1", port: int = 8080):
+        self.engine = engine
+        self.auth = auth
+        self.host = host
+        self.port = port
+        # Session tokens handed out by /login; they last until the server stops
+        self.sessions: Dict[str, str] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=MAX_HEADER_BYTES
+        )
+        # Port 0 picks a free port; report the real one
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start_in_thread(self) -> threading.Thread:
+        """Run the server on its own event loop in a daemon thread"""
+        started = threading.Event()
+
+        async def run():
+            await self.start()
+            started.set()
+            await self.serve_forever()
+
+        thread = threading.Thread(target=lambda: asyncio.run(run()), name="api-server", daemon=True)
+        thread.start()
+        started.wait()
+        return thread
+
+    def stop(self):
+        """Stop accepting connections (safe to call from any thread)"""
+        if self._server is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+
+    # HTTP plumbing
+
+    async def _handle_connection(self, reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter):
+        try:
+            # One request after another on the same connection until the
+            # client closes it, asks to close, or goes idle
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"),
+                                                  KEEP_ALIVE_SECONDS)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                                        {"error": "Headers too large"}, keep_alive=False)
+                    break
+
+                try:
+                    method, path, version, headers = self._parse_head(head)
+                    length = int(headers.get("content-length", "0"))
+                    if length < 0:
+                        raise HttpError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+                    if length > MAX_BODY_BYTES:
+                        raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Body too large")
+                except (ValueError, HttpError) as e:
+                    status = e.status if isinstance(e, HttpError) else HTTPStatus.BAD_REQUEST
+                    await self._respond(writer, status, {"error": str(e)}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" and (version == "HTTP/1.1" or connection == "keep-alive")
+
+                try:
+                    status, payload = await self._dispatch(method, path, headers, body)
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except BookingError as e:
+                    status, payload = HTTPStatus.CONFLICT, {"error": str(e)}
+                except (ValueError, TypeError) as e:
+                    status, payload = HTTPStatus.BAD_REQUEST, {"error": f"Invalid request: {e}"}
+                except Exception:
+                    # e.g. a StorageError from a durable commit: answer rather
+                    # than drop the connection with no status
+                    log.exception("Unhandled error for %s %s", method, path)
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error"}
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _parse_head(head: bytes) -> Tuple[str, str, str, Dict[str, str]]:
+        lines = head.decode("latin-1").split("\r\n")
+        method, path, version = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        return method, path, version, headers
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool):
+        body = json.dumps(payload).encode("utf-8")
+        status = HTTPStatus(status)
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+            + body
+        )
+        await writer.drain()
+
+    # Endpoints
+
+    async def _dispatch(self, method: str, path: str, headers: Dict[str, str], body: bytes):
+        path, _, query = path.partition("?")
+        parts = [part for part in path.split("/") if part]
+        params = dict(parse_qsl(query))
+
+        if parts == ["routes"] and method == "GET":
+            route_ids = self.engine.search_routes(params["q"]) if "q" in params else self.engine.routes
+            return HTTPStatus.OK, [self._route_json(route_id) for route_id in route_ids]
+        if len(parts) == 2 and parts[0] == "routes" and method == "GET":
+            try:
+                route_id = int(parts[1])
+            except ValueError:
+                raise HttpError(HTTPStatus.NOT_FOUND, "Unknown route")
+            if route_id not in self.engine.routes:
+                raise HttpError(HTTPStatus.NOT_FOUND, "Unknown route")
+            date = params.get("date")
+            if date:
+                # The booking window book() enforces
+                try:
+                    self.engine.seats.check_date(date)
+                except ValueError as e:
+                    raise HttpError(HTTPStatus.BAD_REQUEST, str(e))
+            return HTTPStatus.OK, self._route_json(route_id, date)
+        if parts == ["dates"] and method == "GET":
+            return HTTPStatus.OK, self.engine.bookable_dates()
+
+        if parts == ["register"] and method == "POST":
+            data = self._json(body, "name", "email", "password")
+            await asyncio.wrap_future(
+                self.auth.register_async(data["name"], data["email"], data["password"])
+            )
+            return HTTPStatus.CREATED, {"email": data["email"]}
+
+        if parts == ["login"] and method == "POST":
+            data = self._json(body, "email", "password")
+            user = await asyncio.wrap_future(
+                self.auth.authenticate_async(data["email"], data["password"])
+            )
+            if user is None:
+                raise HttpError(HTTPStatus.UNAUTHORIZED, "Invalid email or password!")
+            token = secrets.token_urlsafe(24)
+            self.sessions[token] = data["email"]
+            return HTTPStatus.OK, {"token": token, "name": user["name"]}
+
+        if parts == ["bookings"] and method == "GET":
+            email = self._session_email(headers)
+            return HTTPStatus.OK, self.engine.user_bookings(email)
+        if parts == ["bookings"] and method == "POST":
+            email = self._session_email(headers)
+            data = self._json(body)
+            loop = asyncio.get_running_loop()
+            # Booking may wait for a durable commit, so keep it off the event loop
+            if "route_ids" in data:
+                route_ids = [int(route_id) for route_id in data["route_ids"]]
+                if not route_ids:
+                    raise HttpError(HTTPStatus.BAD_REQUEST, "route_ids must not be empty")
+                journey = await loop.run_in_executor(None, self.engine.book_journey, email,
+                                                     route_ids, data.get("date"))
+                return HTTPStatus.CREATED, journey
+            if "route_id" in data:
+                booking = await loop.run_in_executor(None, self.engine.book, email,
+                                                     int(data["route_id"]), data.get("date"))
+                return HTTPStatus.CREATED, booking
+            raise HttpError(HTTPStatus.BAD_REQUEST, "route_id or route_ids is required")
+        if len(parts) == 2 and parts[0] == "bookings" and method == "DELETE":
+            email = self._session_email(headers)
+            promoted = await asyncio.get_running_loop().run_in_executor(
+                None, self.engine.cancel, self._id(parts[1], "booking"), email
+            )
+            return HTTPStatus.OK, {"cancelled": int(parts[1]), "promoted": len(promoted)}
+
+        if parts == ["waitlist"] and method == "GET":
+            return HTTPStatus.OK, self.engine.waitlist_entries(self._session_email(headers))
+        if parts == ["waitlist"] and method == "POST":
+            email = self._session_email(headers)
+            data = self._json(body, "route_id")
+            position = self.engine.join_waitlist(email, int(data["route_id"]), data.get("date"),
+                                                 data.get("barangay"))
+            return HTTPStatus.CREATED, {"route_id": int(data["route_id"]), "position": position}
+        if len(parts) == 2 and parts[0] == "waitlist" and method == "DELETE":
+            email = self._session_email(headers)
+            self.engine.leave_waitlist(email, self._id(parts[1], "route"),
+                                       params.get("date") or self.engine.seats.today)
+            return HTTPStatus.OK, {"route_id": int(parts[1])}
+
+        raise HttpError(HTTPStatus.NOT_FOUND, f"No endpoint for {method} {path}")
+
+    @staticmethod
+    def _id(text: str, kind: str) -> int:
+        try:
+            return int(text)
+        except ValueError:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"Unknown {kind}")
+
+    def _route_json(self, route_id: int, date: Optional[str] = None) -> Dict:
+        route = self.engine.routes[route_id]
+        return {
+            "route_id": route_id,
+            "name": route["name"],
+            "schedule": route["schedule"],
+            "date": date or self.engine.seats.today,
+            "seats": self.engine.available_seats(route_id, date)
+        }
+
+    def _session_email(self, headers: Dict[str, str]) -> str:
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        email = self.sessions.get(token) if scheme.lower() == "bearer" else None
+        if email is None:
+            raise HttpError(HTTPStatus.UNAUTHORIZED, "Login required")
+        return email
+
+    @staticmethod
+    def _json(body: bytes, *required: str) -> Dict:
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+        missing = [key for key in required if not data.get(key)]
+        if missing:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"Missing fields: {', '.join(missing)}")
+        return data
+
+
+def main():
+    import argparse
+
+    from storage import open_storage
+    from app_state import auth, engine
+
+    parser = argparse.ArgumentParser(description="Run the TransConnect HTTP API without the GUI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    storage = open_storage()
+    engine.attach_storage(storage)
+    server = ApiServer(engine, auth, args.host, args.port)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        auth.close()
+        storage.close()
+
+
+if __name__ == "__main__":
+    main()
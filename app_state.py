@@ -0,0 +1,94 @@
+"""Routes, users and the shared booking engine, without the GUI.
+
+The Tk app (transconnect.py) and the headless HTTP API (api_server.py) both
+import their state from here, so the API can run where Tk is not installed.
+"""
+from typing import Dict
+
+from auth import AuthService
+from booking_engine import BookingEngine
+from booking_table import BookingTable
+from route_model import RouteTable
+
+# Create in-memory storage using dictionaries and lists
+# users: stores user information like name, email and password
+# bookings: stores all booking information across the system, in columns
+# each entry point's main() reloads both from storage and the engine writes
+# every change back
+users: Dict[str, Dict] = {
+    "admin@gmail.com": {
+        "name": "Admin",
+        "password": "admin123",
+        "is_admin": True
+    }
+}
+bookings = BookingTable()
+
+# Define available transportation routes in Marinduque
+# Each route has: name, GPS coordinates for start/end points, available seats, and schedule
+# The GPS strings and schedules are parsed once into a compact RouteTable;
+# ROUTES[route_id] still behaves like the original dict for existing screens
+ROUTES = RouteTable.from_dicts({
+    1: {
+        "name": "Boac to Mogpog",
+        "start_gps": "13.449078, 121.839003",  # Boac town proper
+        "end_gps": "13.473615, 121.860948",    # Mogpog town proper
+        "seats": 15,
+        "schedule": "7:00 AM"
+    },
+    2: {
+        "name": "Mogpog to Santa Cruz", 
+        "start_gps": "13.473615, 121.860948",  # Mogpog town proper
+        "end_gps": "13.475758368354766, 122.03110517819835",    # Santa Cruz town proper
+        "seats": 15,
+        "schedule": "9:00 AM"
+    },
+    3: {
+        "name": "Santa Cruz to Torrijos",
+        "start_gps": "13.475758368354766, 122.03110517819835",  # Santa Cruz town proper
+        "end_gps": "13.320148, 122.084475",    # Torrijos town proper
+        "seats": 15,
+        "schedule": "11:00 AM"
+    },
+    4: {
+        "name": "Torrijos to Buenavista",
+        "start_gps": "13.320148, 122.084475",  # Torrijos town proper
+        "end_gps": "13.473615, 121.860948",    # Buenavista town proper DONE
+        "seats": 15,
+        "schedule": "1:00 PM"
+    },
+    5: {
+        "name": "Buenavista to Gasan",
+        "start_gps": "13.473615, 121.860948",  # Buenavista town proper
+        "end_gps": "13.328510, 121.845800",    # Gasan town proper
+        "seats": 15,
+        "schedule": "3:00 PM"
+    },
+    6: {
+        "name": "Gasan to Boac",
+        "start_gps": "13.328510, 121.845800",  # Gasan town proper
+        "end_gps": "13.449078, 121.839003",    # Boac town proper
+        "seats": 15,
+        "schedule": "3:00 PM"
+    }
+})
+
+# Routes driven back to back by one vehicle; a passenger leaving at Mogpog
+# frees the same seat for someone boarding there
+THROUGH_TRIPS = [
+    [1, 2, 3]  # Boac → Mogpog → Santa Cruz → Torrijos
+]
+
+# Passengers from these barangays get freed seats first on a sold-out
+# departure's waitlist; the island barangays off Santa Cruz, add others as
+# needed, each with the town on the routes that serves it
+REMOTE_BARANGAYS = {"Maniwaya": "Santa Cruz", "Mongpong": "Santa Cruz", "Polo": "Santa Cruz"}
+# Stops whose trips the fleet planner weights for remote passengers
+REMOTE_STOPS = sorted(set(REMOTE_BARANGAYS.values()))
+
+# Shared booking core; every screen books and updates seats through it
+engine = BookingEngine(ROUTES, users, bookings, trips=THROUGH_TRIPS,
+                       remote_barangays=REMOTE_BARANGAYS)
+
+# Password hashing and login checks, run in a worker pool off the Tk thread
+auth = AuthService(engine)
@@ -0,0 +1,114 @@
+"""Password hashing and credential checks off the Tk thread.
+
+Passwords are stored as salted scrypt hashes ("scrypt$n$r$p$salt$hash").
+scrypt is deliberately slow and memory-hard, so hashing and verification run
+in a thread pool (hashlib.scrypt releases the GIL, so logins use every core)
+and the screens get a Future back. Accounts created before hashing still hold
+plaintext passwords; those are re-hashed the first time they log in, as are
+hashes made with an older cost setting.
+"""
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from booking_engine import BookingEngine, BookingError
+
+SCHEME = "scrypt"
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _derive(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    # scrypt needs about 128 * r * n bytes; leave headroom over OpenSSL's default limit
+    maxmem = 128 * r * (n + p + 2) + 2 ** 20
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                          maxmem=maxmem, dklen=HASH_BYTES)
+
+
+def hash_password(password: str, n: int = 2 ** 14, r: int = 8, p: int = 1) -> str:
+    """Salted scrypt hash of a password, encoded with its cost parameters"""
+    salt = os.urandom(SALT_BYTES)
+    digest = _derive(password, salt, n, r, p)
+    return f"{SCHEME}${n}${r}${p}${_b64(salt)}${_b64(digest)}"
+
+
+def is_password_hash(stored: str) -> bool:
+    return stored.startswith(SCHEME + "$")
+
+
+def verify_password(password: str, stored: str) -> bool:
+    """Check a password against a stored hash (or legacy plaintext) in constant time"""
+    if not is_password_hash(stored):
+        return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+    try:
+        _, n, r, p, salt, digest = stored.split("$")
+        expected = _unb64(digest)
+        actual = _derive(password, _unb64(salt), int(n), int(r), int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+class AuthService:
+    """Registers and authenticates users through a worker pool
+
+    ``n``, ``r`` and ``p`` are the scrypt cost parameters for new hashes;
+    stored hashes with different parameters are upgraded on the next
+    successful login.
+    """
+
+    def __init__(self, engine: BookingEngine, n: int = 2 ** 14, r: int = 8, p: int = 1,
+                 workers: Optional[int] = None):
+        self.engine = engine
+        self.n = n
+        self.r = r
+        self.p = p
+        self._executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                                            thread_name_prefix="auth")
+        # Unknown emails are checked against this so they take as long as real ones
+        self._dummy_hash = f"{SCHEME}${n}${r}${p}${_b64(bytes(SALT_BYTES))}${_b64(bytes(HASH_BYTES))}"
+
+    def hash(self, password: str) -> str:
+        return hash_password(password, self.n, self.r, self.p)
+
+    def needs_rehash(self, stored: str) -> bool:
+        return not stored.startswith(f"{SCHEME}${self.n}${self.r}${self.p}$")
+
+    def authenticate(self, email: str, password: str) -> Optional[Dict]:
+        """Return the user if the password matches, else None (blocking)"""
+        user = self.engine.users.get(email)
+        stored = user["password"] if user else self._dummy_hash
+        if not verify_password(password, stored) or user is None:
+            return None
+
+        # Migrate plaintext passwords and outdated cost settings
+        if self.needs_rehash(stored):
+            self.engine.set_password(email, self.hash(password))
+        return user
+
+    def register(self, name: str, email: str, password: str) -> Dict:
+        """Create a passenger account with a hashed password (blocking)"""
+        # Fail fast before paying for a hash; the engine re-checks under its lock
+        if email in self.engine.users:
+            raise BookingError("Email already registered!")
+        return self.engine.register_user(name, email, self.hash(password))
+
+    def authenticate_async(self, email: str, password: str) -> Future:
+        return self._executor.submit(self.authenticate, email, password)
+
+    def register_async(self, name: str, email: str, password: str) -> Future:
+        return self._executor.submit(self.register, name, email, password)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1 @@
+"""Benchmarks for TransConnect; run each one with ``python -m benchmarks.<name>``."""
@@ -0,0 +1,80 @@
+"""Dashboard statistics: incremental counters versus scanning every booking.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_analytics --bookings 10000 100000 1000000
+"""
+import argparse
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from analytics import RidershipStats
+from route_model import route_endpoints
+
+
+def make_routes(n_routes: int):
+    towns = ["Boac", "Mogpog", "Santa Cruz", "Torrijos", "Buenavista", "Gasan"]
+    return {
+        route_id: {"name": f"{towns[route_id % 6]} to {towns[(route_id + 1) % 6]}", "seats": 15}
+        for route_id in range(1, n_routes + 1)
+    }
+
+
+def make_bookings(n: int, routes, rng: random.Random):
+    start = datetime(2026, 10, 1)
+    for i in range(n):
+        booked_at = start + timedelta(seconds=i * 2_592_000 // n)
+        yield {"booking_id": i + 1, "route_id": rng.randrange(1, len(routes) + 1),
+               "date": (booked_at + timedelta(days=rng.randrange(14))).date().isoformat(),
+               "booked_at": booked_at.isoformat(timespec='seconds')}
+
+
+def scan(bookings, routes, capacity):
+    """What the dashboard would have to do without the counters"""
+    sold = Counter(b['route_id'] for b in bookings)
+    departures = Counter(route_id for route_id, _ in {(b['route_id'], b['date']) for b in bookings})
+    factors = sorted(((r, sold[r] / (capacity[r] * departures[r])) for r in sold),
+                     key=lambda item: item[1], reverse=True)[:3]
+    origins = Counter(route_endpoints(routes[b['route_id']])[0] for b in bookings).most_common(3)
+    per_day = Counter(b['booked_at'][:10] for b in bookings)
+    return factors, origins, per_day
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bookings", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--routes", type=int, default=30)
+    parser.add_argument("--reads", type=int, default=1000)
+    args = parser.parse_args()
+
+    routes = make_routes(args.routes)
+    capacity = {route_id: 15 for route_id in routes}
+    for n in args.bookings:
+        bookings = list(make_bookings(n, routes, random.Random(n)))
+        now = datetime.fromisoformat(bookings[-1]['booked_at'])
+        stats = RidershipStats(routes, now=lambda: now)
+
+        start = time.perf_counter()
+        stats.rebuild(bookings, capacity)
+        per_record = (time.perf_counter() - start) / n
+
+        start = time.perf_counter()
+        for _ in range(args.reads):
+            stats.busiest_routes(3)
+            stats.top_origins(3)
+            stats.bookings_per_hour()
+            stats.bookings_per_day()
+        read = (time.perf_counter() - start) / args.reads
+
+        start = time.perf_counter()
+        scan(bookings, routes, capacity)
+        scanned = time.perf_counter() - start
+        print(f"{n:>9} bookings: update {per_record * 1e6:.2f} us/booking, "
+              f"dashboard read {read * 1e6:.0f} us, full scan {scanned * 1000:.0f} ms "
+              f"({scanned / read:,.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Load test of the HTTP API over keep-alive connections on localhost.
+
+Starts the API server in a background thread over a synthetic route table,
+then drives it from asyncio clients, each holding one keep-alive connection
+and sending requests back to back. Pass --port to load an already running
+server instead (it must have a user with --email/--password).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_api --connections 50 --requests 200 --book-ratio 0.2
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from api_server import ApiServer
+from auth import AuthService
+from booking_engine import BookingEngine
+from route_model import RouteTable, format_minutes
+
+
+def start_demo_server(n_routes: int):
+    rng = random.Random(1)
+    routes = RouteTable.from_dicts({
+        route_id: {
+            "name": f"Stop {route_id} to Stop {route_id + 1}",
+            "start_gps": f"{13.2 + rng.random() * 0.35}, {121.8 + rng.random() * 0.3}",
+            "end_gps": f"{13.2 + rng.random() * 0.35}, {121.8 + rng.random() * 0.3}",
+            "seats": 10 ** 6,
+            "schedule": format_minutes(rng.randrange(5 * 60, 21 * 60))
+        }
+        for route_id in range(1, n_routes + 1)
+    })
+    engine = BookingEngine(routes, {}, [])
+    # Cheap hashes: this measures the HTTP layer, bench_auth measures logins
+    auth = AuthService(engine, n=2 ** 10)
+    auth.register("Load Test", "load@example.com", "secret")
+    server = ApiServer(engine, auth, port=0)
+    server.start_in_thread()
+    return server
+
+
+async def request(reader, writer, method, path, payload=None, token=None):
+    body = json.dumps(payload).encode() if payload is not None else b""
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n"
+    if token:
+        head += f"Authorization: Bearer {token}\r\n"
+    writer.write(head.encode() + b"\r\n" + body)
+    await writer.drain()
+
+    status_and_headers = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+    status = int(status_and_headers[0].split(" ")[1])
+    length = next(int(line.split(":", 1)[1]) for line in status_and_headers
+                  if line.lower().startswith("content-length:"))
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(port, args, route_ids, latencies, errors, seed):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    _, login = await request(reader, writer, "POST", "/login",
+                             {"email": args.email, "password": args.password})
+    token = login["token"]
+    for _ in range(args.requests):
+        route_id = rng.choice(route_ids)
+        start = time.perf_counter()
+        if rng.random() < args.book_ratio:
+            status, _ = await request(reader, writer, "POST", "/bookings", {"route_id": route_id}, token)
+        else:
+            status, _ = await request(reader, writer, "GET", f"/routes/{route_id}")
+        latencies.append((time.perf_counter() - start) * 1000)
+        errors.append(status >= 400)
+    writer.close()
+
+
+async def run(port, args):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    _, routes = await request(reader, writer, "GET", "/routes")
+    writer.close()
+    route_ids = [route["route_id"] for route in routes]
+
+    latencies = []
+    errors = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(port, args, route_ids, latencies, errors, seed)
+        for seed in range(args.connections)
+    ))
+    return time.perf_counter() - start, latencies, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connections", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200, help="requests per connection")
+    parser.add_argument("--book-ratio", type=float, default=0.2, help="share of POST /bookings")
+    parser.add_argument("--routes", type=int, default=100)
+    parser.add_argument("--port", type=int, help="load an already running server")
+    parser.add_argument("--email", default="load@example.com")
+    parser.add_argument("--password", default="secret")
+    args = parser.parse_args()
+
+    port = args.port or start_demo_server(args.routes).port
+    elapsed, latencies, errors = asyncio.run(run(port, args))
+
+    latencies.sort()
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+    print(f"{len(latencies)} requests over {args.connections} keep-alive connections "
+          f"in {elapsed:.2f}s ({errors} errors)")
+    print(f"throughput: {len(latencies) / elapsed:.0f} req/s")
+    print(f"latency: p50={pct(0.50):.2f} ms p99={pct(0.99):.2f} ms "
+          f"p99.9={pct(0.999):.2f} ms max={latencies[-1]:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Login latency and parallel throughput of the scrypt auth service.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_auth --log-n 14 --logins 200
+"""
+import argparse
+import os
+import time
+
+from auth import AuthService, hash_password
+from booking_engine import BookingEngine
+
+
+def make_engine(n_users: int, n: int, r: int, p: int) -> BookingEngine:
+    # Every user shares one hash so setup does not dominate the run
+    stored = hash_password("secret", n, r, p)
+    users = {
+        f"user{i}@example.com": {"name": f"User {i}", "password": stored}
+        for i in range(n_users)
+    }
+    return BookingEngine({}, users, [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--log-n", type=int, default=14, help="scrypt cost, n = 2 ** log_n")
+    parser.add_argument("-r", type=int, default=8)
+    parser.add_argument("-p", type=int, default=1)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--logins", type=int, default=200)
+    args = parser.parse_args()
+    n = 2 ** args.log_n
+
+    engine = make_engine(args.users, n, args.r, args.p)
+    emails = list(engine.users)
+    print(f"scrypt n=2^{args.log_n} r={args.r} p={args.p}, {os.cpu_count()} CPU(s)")
+
+    # Latency of one login at a time, as a single terminal sees it
+    auth = AuthService(engine, n, args.r, args.p, workers=1)
+    latencies = []
+    for i in range(args.logins):
+        start = time.perf_counter()
+        assert auth.authenticate_async(emails[i % len(emails)], "secret").result()
+        latencies.append((time.perf_counter() - start) * 1000)
+    auth.close()
+    latencies.sort()
+    print(f"latency: p50={latencies[len(latencies) // 2]:.1f} ms "
+          f"p99={latencies[int(len(latencies) * 0.99) - 1]:.1f} ms")
+
+    # Throughput with every login submitted at once
+    for workers in sorted({1, 2, os.cpu_count() or 1}):
+        auth = AuthService(engine, n, args.r, args.p, workers=workers)
+        start = time.perf_counter()
+        futures = [auth.authenticate_async(emails[i % len(emails)], "secret")
+                   for i in range(args.logins)]
+        assert all(f.result() for f in futures)
+        elapsed = time.perf_counter() - start
+        auth.close()
+        print(f"workers={workers}: {args.logins / elapsed:.1f} logins/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Concurrent booking throughput and overbooking check for BookingEngine.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_booking --threads 200 --seats 5000
+"""
+import argparse
+import threading
+import time
+
+from booking_engine import BookingEngine, BookingError
+
+
+def make_engine(seats: int, n_users: int) -> BookingEngine:
+    routes = {1: {"name": "Boac to Mogpog", "seats": seats, "schedule": "7:00 AM"}}
+    users = {
+        f"user{i}@example.com": {"name": f"User {i}", "password": "x"}
+        for i in range(n_users)
+    }
+    return BookingEngine(routes, users, [])
+
+
+def run(threads: int, seats: int, attempts_per_thread: int):
+    engine = make_engine(seats, threads)
+    emails = list(engine.users)
+    barrier = threading.Barrier(threads + 1)
+    rejected = [0] * threads
+
+    def worker(index):
+        email = emails[index]
+        barrier.wait()
+        for _ in range(attempts_per_thread):
+            try:
+                engine.book(email, 1)
+            except BookingError:
+                rejected[index] += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    booked = len(engine.bookings)
+    attempts = threads * attempts_per_thread
+    overbooked = booked > seats or engine.available_seats(1) < 0
+    print(f"threads={threads} seats={seats} attempts={attempts}")
+    print(f"booked={booked} rejected={sum(rejected)} remaining={engine.available_seats(1)}")
+    print(f"elapsed={elapsed:.3f}s throughput={attempts / elapsed:,.0f} attempts/s")
+    if overbooked or booked != min(seats, attempts):
+        raise SystemExit("FAILED: seat inventory is inconsistent")
+    print("OK: no overbooking")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=200)
+    parser.add_argument("--seats", type=int, default=5000)
+    parser.add_argument("--attempts", type=int, default=50, help="booking attempts per thread")
+    args = parser.parse_args()
+    run(args.threads, args.seats, args.attempts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Bulk CSV capacity import versus saving routes one at a time.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_capacity_import --routes 5000
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from booking_engine import BookingEngine
+from capacity_import import read_capacity_csv
+from storage import SQLiteStorage
+
+
+def make_engine(n_routes: int, path: str) -> BookingEngine:
+    routes = {
+        route_id: {"name": f"Stop {route_id} to Stop {route_id + 1}", "seats": 15,
+                   "schedule": "7:00 AM"}
+        for route_id in range(1, n_routes + 1)
+    }
+    engine = BookingEngine(routes, {}, [])
+    engine.attach_storage(SQLiteStorage(path))
+    return engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--routes", type=int, default=5000)
+    parser.add_argument("--one-by-one", type=int, default=200,
+                        help="routes to save individually for comparison")
+    args = parser.parse_args()
+
+    csv_text = "route_id,seats\n" + "".join(
+        f"{route_id},{18 + route_id % 5}\n" for route_id in range(1, args.routes + 1)
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(args.routes, os.path.join(tmp, "bulk.db"))
+        start = time.perf_counter()
+        seats = read_capacity_csv(io.StringIO(csv_text), engine.find_route_id,
+                                  lambda r: r in engine.routes)
+        parsed = time.perf_counter() - start
+        engine.set_seats_bulk(seats)
+        elapsed = time.perf_counter() - start
+        engine.storage.close()
+        print(f"bulk import of {len(seats)} routes: parse {parsed * 1000:.0f} ms, "
+              f"total {elapsed * 1000:.0f} ms (one transaction)")
+
+        engine = make_engine(args.one_by_one, os.path.join(tmp, "single.db"))
+        start = time.perf_counter()
+        for route_id in engine.routes:
+            engine.set_seats(route_id, 20)
+        elapsed = time.perf_counter() - start
+        engine.storage.close()
+        per_route = elapsed / args.one_by_one
+        print(f"one route per commit: {per_route * 1000:.2f} ms/route "
+              f"(~{per_route * args.routes:.1f}s for {args.routes} routes)")
+
+
+if __name__ == "__main__":
+    main()
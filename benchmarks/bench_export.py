@@ -0,0 +1,48 @@
+"""Streaming export: time and peak memory as the number of bookings grows.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_export --bookings 10000 100000 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from exporter import BOOKING_FIELDS, write_rows
+
+
+def fake_bookings(n: int):
+    for i in range(n):
+        yield {"booking_id": i + 1, "email": f"user{i % 5000}@example.com",
+               "route_id": i % 30 + 1, "route_name": "Boac to Mogpog",
+               "date": f"2026-10-{i % 28 + 1:02d}", "seat": i % 15 + 1}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bookings", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--format", default="csv.gz", choices=["csv", "csv.gz", "jsonl", "jsonl.gz"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bookings." + args.format)
+        for n in args.bookings:
+            start = time.perf_counter()
+            write_rows(fake_bookings(n), BOOKING_FIELDS, path)
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(path)
+
+            # Traced separately (and capped) since tracemalloc slows every allocation
+
+            tracemalloc.start()
+            write_rows(fake_bookings(min(n, 100000)), BOOKING_FIELDS, path)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{n:>9} bookings: {elapsed:.2f}s ({n / elapsed:,.0f} rows/s), "
+                  f"{size / 1e6:.1f} MB file, peak memory {peak / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Fleet scheduling: solve time and plan quality for hundreds of vehicles.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_fleet --trips 500 2000 5000
+
+Each size makes up a network of towns across Marinduque (one in six a remote
+barangay) and routes between them, each departing hourly or every other hour
+over the day, for ``--trips`` departures in total. Each route's daily demand
+averages 12 passengers per departure. The fleet mixes 12-, 15-, 20- and
+30-seat vehicles at eight depots and is sized to run about
+``--coverage`` of the trips at the busiest hour, so some have to be dropped.
+
+The optimizer is compared with a plain dispatcher that gives each trip, in
+departure order, the vehicle that has been free longest and can reach it in
+time. Every block is checked for timing and vehicle use, and the app's
+own timetable must have at least one trip the planner treats as remote.
+"""
+import argparse
+import random
+import time
+
+from distance_matrix import DistanceMatrix
+from fleet_scheduler import FleetScheduler, Vehicle
+from route_model import RouteTable, format_minutes
+
+CAPACITIES = [12, 15, 20, 30]
+
+
+def make_network(n_trips: int, rng: random.Random):
+    n_towns = max(8, n_trips // 60)
+    towns = {}
+    for i in range(n_towns):
+        name = f"Remote {i}" if i % 6 == 5 else f"Town {i}"
+        towns[name] = (rng.uniform(13.20, 13.55), rng.uniform(121.82, 122.12))
+    names = list(towns)
+
+    routes, trips, route_id = {}, 0, 0
+    while trips < n_trips:
+        route_id += 1
+        origin, destination = rng.sample(names, 2)
+        every = rng.choice((1, 2))
+        first = rng.randint(5, 7)
+        hours = list(range(first, 20, every))[:n_trips - trips]
+        routes[route_id] = {
+            "name": f"{origin} to {destination}",
+            "start_gps": "{}, {}".format(*towns[origin]),
+            "end_gps": "{}, {}".format(*towns[destination]),
+            "seats": 15,
+            "schedule": ", ".join(format_minutes(h * 60 + rng.choice((0, 15, 30, 45))) for h in hours)
+        }
+        trips += len(hours)
+    remote = [name for name in names if name.startswith("Remote")]
+    return RouteTable.from_dicts(routes), remote, names
+
+
+def make_fleet(scheduler: FleetScheduler, demand, towns, coverage: float, rng: random.Random):
+    # As many vehicles as trips running at once at the busiest minute
+    trips = scheduler.trips(demand)
+    busiest = max(sum(1 for t in trips if t.departure <= minute < t.arrival + 10)
+                  for minute in range(0, 24 * 60, 5))
+    depots = rng.sample(towns, 8)
+    return [Vehicle(f"V{i:04d}", rng.choice(CAPACITIES), rng.choice(depots))
+            for i in range(max(1, int(busiest * coverage)))]
+
+
+def dispatch(scheduler: FleetScheduler, fleet, demand):
+    """Baseline: longest-free vehicle that can reach each trip, in departure order"""
+    minutes = scheduler.distances.eta_minutes.tolist()
+    km = scheduler.distances.distances_km.tolist()
+    depots = [scheduler.distances.stop_index[v.depot] for v in fleet]
+    where = list(depots)
+    free_at = [0] * len(fleet)
+    deadhead = unmet = unmet_remote = 0.0
+    used, dropped = set(), 0
+    for trip in scheduler.trips(demand):
+        ready = [i for i in range(len(fleet))
+                 if free_at[i] + minutes[where[i]][trip.origin] <= trip.departure]
+        if not ready:
+            dropped += 1
+            unmet += trip.demand
+            unmet_remote += trip.demand if trip.remote else 0
+            continue
+        i = min(ready, key=free_at.__getitem__)
+        deadhead += km[where[i]][trip.origin]
+        left = max(0.0, trip.demand - fleet[i].capacity)
+        unmet += left
+        unmet_remote += left if trip.remote else 0
+        where[i], free_at[i] = trip.destination, trip.arrival + scheduler.turnaround_minutes
+        used.add(i)
+    deadhead += sum(km[where[i]][depots[i]] for i in used)
+    return len(used), dropped, deadhead, unmet, unmet_remote
+
+
+def check(scheduler: FleetScheduler, schedule, n_trips: int):
+    minutes = scheduler.distances.eta_minutes.tolist()
+    seen = set()
+    for block in schedule.blocks:
+        stop = scheduler.distances.stop_index[block.vehicle.depot]
+        free_at = 0
+        for trip in block.trips:
+            if free_at + minutes[stop][trip.origin] > trip.departure + 1:
+                raise SystemExit(f"FAILED: {block.vehicle.vehicle_id} cannot make trip {trip.trip_id}")
+            if trip.trip_id in seen:
+                raise SystemExit(f"FAILED: trip {trip.trip_id} run twice")
+            seen.add(trip.trip_id)
+            stop, free_at = trip.destination, trip.arrival + scheduler.turnaround_minutes
+    if len(seen) + len(schedule.unserved) != n_trips:
+        raise SystemExit("FAILED: trips lost")
+
+
+def check_shipped_routes():
+    from app_state import REMOTE_STOPS, ROUTES
+    scheduler = FleetScheduler(ROUTES, DistanceMatrix(ROUTES), remote_stops=REMOTE_STOPS)
+    remote = [trip for trip in scheduler.trips({}) if trip.remote]
+    if not remote:
+        raise SystemExit("FAILED: no trip in ROUTES serves a remote barangay")
+    print(f"shipped routes: {len(remote)} remote trips, "
+          f"{', '.join(sorted({ROUTES.name(trip.route_id) for trip in remote}))}")
+
+
+def run(n_trips: int, coverage: float, rng: random.Random):
+    routes, remote, towns = make_network(n_trips, rng)
+    demand = {route_id: 12 * len(routes.departures(route_id)) * rng.uniform(0.3, 1.7)
+              for route_id in routes}
+    scheduler = FleetScheduler(routes, DistanceMatrix(routes), remote_stops=remote)
+    fleet = make_fleet(scheduler, demand, towns, coverage, rng)
+
+    start = time.perf_counter()
+    schedule = scheduler.schedule(fleet, demand)
+    elapsed = time.perf_counter() - start
+    check(scheduler, schedule, n_trips)
+    base_used, base_dropped, base_km, base_unmet, base_remote = dispatch(scheduler, fleet, demand)
+
+    print(f"{n_trips:>5} trips, {len(fleet):>4} vehicles: solved in {elapsed:.2f} s")
+    print(f"    optimizer:  {len(schedule.blocks):>4} vehicles, {len(schedule.unserved):>4} trips dropped, "
+          f"{schedule.deadhead_km:>8,.0f} km deadhead, {schedule.unmet:>7,.0f} unmet "
+          f"({schedule.unmet_remote:,.0f} remote)")
+    print(f"    dispatcher: {base_used:>4} vehicles, {base_dropped:>4} trips dropped, "
+          f"{base_km:>8,.0f} km deadhead, {base_unmet:>7,.0f} unmet ({base_remote:,.0f} remote)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trips", type=int, nargs="+", default=[500, 2000, 5000])
+    parser.add_argument("--coverage", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    check_shipped_routes()
+    for n_trips in args.trips:
+        run(n_trips, args.coverage, random.Random(args.seed))
+
+
+if __name__ == "__main__":
+    main()
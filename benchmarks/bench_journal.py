@@ -0,0 +1,130 @@
+"""Journal storage: append rate, and engine startup from a snapshot plus tail or a full replay.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_journal --records 1000000 --tail 10000 --target 1.0
+
+The journal holds ``--records`` bookings on ``--routes`` routes, a year or
+so of departures ending a week from today with every seat sold, and one
+user per 20 bookings. Startup is timed the way main() starts: opening the
+storage plus ``BookingEngine.attach_storage``. It is timed from a snapshot
+with ``--tail`` records (a tenth of them cancellations) written after it,
+and again after deleting the snapshot, as a full replay; both engines must
+end up with the same bookings, seats and counters. The run fails if startup
+from the snapshot takes longer than ``--target`` seconds.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date as Date, datetime, timedelta
+
+from booking_engine import BookingEngine
+from journal import JournalStorage
+
+SEATS = 40
+USERS_PER_BOOKING = 20
+
+
+def make_routes(n_routes: int):
+    return {
+        route_id: {"name": f"Town {route_id} to Town {route_id + 1}", "seats": SEATS}
+        for route_id in range(1, n_routes + 1)
+    }
+
+
+def booking(i: int, n_routes: int, first_day: Date, n_users: int):
+    # Consecutive bookings fill one departure seat by seat
+    departure = i // SEATS
+    day = first_day + timedelta(days=departure // n_routes)
+    route_id = departure % n_routes + 1
+    booked_at = datetime(day.year, day.month, day.day, 8) - timedelta(days=3, seconds=i % 36000)
+    return {
+        'booking_id': i + 1,
+        'email': f"user{i % n_users}@example.com",
+        'route_id': route_id,
+        'route_name': f"Town {route_id} to Town {route_id + 1}",
+        'date': day.isoformat(),
+        'seat': i % SEATS + 1,
+        'booked_at': booked_at.isoformat(timespec='seconds')
+    }
+
+
+def open_engine(path: str, routes):
+    """Storage and engine as main() sets them up; returns (seconds, engine, storage)"""
+    began = time.perf_counter()
+    storage = JournalStorage(path, durable=False, snapshot_every=10 ** 12)
+    engine = BookingEngine({r: dict(route) for r, route in routes.items()}, {}, [])
+    engine.attach_storage(storage)
+    return time.perf_counter() - began, engine, storage
+
+
+def fingerprint(engine: BookingEngine):
+    return (engine.booking_count(), engine.bookings[:1000], engine.bookings[-1000:],
+            engine.seats.state(), engine.analytics.total, engine.analytics.sold,
+            engine.analytics.bookings_per_day(), len(engine.users_with_bookings()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=1000000)
+    parser.add_argument("--tail", type=int, default=10000,
+                        help="records after the snapshot (at most snapshot_every, 10000 by default)")
+    parser.add_argument("--routes", type=int, default=100)
+    parser.add_argument("--target", type=float, default=1.0,
+                        help="seconds allowed for startup from the snapshot")
+    args = parser.parse_args()
+
+    routes = make_routes(args.routes)
+    n_users = max(1, args.records // USERS_PER_BOOKING)
+    days = (args.records + args.tail) // (args.routes * SEATS) + 1
+    first_day = Date.today() - timedelta(days=days - 7)
+    rng = random.Random(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "journal.log")
+        storage = JournalStorage(path, durable=False, snapshot_every=10 ** 12)
+        began = time.perf_counter()
+        for i in range(n_users):
+            storage.save_user(f"user{i}@example.com", {"name": f"User {i}", "password": "scrypt$x"})
+        for i in range(args.records):
+            commit = storage.save_booking(booking(i, args.routes, first_day, n_users))
+        commit.wait()
+        elapsed = time.perf_counter() - began
+        storage.close()
+        print(f"appended {n_users + args.records:,} records: "
+              f"{(n_users + args.records) / elapsed:,.0f}/s, {os.path.getsize(path) / 2 ** 20:.0f} MiB")
+
+        elapsed, engine, storage = open_engine(path, routes)
+        print(f"startup without a snapshot, full replay: {elapsed:.2f}s")
+        began = time.perf_counter()
+        storage.snapshot()
+        print(f"snapshot: {time.perf_counter() - began:.2f}s, "
+              f"{os.path.getsize(storage.snapshot_path) / 2 ** 20:.0f} MiB")
+        for i in range(args.records, args.records + args.tail):
+            if i % 10 == 0:
+                commit = storage.cancel_booking(rng.randrange(1, i))
+            else:
+                commit = storage.save_booking(booking(i, args.routes, first_day, n_users))
+        commit.wait()
+        storage.close()
+
+        elapsed, engine, storage = open_engine(path, routes)
+        storage.close()
+        print(f"startup, snapshot + {args.tail:,} tail records: {elapsed:.2f}s "
+              f"({len(engine.users):,} users, {engine.booking_count():,} bookings)")
+
+        os.remove(storage.snapshot_path)
+        replayed, full, storage = open_engine(path, routes)
+        storage.close()
+        print(f"startup, full replay of the same journal: {replayed:.2f}s")
+        if fingerprint(engine) != fingerprint(full):
+            raise SystemExit("FAILED: snapshot startup and full replay disagree")
+        if elapsed > args.target:
+            raise SystemExit(f"FAILED: startup from the snapshot took {elapsed:.2f}s, "
+                             f"target {args.target:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
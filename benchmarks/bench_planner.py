@@ -0,0 +1,68 @@
+"""Journey planner query latency on a synthetic province-sized network.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_planner --stops 300 --routes 600 --departures 8
+"""
+import argparse
+import random
+import statistics
+import time
+
+from distance_matrix import DistanceMatrix
+from journey_planner import JourneyPlanner
+from route_model import RouteTable, format_minutes
+
+
+def make_routes(n_stops: int, n_routes: int, departures: int, seed: int = 1):
+    rng = random.Random(seed)
+    coords = [(13.2 + rng.random() * 0.35, 121.8 + rng.random() * 0.3) for _ in range(n_stops)]
+    routes = {}
+    for route_id in range(1, n_routes + 1):
+        a, b = rng.sample(range(n_stops), 2)
+        times = sorted(rng.sample(range(5 * 60, 21 * 60), departures))
+        routes[route_id] = {
+            "name": f"Stop {a} to Stop {b}",
+            "start_gps": f"{coords[a][0]}, {coords[a][1]}",
+            "end_gps": f"{coords[b][0]}, {coords[b][1]}",
+            "seats": 15,
+            "schedule": ", ".join(format_minutes(t) for t in times)
+        }
+    return RouteTable.from_dicts(routes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stops", type=int, default=300)
+    parser.add_argument("--routes", type=int, default=600)
+    parser.add_argument("--departures", type=int, default=8, help="daily departures per route")
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    routes = make_routes(args.stops, args.routes, args.departures)
+    start = time.perf_counter()
+    planner = JourneyPlanner(routes, DistanceMatrix(routes))
+    build_ms = (time.perf_counter() - start) * 1000
+
+    rng = random.Random(2)
+    latencies = []
+    found = 0
+    for _ in range(args.queries):
+        origin, destination = rng.sample(planner.stops, 2)
+        depart_after = rng.randrange(5 * 60, 12 * 60)
+        start = time.perf_counter()
+        itinerary = planner.earliest_arrival(origin, destination, depart_after)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found += itinerary is not None
+
+    latencies.sort()
+    print(f"stops={len(planner.stops)} routes={args.routes} connections={len(planner.dep_time)}")
+    print(f"build: {build_ms:.1f} ms")
+    print(f"query: mean={statistics.mean(latencies):.3f} ms "
+          f"p50={latencies[len(latencies) // 2]:.3f} ms "
+          f"p99={latencies[int(len(latencies) * 0.99) - 1]:.3f} ms "
+          f"({found}/{args.queries} reachable)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Road routing: contraction hierarchy preprocessing and query latency.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_road_router --grid 30 60 100
+
+There is no OSM extract in the repository, so each run writes a made-up one:
+a ``--grid`` x ``--grid`` town plan of residential streets 250 m apart with
+a tertiary road every fifth street and a primary highway through the middle,
+two shape points per block, a tenth of the blocks missing and some streets
+one-way. It is parsed and preprocessed (timed), loaded again from the cache,
+and random point-to-point queries are timed against a plain Dijkstra over
+the same roads; every query's travel time is checked against Dijkstra's.
+"""
+import argparse
+import heapq
+import math
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from road_router import RoadRouter, _segments, read_osm
+
+SPACING_DEG = 0.00225  # about 250 m
+ORIGIN = (13.3, 121.85)
+
+
+def write_extract(path: str, size: int, rng: random.Random):
+    node_ids = {}
+
+    def node(f, lat, lon):
+        node_id = len(node_ids) + 1
+        node_ids[node_id] = None
+        f.write(f'  <node id="{node_id}" lat="{lat:.7f}" lon="{lon:.7f}"/>\n')
+        return node_id
+
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6">\n')
+        junction = {}
+        for i in range(size):
+            for j in range(size):
+                junction[i, j] = node(f, ORIGIN[0] + i * SPACING_DEG, ORIGIN[1] + j * SPACING_DEG)
+        ways = []
+        for i in range(size):
+            for j in range(size):
+                for di, dj in ((0, 1), (1, 0)):
+                    if i + di >= size or j + dj >= size or rng.random() < 0.1:
+                        continue
+                    line = i if di == 0 else j
+                    if line == size // 2:
+                        highway = "primary"
+                    elif line % 5 == 0:
+                        highway = "tertiary"
+                    else:
+                        highway = "residential"
+                    refs = [junction[i, j]]
+                    for k in (1, 2):
+                        refs.append(node(f, ORIGIN[0] + (i + di * k / 3) * SPACING_DEG + rng.uniform(-1e-4, 1e-4),
+                                         ORIGIN[1] + (j + dj * k / 3) * SPACING_DEG + rng.uniform(-1e-4, 1e-4)))
+                    refs.append(junction[i + di, j + dj])
+                    tags = {"highway": highway}
+                    if highway == "residential" and line % 3 == 1:
+                        tags["oneway"] = "yes" if line % 2 else "-1"
+                    ways.append((refs, tags))
+        for way_id, (refs, tags) in enumerate(ways, 1):
+            f.write(f'  <way id="{way_id}">\n')
+            f.writelines(f'    <nd ref="{ref}"/>\n' for ref in refs)
+            f.writelines(f'    <tag k="{k}" v="{v}"/>\n' for k, v in tags.items())
+            f.write('  </way>\n')
+        f.write('</osm>\n')
+    return len(node_ids), len(ways)
+
+
+def road_graph(path: str):
+    """Plain adjacency over junctions, keyed by coordinates, for Dijkstra"""
+    coords, ways = read_osm(path)
+    graph = {}
+    for a, b, _, seconds, direction, _ in _segments(coords, ways):
+        a, b = coords[a], coords[b]
+        if direction >= 0:
+            graph.setdefault(a, []).append((b, seconds))
+        if direction <= 0:
+            graph.setdefault(b, []).append((a, seconds))
+    return graph
+
+
+def dijkstra(graph, source, target):
+    dist = {source: 0.0}
+    queue = [(0.0, source)]
+    while queue:
+        d, u = heapq.heappop(queue)
+        if u == target:
+            return d
+        if d > dist[u]:
+            continue
+        for v, w in graph.get(u, ()):
+            if d + w < dist.get(v, math.inf):
+                dist[v] = d + w
+                heapq.heappush(queue, (d + w, v))
+    return None
+
+
+def run(size: int, queries: int, rng: random.Random, tmp: str):
+    path = os.path.join(tmp, f"grid{size}.osm")
+    n_nodes, n_ways = write_extract(path, size, rng)
+
+    start = time.perf_counter()
+    RoadRouter.open(path)
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    router = RoadRouter.open(path)
+    cached = time.perf_counter() - start
+    shortcuts = len(router.middle)
+
+    graph = road_graph(path)
+    span = (size - 1) * SPACING_DEG
+    pairs = [tuple((ORIGIN[0] + rng.uniform(0, span), ORIGIN[1] + rng.uniform(0, span))
+                   for _ in range(2)) for _ in range(queries)]
+    nodes = [(router.nearest(*a), router.nearest(*b)) for a, b in pairs]
+
+    searches, routes, plain = [], [], []
+    for (a, b), (s, t) in zip(pairs, nodes):
+        begin = time.perf_counter()
+        found = router._search(s, t)
+        searches.append(time.perf_counter() - begin)
+        begin = time.perf_counter()
+        router.route(a, b)
+        routes.append(time.perf_counter() - begin)
+        begin = time.perf_counter()
+        expected = dijkstra(graph, (router.lat[s], router.lon[s]), (router.lat[t], router.lon[t]))
+        plain.append(time.perf_counter() - begin)
+        if (found is None) != (expected is None) or (found and abs(found[0] - expected) > 1e-6):
+            raise SystemExit(f"FAILED: hierarchy and Dijkstra disagree from {a} to {b}")
+
+    print(f"{size}x{size} grid ({n_nodes:,} OSM nodes, {n_ways:,} ways, {router.n:,} junctions, "
+          f"{shortcuts:,} shortcuts): preprocess {built:.1f} s, cached load {cached:.2f} s")
+    print(f"    search {statistics.fmean(searches) * 1e6:.0f} us, route with polyline "
+          f"{statistics.fmean(routes) * 1e6:.0f} us, plain Dijkstra "
+          f"{statistics.fmean(plain) * 1e6:.0f} us (mean of {queries})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--grid", type=int, nargs="+", default=[30, 60, 100])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.grid:
+            run(size, args.queries, random.Random(args.seed), tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Memory and access time of RouteTable versus plain route dicts.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_route_model --routes 20000 --stops 5000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from route_model import RouteTable, format_minutes, parse_gps
+
+
+def make_dicts(n_routes: int, n_stops: int, departures: int, seed: int = 1):
+    rng = random.Random(seed)
+    coords = [(13.2 + rng.random() * 0.35, 121.8 + rng.random() * 0.3) for _ in range(n_stops)]
+    routes = {}
+    for route_id in range(1, n_routes + 1):
+        a, b = rng.sample(range(n_stops), 2)
+        times = sorted(rng.sample(range(5 * 60, 21 * 60), departures))
+        routes[route_id] = {
+            "name": f"Stop {a} to Stop {b}",
+            "start_gps": f"{coords[a][0]}, {coords[a][1]}",
+            "end_gps": f"{coords[b][0]}, {coords[b][1]}",
+            "seats": 15,
+            "schedule": ", ".join(format_minutes(t) for t in times)
+        }
+    return routes
+
+
+def measure(label, build):
+    # Time without tracing first; tracemalloc slows allocation-heavy code a lot
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {size / 2 ** 20:8.1f} MiB  built in {elapsed:.2f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--routes", type=int, default=20000)
+    parser.add_argument("--stops", type=int, default=5000)
+    parser.add_argument("--departures", type=int, default=10, help="daily departures per route")
+    args = parser.parse_args()
+
+    # The dict build includes its own strings, which is what the GUI held before
+    dicts = measure("dict routes (strings)",
+                    lambda: make_dicts(args.routes, args.stops, args.departures))
+    table = measure("RouteTable", lambda: RouteTable.from_dicts(dicts))
+
+    ids = list(dicts)
+    start = time.perf_counter()
+    for route_id in ids:
+        parse_gps(dicts[route_id]['start_gps'])
+        parse_gps(dicts[route_id]['end_gps'])
+    dict_us = (time.perf_counter() - start) / len(ids) * 1e6
+
+    start = time.perf_counter()
+    for route_id in ids:
+        table.coords(route_id)
+    table_us = (time.perf_counter() - start) / len(ids) * 1e6
+
+    start = time.perf_counter()
+    for route_id in ids:
+        table[route_id]['seats']
+    view_us = (time.perf_counter() - start) / len(ids) * 1e6
+
+    print(f"coords, re-parsing strings:  {dict_us:.2f} us/route")
+    print(f"coords, typed accessor:      {table_us:.2f} us/route")
+    print(f"seats, compatibility view:   {view_us:.2f} us/route")
+
+
+if __name__ == "__main__":
+    main()
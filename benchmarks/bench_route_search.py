@@ -0,0 +1,92 @@
+"""Route search: per-keystroke latency of the trie/fuzzy index.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_route_search --routes 100 500 2000
+
+Route names are "<place> to <place>" over made-up barangay names. Each
+sample types a route name one character at a time and times the search
+after every keystroke (what the booking form runs once typing pauses),
+then searches again with two letters swapped to exercise the fuzzy path.
+A plain substring scan over every name is timed for comparison.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from route_search import RouteSearch
+
+SYLLABLES = ["ba", "bu", "ca", "ga", "la", "li", "lu", "ma", "mo", "ni", "pa", "po",
+             "ra", "san", "si", "ta", "to", "ya"]
+
+
+def make_routes(n_routes: int, rng: random.Random):
+    places = list({
+        " ".join("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title()
+                 for _ in range(rng.choice((1, 1, 2))))
+        for _ in range(max(2, n_routes // 2))
+    })
+    return {
+        route_id: {"name": " to ".join(rng.sample(places, 2))}
+        for route_id in range(1, n_routes + 1)
+    }
+
+
+def typo(text: str, rng: random.Random) -> str:
+    """Swap two neighbouring letters inside one word of four letters or more"""
+    spots = [i for i in range(1, len(text) - 1)
+             if text[i - 1:i + 3].isalpha() and len(text[i - 1:i + 3]) == 4]
+    if not spots:
+        return text
+    i = rng.choice(spots)
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+
+def percentile(times, q):
+    times = sorted(times)
+    return times[min(len(times) - 1, int(len(times) * q))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--routes", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    for n in args.routes:
+        rng = random.Random(args.seed)
+        routes = make_routes(n, rng)
+        start = time.perf_counter()
+        search = RouteSearch(routes)
+        built = time.perf_counter() - start
+
+        keystrokes, typos, scans = [], [], []
+        names = [route['name'] for route in routes.values()]
+        for _ in range(args.samples):
+            name = rng.choice(names)
+            for i in range(1, len(name) + 1):
+                start = time.perf_counter()
+                search.search(name[:i])
+                keystrokes.append(time.perf_counter() - start)
+
+                text = name[:i].casefold()
+                start = time.perf_counter()
+                [other for other in names if text in other.casefold()]
+                scans.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            found = search.search(typo(name, rng))
+            typos.append(time.perf_counter() - start)
+            if not found:
+                print(f"  no match for a typo of {name!r}")
+
+        print(f"{n:>5} routes: index built in {built * 1000:.1f} ms; per keystroke "
+              f"mean {statistics.fmean(keystrokes) * 1e6:.0f} us, "
+              f"p99 {percentile(keystrokes, 0.99) * 1e6:.0f} us; with a typo "
+              f"p99 {percentile(typos, 0.99) * 1e6:.0f} us; substring scan "
+              f"mean {statistics.fmean(scans) * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Seat allocation speed, seat reuse and rolling-window memory.
+
+Books random partial rides (board at one stop, leave at a later one) on a
+single vehicle until it is full, and reports the time per allocation and how
+many more rides the bitset seat map fits than whole-trip seat counters would.
+Then simulates --days days of bookings across the booking window and reports
+how many departures stay in memory once past days are compacted.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_seats --seats 60 --segments 12
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from seat_inventory import SeatInventory
+
+
+def make_trip(seats: int, segments: int, **options):
+    routes = {
+        route_id: {"name": f"Stop {route_id} to Stop {route_id + 1}", "seats": seats}
+        for route_id in range(1, segments + 1)
+    }
+    return routes, SeatInventory(routes, [list(routes)], **options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seats", type=int, default=60)
+    parser.add_argument("--segments", type=int, default=12)
+    parser.add_argument("--attempts", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=180, help="days of operation to simulate")
+    parser.add_argument("--window", type=int, default=14, help="booking window in days")
+    args = parser.parse_args()
+
+    routes, inventory = make_trip(args.seats, args.segments)
+    route_ids = list(routes)
+    rng = random.Random(1)
+    rides = [sorted(rng.sample(range(args.segments + 1), 2)) for _ in range(args.attempts)]
+
+    sold = 0
+    start = time.perf_counter()
+    for board, leave in rides:
+        if inventory.allocate(route_ids[board:leave], inventory.today) is not None:
+            sold += 1
+    elapsed = time.perf_counter() - start
+
+    print(f"seats={args.seats} segments={args.segments} attempts={args.attempts}")
+    print(f"allocate: {elapsed / args.attempts * 1e6:.2f} us per attempt")
+    print(f"rides sold: {sold} (whole-trip seats would allow {args.seats})")
+    print(f"seats left per segment: {[routes[r]['seats'] for r in route_ids]}")
+
+    # Months of operation: every day sells rides across the open window
+    clock = [date(2026, 1, 1)]
+    routes, inventory = make_trip(args.seats, args.segments, window_days=args.window,
+                                  today=lambda: clock[0])
+    start = time.perf_counter()
+    for _ in range(args.days):
+        for travel_date in inventory.bookable_dates():
+            for _ in range(20):
+                board, leave = sorted(rng.sample(range(args.segments + 1), 2))
+                inventory.allocate(route_ids[board:leave], travel_date)
+        clock[0] += timedelta(days=1)
+    inventory.roll()
+    elapsed = time.perf_counter() - start
+    print(f"after {args.days} days: {len(inventory.departures)} open departures, "
+          f"{len(inventory.summaries)} summaries ({elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Cold start: import time, heavy modules loaded, and time to the first painted frame.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup --runs 5 --output startup-results.json
+
+Every run is a fresh interpreter. The first-paint runs need a display and
+are skipped without one.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ("numpy", "geopy", "folium", "asyncio", "webbrowser")
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import transconnect
+elapsed = time.perf_counter() - start
+print(json.dumps({"import": elapsed,
+                  "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+# What main() does up to the login screen, minus the database
+PAINT_SCRIPT = """
+import json
+import transconnect
+root = transconnect.ttk.Window()
+app = transconnect.TransConnectApp(root)
+
+def done():
+    transconnect.record_startup("first_paint")
+    print(json.dumps(transconnect.STARTUP))
+    root.destroy()
+
+transconnect.after_first_paint(root, done)
+root.mainloop()
+"""
+
+
+def run(script: str) -> dict:
+    out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                         check=True, cwd=os.getcwd())
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    imports = [run(IMPORT_SCRIPT) for _ in range(args.runs)]
+    import_times = [r["import"] for r in imports]
+    report = {
+        "import_s": statistics.median(import_times),
+        "import_min_s": min(import_times),
+        "heavy_modules_loaded": imports[-1]["loaded"],
+    }
+    print(f"import transconnect: median {report['import_s'] * 1000:.0f} ms, "
+          f"min {report['import_min_s'] * 1000:.0f} ms")
+    print(f"heavy modules loaded at import: {', '.join(report['heavy_modules_loaded']) or 'none'}")
+
+    if os.environ.get("DISPLAY") or sys.platform in ("win32", "darwin"):
+        paints = [run(PAINT_SCRIPT)["first_paint"] for _ in range(args.runs)]
+        report["first_paint_s"] = statistics.median(paints)
+        print(f"first paint of the login screen: median {report['first_paint_s'] * 1000:.0f} ms")
+    else:
+        print("skipping first-paint runs: no display")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Booking throughput with SQLite group commit, durability on and off.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_storage --threads 32 --bookings 4000
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from booking_engine import BookingEngine
+from storage import MemoryStorage, SQLiteStorage
+
+
+def make_engine(seats: int, n_users: int, storage) -> BookingEngine:
+    routes = {1: {"name": "Boac to Mogpog", "seats": seats, "schedule": "7:00 AM"}}
+    users = {
+        f"user{i}@example.com": {"name": f"User {i}", "password": "x"}
+        for i in range(n_users)
+    }
+    engine = BookingEngine(routes, users, [])
+    engine.attach_storage(storage)
+    return engine
+
+
+def run_case(label: str, storage, threads: int, total: int) -> float:
+    engine = make_engine(total, threads, storage)
+    emails = list(engine.users)
+    per_thread = total // threads
+
+    def worker(email):
+        for _ in range(per_thread):
+            engine.book(email, 1)
+
+    workers = [threading.Thread(target=worker, args=(email,)) for email in emails]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    storage.close()  # include the final flush in the timing
+    elapsed = time.perf_counter() - start
+
+    rate = per_thread * threads / elapsed
+    print(f"{label:<22} {rate:>12,.0f} bookings/s  ({elapsed:.3f}s)")
+    return rate
+
+
+def run_reload(path: str):
+    start = time.perf_counter()
+    storage = SQLiteStorage(path)
+    users, bookings, _ = storage.load()
+    storage.close()
+    elapsed = time.perf_counter() - start
+    print(f"{'reload':<22} {len(bookings):>12,} bookings in {elapsed * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--bookings", type=int, default=4000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run_case("memory only", MemoryStorage(), args.threads, args.bookings)
+        run_case("sqlite durable=False", SQLiteStorage(os.path.join(tmp, "fast.db"), durable=False),
+                 args.threads, args.bookings)
+        durable_path = os.path.join(tmp, "durable.db")
+        run_case("sqlite durable=True", SQLiteStorage(durable_path, durable=True),
+                 args.threads, args.bookings)
+        run_reload(durable_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Waitlist promotion throughput under heavy cancellation churn.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_waitlist --waiting 1000 10000 100000 --seats 50
+
+A departure is sold out, ``--waiting`` passengers join its waitlist (a
+fifth of them from remote barangays) and then random bookings are cancelled
+one after another; each cancellation frees a seat that is booked straight
+away for the next passenger in line, until the waitlist is empty. The order
+of promotions is checked against remote-first, then first-come-first-served.
+"""
+import argparse
+import random
+import time
+
+from booking_engine import BookingEngine
+from waitlist import REGULAR, REMOTE, Waitlist
+
+
+def make_engine(seats: int, n_users: int) -> BookingEngine:
+    routes = {1: {"name": "Boac to Mogpog", "seats": seats, "schedule": "7:00 AM"}}
+    users = {
+        f"user{i}@example.com": {"name": f"User {i}", "password": "x"}
+        for i in range(n_users)
+    }
+    return BookingEngine(routes, users, [])
+
+
+def run(waiting: int, seats: int, rng: random.Random):
+    engine = make_engine(seats, seats + waiting)
+    emails = list(engine.users)
+    date = engine.bookable_dates()[1]
+    active = [engine.book(email, 1, date)['booking_id'] for email in emails[:seats]]
+
+    # Straight onto the waitlist: join_waitlist() also reports the place in
+    # line, a scan of the list meant for a screen, not for 10^5 joins
+    remote = set()
+    start = time.perf_counter()
+    for email in emails[seats:]:
+        priority = REMOTE if rng.random() < 0.2 else REGULAR
+        if priority == REMOTE:
+            remote.add(email)
+        engine.waitlist.add((1, date), email, priority)
+    joined = time.perf_counter() - start
+
+    promoted = []
+    start = time.perf_counter()
+    while engine.waitlist.waiting((1, date)):
+        # Cancel a random passenger's booking; the freed seat is re-booked
+        i = rng.randrange(len(active))
+        active[i], active[-1] = active[-1], active[i]
+        for booking in engine.cancel(active.pop()):
+            active.append(booking['booking_id'])
+            promoted.append(booking['email'])
+    elapsed = time.perf_counter() - start
+
+    waitlisted = emails[seats:]
+    expected = [e for e in waitlisted if e in remote] + [e for e in waitlisted if e not in remote]
+    if promoted != expected or engine.available_seats(1, date) != 0:
+        raise SystemExit("FAILED: promotions out of order or seats lost")
+    print(f"{waiting:>7} waiting on {seats} seats: join {joined / waiting * 1e6:.1f} us, "
+          f"cancel + promote {elapsed / waiting * 1e6:.1f} us "
+          f"({waiting / elapsed:,.0f} promotions/s)")
+
+
+def heap_only(waiting: int, rng: random.Random):
+    """Waitlist alone: the O(log n) pop without the booking around it"""
+    waitlist = Waitlist()
+    for i in range(waiting):
+        waitlist.add((1, "2026-10-20"), f"user{i}", REMOTE if rng.random() < 0.2 else REGULAR)
+    start = time.perf_counter()
+    while waitlist.pop((1, "2026-10-20")) is not None:
+        pass
+    elapsed = time.perf_counter() - start
+    print(f"{waiting:>7} waiting, heap only: pop {elapsed / waiting * 1e6:.2f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--waiting", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--seats", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    for waiting in args.waiting:
+        run(waiting, args.seats, random.Random(args.seed))
+    for waiting in args.waiting:
+        heap_only(waiting, random.Random(args.seed))
+
+
+if __name__ == "__main__":
+    main()
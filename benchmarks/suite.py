@@ -0,0 +1,245 @@
+"""Benchmark suite: the main user paths at 10^3 to 10^6 users and bookings.
+
+Run from the repository root:
+
+    python -m benchmarks.suite --scales 1000 10000 100000 --output bench-results.json
+    python -m benchmarks.suite --scales 1000000 --skip-auth
+    python -m benchmarks.suite --compare old-results.json --output new-results.json
+
+For each scale the engine is seeded with that many users and bookings, then
+a sample of each operation is timed: registration and login (scrypt, so
+only a few samples), route lookup, booking, "My Bookings" retrieval, the
+paging behind the All Bookings screen and the data behind the municipality
+map. Tk screens are timed too when a display is available and skipped
+otherwise. Results are written as JSON; ``--compare`` prints the ratio
+against an earlier results file.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date as Date, datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from auth import AuthService, hash_password
+from benchmarks.bench_route_model import make_dicts
+from booking_engine import BookingEngine
+from distance_matrix import DistanceMatrix
+from map_renderer import snapshot_key
+from route_model import RouteTable
+from storage import MemoryStorage
+
+PASSWORD = "correct horse"
+
+
+class SeededStorage(MemoryStorage):
+    """Hands pre-built users and bookings to BookingEngine.attach_storage"""
+
+    def __init__(self, users: Dict[str, Dict], bookings: List[Dict], capacities: Dict[int, int]):
+        self._state = (users, bookings, capacities)
+
+    def load(self):
+        state, self._state = self._state, ({}, [], {})
+        return state
+
+
+def seed_engine(routes, n_users: int, n_bookings: int, rng: random.Random,
+                window_days: int = 14) -> BookingEngine:
+    """Engine with ``n_users`` users and ``n_bookings`` bookings in the booking window"""
+    # One hash shared by every user; hashing a million passwords would take days
+    password_hash = hash_password(PASSWORD)
+    users = {
+        f"user{i}@example.com": {"name": f"User {i}", "password": password_hash}
+        for i in range(n_users)
+    }
+    route_ids = list(routes)
+    today = Date.today()
+    dates = [(today + timedelta(days=d)).isoformat() for d in range(window_days)]
+    booked_at = datetime.now().isoformat(timespec='seconds')
+    bookings = []
+    for booking_id in range(1, n_bookings + 1):
+        route_id = rng.choice(route_ids)
+        bookings.append({
+            'booking_id': booking_id,
+            'email': f"user{rng.randrange(n_users)}@example.com",
+            'route_name': routes[route_id]['name'],
+            'date': rng.choice(dates),
+            'route_id': route_id,
+            'seat': None,
+            'booked_at': booked_at
+        })
+    # Enough seats that seeding and the booking sample never sell out
+    per_departure = n_bookings // (len(route_ids) * window_days) * 2 + 100
+    engine = BookingEngine(routes, {}, [], window_days=window_days)
+    engine.attach_storage(SeededStorage(users, bookings, {r: per_departure for r in route_ids}))
+    return engine
+
+
+def measure(name: str, scale: int, operation: Callable[[int], object], samples: int) -> Dict:
+    """Time ``operation(i)`` for i in range(samples); one result record"""
+    times = []
+    for i in range(samples):
+        start = time.perf_counter()
+        operation(i)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    result = {
+        "name": name,
+        "scale": scale,
+        "samples": samples,
+        "mean_us": statistics.fmean(times) * 1e6,
+        "p50_us": times[len(times) // 2] * 1e6,
+        "p99_us": times[min(len(times) - 1, int(len(times) * 0.99))] * 1e6,
+    }
+    print(f"{name:<22} n={scale:<9} mean {result['mean_us']:>10.1f} us   "
+          f"p50 {result['p50_us']:>10.1f} us   p99 {result['p99_us']:>10.1f} us")
+    return result
+
+
+def run_headless(scale: int, args, rng: random.Random) -> List[Dict]:
+    routes = RouteTable.from_dicts(make_dicts(args.routes, max(2, args.routes // 2), 4))
+    start = time.perf_counter()
+    engine = seed_engine(routes, scale, scale, rng)
+    print(f"-- seeded {scale} users and bookings on {args.routes} routes "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    results = []
+    emails = [f"user{rng.randrange(scale)}@example.com" for _ in range(args.samples)]
+    names = [routes.name(rng.choice(list(routes))) for _ in range(args.samples)]
+    dates = engine.bookable_dates()
+
+    if not args.skip_auth:
+        auth = AuthService(engine, workers=1)
+        results.append(measure("register", scale, lambda i: auth.register(
+            "New User", f"new{i}@example.com", PASSWORD), args.auth_samples))
+        results.append(measure("login", scale, lambda i: auth.authenticate(
+            emails[i], PASSWORD), args.auth_samples))
+        auth.close()
+
+    def lookup(i):
+        route_id = engine.find_route_id(names[i])
+        engine.available_seats(route_id, dates[i % len(dates)])
+    results.append(measure("route_lookup", scale, lookup, args.samples))
+
+    results.append(measure("book", scale, lambda i: engine.book(
+        emails[i], engine.find_route_id(names[i]), dates[i % len(dates)]), args.samples))
+
+    def my_bookings(i):
+        engine.booking_count(emails[i])
+        engine.bookings_page(0, 100, emails[i])
+    results.append(measure("my_bookings", scale, my_bookings, args.samples))
+
+    # What the All Bookings list does on open and on every scroll to a new page
+    def all_bookings_page(i):
+        start = rng.randrange(max(1, engine.booking_count() - 100))
+        engine.bookings_page(start, start + 100)
+    results.append(measure("all_bookings_page", scale, all_bookings_page, args.samples))
+
+    from transconnect import map_snapshot
+    distances = DistanceMatrix(routes)
+    results.append(measure("location_map_data", scale,
+                           lambda i: snapshot_key(map_snapshot(routes, distances)), 20))
+    results.append(measure("location_map_cold", scale, lambda i: snapshot_key(
+        map_snapshot(routes, DistanceMatrix(routes))), 5))
+    return results
+
+
+def tk_available() -> bool:
+    import tkinter
+    try:
+        tkinter.Tk().destroy()
+    except tkinter.TclError as e:
+        print(f"-- skipping Tk benchmarks: {e}")
+        return False
+    return True
+
+
+def run_tk(scale: int, args, rng: random.Random) -> List[Dict]:
+    """Screen build and refresh times, including Tk's own layout and drawing"""
+    import transconnect
+    root = transconnect.ttk.Window()
+    root.withdraw()
+    try:
+        engine = seed_engine(transconnect.ROUTES, scale, scale, rng)
+        app = transconnect.TransConnectApp(root, booking_engine=engine)
+        app.current_user = f"user{rng.randrange(scale)}@example.com"
+
+        def screen(show):
+            def operation(i):
+                show()
+                root.update()
+            return operation
+
+        return [
+            measure("tk.show_routes", scale, screen(app.show_routes), 20),
+            measure("tk.show_my_bookings", scale, screen(app.show_my_bookings), 20),
+            measure("tk.show_all_bookings", scale, screen(app.show_all_bookings), 20),
+        ]
+    finally:
+        root.destroy()
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[Dict], baseline_path: str):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["name"], r["scale"]): r for r in json.load(f)["results"]}
+    print(f"\n-- compared with {baseline_path} (p50, >1 is slower)")
+    for result in results:
+        old = baseline.get((result["name"], result["scale"]))
+        if old and old["p50_us"]:
+            ratio = result["p50_us"] / old["p50_us"]
+            flag = "  <-- slower" if ratio > 1.2 else ""
+            print(f"{result['name']:<22} n={result['scale']:<9} {ratio:6.2f}x{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="users and bookings to seed; up to 1000000")
+    parser.add_argument("--routes", type=int, default=100)
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--auth-samples", type=int, default=5)
+    parser.add_argument("--skip-auth", action="store_true", help="skip the scrypt-bound paths")
+    parser.add_argument("--no-tk", action="store_true", help="skip the Tk screen benchmarks")
+    parser.add_argument("--output", default="bench-results.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with_tk = not args.no_tk and tk_available()
+    results = []
+    for scale in args.scales:
+        rng = random.Random(args.seed)
+        results.extend(run_headless(scale, args, rng))
+        if with_tk:
+            results.extend(run_tk(scale, args, rng))
+
+    report = {
+        "time": datetime.now().isoformat(timespec='seconds'),
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {len(results)} results to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,551 @@
+"""Headless booking core shared by the Tk screens and any other front end.
+
+The engine owns every change to seat counters and booking lists so several
+terminals can book against the same inventory without overbooking.
+"""
+import itertools
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from operator import itemgetter
+from typing import Collection, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from analytics import RidershipStats
+from booking_table import BookingTable
+from indexes import BookingIndex
+from route_search import RouteSearch
+from seat_inventory import SeatInventory
+from storage import MemoryStorage, StorageError
+from waitlist import REGULAR, REMOTE, Waitlist
+
+
+# Layout of snapshot_state(); restoring any other layout falls back to a full load
+STATE_VERSION = 1
+
+
+class BookingError(Exception):
+    """Raised when a booking or seat update cannot be applied"""
+
+
+class BookingEngine:
+    def __init__(self, routes: Dict[int, Dict], users: Dict[str, Dict], bookings: Iterable[Dict],
+                 storage=None, trips: Sequence[Sequence[int]] = (), window_days: int = 14,
+                 remote_barangays: Collection[str] = ()):
+        # The engine works on the shared data structures in place, so existing
+        # readers (e.g. the Tk screens) keep seeing the live state
+        self.routes = routes
+        self.users = users
+        self.bookings = bookings if isinstance(bookings, BookingTable) else BookingTable(bookings)
+        self.storage = storage or MemoryStorage()
+
+        # Seats are assigned from per-trip, per-date bitsets; the routes' seat
+        # counters show today's seats left. ``trips`` lists through-trips as
+        # route_ids in driving order; dates up to ``window_days`` ahead can
+        # be booked
+        self.seats = SeatInventory(routes, trips, window_days=window_days)
+
+        # One lock per trip makes finding and taking a seat atomic (routes of
+        # a through-trip share a vehicle); the global lock guards the shared
+        # booking lists
+        self._lock = threading.Lock()
+        self._route_locks: Dict[tuple, threading.Lock] = {
+            key: threading.Lock() for key in self.seats.capacity
+        }
+        self._booking_ids = itertools.count(self.bookings.last_id() + 1)
+
+        # Secondary indexes are updated under the same lock as the table
+        self.index = BookingIndex(routes, self.bookings)
+        self.index.rebuild()
+        self.route_search = RouteSearch(routes)
+
+        # Dashboard statistics follow every booking and capacity change
+        self.analytics = RidershipStats(routes)
+        self.analytics.rebuild(self.bookings, self._capacities())
+
+        # Passengers waiting for sold-out departures, kept in memory only;
+        # those from remote barangays get freed seats first
+        self.waitlist = Waitlist()
+        self.remote_barangays = {name.casefold() for name in remote_barangays}
+
+    def attach_storage(self, storage):
+        """Load persisted state into the shared structures and write through to storage
+
+        Storages that keep snapshots of the engine (``load_state`` and
+        ``set_state_source``, see snapshot_state) hand back its arrays and
+        counters plus the records written since, so startup copies those in
+        instead of re-indexing every booking.
+        """
+        snapshot = storage.load_state() if hasattr(storage, 'load_state') else None
+        with self._lock:
+            stored_users = self._restore(snapshot[0], storage) if snapshot else None
+            if stored_users is not None:
+                self._replay(snapshot[1], stored_users)
+            else:
+                stored_users, stored_bookings, stored_capacities = storage.load()
+                self.bookings.clear()
+                self.bookings.extend(stored_bookings)
+                self.index.rebuild()
+                self._rebuild_counts(stored_capacities, storage)
+
+            # Seed users (e.g. the default admin) that the store does not know yet
+            for email, user in self.users.items():
+                if email not in stored_users:
+                    storage.save_user(email, user)
+            for email, user in stored_users.items():
+                self.users.setdefault(email, {}).update(user)
+
+            self._booking_ids = itertools.count(self.bookings.last_id() + 1)
+            self.storage = storage
+        if hasattr(storage, 'set_state_source'):
+            storage.set_state_source(self.snapshot_state)
+
+    def _rebuild_counts(self, capacities: Dict[int, int], storage):
+        """Seat maps and ridership counters from the indexed bookings; caller holds the lock
+
+        Bookings stored without a seat, or with one another booking holds,
+        are given one; those seats are written back to ``storage``.
+        """
+        self.seats.roll()
+        today = self.seats.today
+        # Only departures still to come need seat maps
+        upcoming = [booking for date in list(self.index.by_date) if date >= today
+                    for booking in self.index.bookings_for(date=date)]
+        per_departure = self.index.departure_counts()
+        assigned = self.seats.rebuild(upcoming, capacities, sold={
+            (date, route_id): count for (route_id, date), count in per_departure.items()
+            if date < today
+        })
+        seats_by_booking = {}
+        for booking in assigned:
+            self.bookings.set_seat(booking['booking_id'], booking['seat'])
+            if booking['seat'] is not None:
+                seats_by_booking[booking['booking_id']] = booking['seat']
+        if seats_by_booking:
+            storage.assign_seats(seats_by_booking)
+        self.analytics.load_counts(per_departure, self.bookings.hour_counts(), self._capacities())
+
+    def snapshot_state(self) -> Tuple[object, tuple]:
+        """(storage position, engine state) for the storage to write as a snapshot
+
+        Taken under every trip lock and the engine lock, so the state holds
+        exactly the writes handed to storage up to that position. It is
+        plain tuples, dicts, lists and bytes, so marshal can save it.
+        """
+        with self._route_locks_for(list(self.routes)):
+            with self._lock:
+                position = self.storage.position()
+                users = {
+                    email: (user['name'], user['password'], bool(user.get('is_admin', False)))
+                    for email, user in self.users.items()
+                }
+                state = (STATE_VERSION, users, self.bookings.state(), self.index.state(),
+                         self.seats.state(), self.analytics.state())
+        return position, state
+
+    def _restore(self, state, storage) -> Optional[Dict[str, Dict]]:
+        """Copy in a snapshot_state(); returns its users, or None if it does not fit"""
+        if not isinstance(state, tuple) or len(state) != 6 or state[0] != STATE_VERSION:
+            return None
+        _, users, bookings, index, seats, analytics = state
+        self.bookings.load_state(bookings)
+        self.index.load_state(index)
+        if not self.seats.load_state(seats):
+            # The through-trips changed since: redo the counts, with the
+            # capacities the snapshot's counters were kept at
+            self._rebuild_counts(analytics[0], storage)
+        elif not self.analytics.load_state(analytics):
+            self.analytics.load_counts(self.index.departure_counts(),
+                                       self.bookings.hour_counts(), self._capacities())
+        return {
+            email: {"name": name, "password": password, "is_admin": is_admin}
+            for email, (name, password, is_admin) in users.items()
+        }
+
+    def _replay(self, records: Iterable[tuple], users: Dict[str, Dict]):
+        """Apply records written after a snapshot, in order; caller holds the lock"""
+        for kind, value in records:
+            if kind == 'user':
+                email, user = value
+                users[email] = user
+            elif kind == 'booking':
+                if self.bookings.find(value['booking_id']) >= 0:
+                    self._forget_booking(value['booking_id'])
+                self._add_booking(value)
+                if value['route_id'] in self.routes:
+                    self.seats.occupy(value['route_id'], value['date'], value['seat'])
+            elif kind == 'cancel':
+                self._forget_booking(value)
+            elif kind == 'seats':
+                seats_by_route = {r: s for r, s in value.items() if r in self.routes}
+                try:
+                    keys = self.seats.set_capacities(seats_by_route)
+                except ValueError:
+                    # The engine validated the change when it was made;
+                    # keep the seat maps whole if they disagree now
+                    continue
+                for key in keys:
+                    for route_id in key:
+                        self.analytics.set_capacity(route_id, self.seats.capacity[key])
+            elif kind == 'booking_seats':
+                # Seats _rebuild_counts gave bookings that had none, or one
+                # another booking holds, so there is no old seat to free
+                for booking_id, seat in value.items():
+                    booking = self.bookings.get(booking_id)
+                    if booking is None or booking['seat'] == seat:
+                        continue
+                    self.bookings.set_seat(booking_id, seat)
+                    if booking['route_id'] in self.routes and booking['date'] >= self.seats.today:
+                        self.seats.occupy(booking['route_id'], booking['date'], seat)
+
+    def _forget_booking(self, booking_id: int):
+        """Replay a cancellation, releasing the seat; caller holds the lock"""
+        booking = self._remove_booking(booking_id)
+        if booking is not None and booking['route_id'] in self.routes:
+            self.seats.forget(booking['route_id'], booking['date'], booking['seat'])
+
+    def _add_booking(self, booking: Dict):
+        self.bookings.add(booking)
+        self.index.add(booking)
+        self.analytics.record(booking)
+
+    def _remove_booking(self, booking_id: int) -> Optional[Dict]:
+        booking = self.bookings.remove(booking_id)
+        if booking is not None:
+            self.index.remove(booking)
+            self.analytics.remove(booking)
+        return booking
+
+    def _route_lock(self, route_id: int) -> threading.Lock:
+        """The lock of the trip (vehicle) a route belongs to"""
+        with self._lock:
+            key = self.seats.trip_key(route_id)
+            return self._route_locks.setdefault(key, threading.Lock())
+
+    @contextmanager
+    def _route_locks_for(self, route_ids: Iterable[int]):
+        """Hold the trip locks of several routes, taken in a fixed order so
+        concurrent callers sharing vehicles cannot deadlock"""
+        with self._lock:
+            keys = sorted({self.seats.trip_key(route_id) for route_id in route_ids})
+        locks = [self._route_lock(key[0]) for key in keys]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def find_route_id(self, route_name: str) -> Optional[int]:
+        """Return the id of the route with the given name, or None"""
+        return self.index.route_id(route_name)
+
+    def search_routes(self, text: str, limit: int = 20) -> List[int]:
+        """Routes matching typed text by word prefix, tolerating typos; best first"""
+        return self.route_search.search(text, limit)
+
+    def available_seats(self, route_id: int, date: Optional[str] = None) -> int:
+        """Seats left on a route's departure on ``date`` (default today)"""
+        self.seats.roll()
+        return self.seats.available(route_id, date or self.seats.today)
+
+    def capacity(self, route_id: int) -> int:
+        """Seats per departure of the vehicle serving a route"""
+        return self.seats.capacity[self.seats.trip_key(route_id)]
+
+    def _capacities(self) -> Dict[int, int]:
+        return {route_id: self.capacity(route_id) for route_id in self.routes}
+
+    def bookable_dates(self) -> List[str]:
+        return self.seats.bookable_dates()
+
+    def _travel_date(self, date: Optional[str]) -> str:
+        try:
+            self.seats.check_date(date or self.seats.today)
+        except ValueError as e:
+            raise BookingError(str(e))
+        return date or self.seats.today
+
+    def register_user(self, name: str, email: str, password_hash: str) -> Dict:
+        """Create a passenger account; raises BookingError if the email is taken
+
+        The password must already be hashed (see auth.AuthService).
+        """
+        with self._lock:
+            if email in self.users:
+                raise BookingError("Email already registered!")
+            user = {
+                "name": name,
+                "password": password_hash
+            }
+            self.users[email] = user
+            commit = self.storage.save_user(email, user)
+        commit.wait()
+        return user
+
+    def set_password(self, email: str, password_hash: str):
+        """Replace a user's stored password hash"""
+        with self._lock:
+            if email not in self.users:
+                raise BookingError("Unknown user!")
+            self.users[email]['password'] = password_hash
+            commit = self.storage.save_user(email, self.users[email])
+        commit.wait()
+
+    def _record_booking(self, email: str, route_id: int, date: str, seat: int):
+        """Add a booking for a seat already taken; caller holds the route lock"""
+        with self._lock:
+            booking = {
+                'booking_id': next(self._booking_ids),
+                'email': email,
+                'route_name': self.routes[route_id]['name'],
+                'date': date,
+                'route_id': route_id,
+                'seat': seat,
+                'booked_at': datetime.now().isoformat(timespec='seconds')
+            }
+            self._add_booking(booking)
+        return booking, self.storage.save_booking(booking)
+
+    def book(self, email: str, route_id: int, date: Optional[str] = None) -> Dict:
+        """Reserve one seat on a route's departure on ``date`` (default today)"""
+        if email not in self.users:
+            raise BookingError("Unknown user!")
+        if route_id not in self.routes:
+            raise BookingError("Please select a route!")
+        date = self._travel_date(date)
+
+        with self._route_lock(route_id):
+            seat = self.seats.allocate([route_id], date)
+            if seat is None:
+                raise BookingError("No seats available!")
+
+            # Queue the write while holding the route lock so seat counters
+            # reach storage in order, but wait for the commit outside of it
+            # so concurrent bookings can share one group commit
+            booking, commit = self._record_booking(email, route_id, date, seat)
+        if self.storage.durable:
+            try:
+                commit.wait()
+            except StorageError as e:
+                self._undo_bookings([booking])
+                raise BookingError(f"The booking could not be saved, please try again ({e})")
+        return booking
+
+    def book_journey(self, email: str, route_ids: List[int],
+                     date: Optional[str] = None) -> List[Dict]:
+        """Book every leg of a same-day multi-leg itinerary, or none of them"""
+        if email not in self.users:
+            raise BookingError("Unknown user!")
+        for route_id in route_ids:
+            if route_id not in self.routes:
+                raise BookingError(f"Unknown route {route_id}!")
+        date = self._travel_date(date)
+
+        with self._route_locks_for(route_ids):
+            # Consecutive legs on one through-trip keep the same seat
+            seats = []
+            for run in self.seats.runs(route_ids):
+                seat = self.seats.allocate(run, date)
+                if seat is None:
+                    for taken_run, taken_seat in seats:
+                        self.seats.release(taken_run, date, taken_seat)
+                    raise BookingError(f"No seats available on {self.routes[run[0]]['name']}!")
+                seats.append((run, seat))
+
+            journey = []
+            commits = []
+            for run, seat in seats:
+                for route_id in run:
+                    booking, commit = self._record_booking(email, route_id, date, seat)
+                    commits.append(commit)
+                    journey.append(booking)
+
+        if self.storage.durable:
+            saved, error = [], None
+            for booking, commit in zip(journey, commits):
+                try:
+                    commit.wait()
+                    saved.append(booking)
+                except StorageError as e:
+                    error = e
+            if error is not None:
+                # All legs or none: take back the ones that did reach storage too
+                self._undo_bookings(journey, saved)
+                raise BookingError(f"The journey could not be saved, please try again ({error})")
+        return journey
+
+    def _undo_bookings(self, bookings: List[Dict], saved: Sequence[Dict] = ()):
+        """Take back bookings whose writes failed and free their seats;
+        those in ``saved`` did reach storage and are cancelled there"""
+        saved_ids = {booking['booking_id'] for booking in saved}
+        with self._route_locks_for([booking['route_id'] for booking in bookings]):
+            for booking in bookings:
+                with self._lock:
+                    if self._remove_booking(booking['booking_id']) is None:
+                        continue
+                    if booking['booking_id'] in saved_ids:
+                        self.storage.cancel_booking(booking['booking_id'])
+                self.seats.release([booking['route_id']], booking['date'], booking['seat'])
+
+    def cancel(self, booking_id: int, email: Optional[str] = None) -> List[Dict]:
+        """Cancel a booking and give its seat to the next waitlisted passenger
+
+        With ``email``, only that user's own bookings can be cancelled.
+        Returns the bookings made for promoted passengers.
+        """
+        with self._lock:
+            booking = self.bookings.get(booking_id)
+        if booking is None or (email is not None and booking['email'] != email):
+            raise BookingError("Booking not found!")
+        self.seats.roll()
+        if booking['date'] < self.seats.today:
+            raise BookingError("Cannot cancel a past departure!")
+
+        route_id, date = booking['route_id'], booking['date']
+        with self._route_lock(route_id):
+            with self._lock:
+                # Someone else may have cancelled it while we waited for the lock
+                if self._remove_booking(booking_id) is None:
+                    raise BookingError("Booking not found!")
+                commits = [self.storage.cancel_booking(booking_id)]
+            if booking['seat']:
+                self.seats.release([route_id], date, booking['seat'])
+            promoted = self._promote(route_id, date, commits)
+
+        for commit in commits:
+            commit.wait()
+        return promoted
+
+    def _priority(self, barangay: Optional[str]) -> int:
+        return REMOTE if barangay and barangay.strip().casefold() in self.remote_barangays else REGULAR
+
+    def join_waitlist(self, email: str, route_id: int, date: Optional[str] = None,
+                      barangay: Optional[str] = None) -> int:
+        """Wait for a seat on a sold-out departure; returns the place in line
+
+        Passengers whose home ``barangay`` is one of the remote barangays are
+        served before everyone else, then in the order they joined.
+        """
+        if email not in self.users:
+            raise BookingError("Unknown user!")
+        if route_id not in self.routes:
+            raise BookingError("Please select a route!")
+        date = self._travel_date(date)
+
+        with self._route_lock(route_id):
+            if self.seats.available(route_id, date):
+                raise BookingError("Seats are still available, please book directly!")
+            with self._lock:
+                self.waitlist.drop_before(self.seats.today)
+                if not self.waitlist.add((route_id, date), email, self._priority(barangay)):
+                    raise BookingError("You are already on the waitlist for this departure!")
+                return self.waitlist.position((route_id, date), email)
+
+    def leave_waitlist(self, email: str, route_id: int, date: str):
+        with self._lock:
+            if not self.waitlist.remove((route_id, date), email):
+                raise BookingError("You are not on the waitlist for this departure!")
+
+    def waitlist_entries(self, email: str) -> List[Dict]:
+        """A passenger's waitlisted departures with their place in line"""
+        with self._lock:
+            self.waitlist.drop_before(self.seats.today)
+            return [
+                {
+                    'route_id': route_id,
+                    'route_name': self.routes[route_id]['name'],
+                    'date': date,
+                    'position': self.waitlist.position((route_id, date), email)
+                }
+                for route_id, date in sorted(self.waitlist.waiting_for(email),
+                                             key=itemgetter(1, 0))
+            ]
+
+    def _promote(self, route_id: int, date: str, commits: List) -> List[Dict]:
+        """Book waitlisted passengers into free seats; caller holds the route lock"""
+        promoted = []
+        while self.waitlist.waiting((route_id, date)):
+            seat = self.seats.allocate([route_id], date)
+            if seat is None:
+                break
+            with self._lock:
+                email = self.waitlist.pop((route_id, date))
+            if email is None or email not in self.users:
+                self.seats.release([route_id], date, seat)
+                continue
+            booking, commit = self._record_booking(email, route_id, date, seat)
+            commits.append(commit)
+            promoted.append(booking)
+        return promoted
+
+    def set_seats(self, route_id: int, seats: int):
+        """Set the seats per departure on a route, for today and future dates"""
+        self.set_seats_bulk({route_id: seats})
+
+    def set_seats_bulk(self, seats_by_route: Dict[int, int]):
+        """Set the seats per departure of many routes in one transaction
+
+        Every change is validated first; if any is rejected nothing changes.
+        """
+        for route_id, seats in seats_by_route.items():
+            if route_id not in self.routes:
+                raise BookingError(f"Unknown route {route_id}!")
+            if seats < 0:
+                raise BookingError("Seats cannot be negative!")
+        if not seats_by_route:
+            return
+
+        with self._route_locks_for(seats_by_route):
+            # Changing the seats on one route resizes its whole vehicle
+            try:
+                keys = self.seats.set_capacities(seats_by_route)
+            except ValueError as e:
+                raise BookingError(str(e))
+            changed = {route_id: self.seats.capacity[key] for key in keys for route_id in key}
+            for route_id, seats in changed.items():
+                self.analytics.set_capacity(route_id, seats)
+            commits = [self.storage.save_seats(changed)]
+
+            # Added seats go to anyone waiting for those routes
+            with self._lock:
+                waiting = [d for d in self.waitlist.departures() if d[0] in changed]
+            for route_id, date in waiting:
+                if date >= self.seats.today:
+                    self._promote(route_id, date, commits)
+        for commit in commits:
+            commit.wait()
+
+    def seat_map(self, route_id: int, date: Optional[str] = None) -> List[bool]:
+        """Per seat, whether it is still free on a route's departure"""
+        with self._route_lock(route_id):
+            return self.seats.free_seats(route_id, date or self.seats.today)
+
+    def user_bookings(self, email: str) -> List[Dict]:
+        with self._lock:
+            return self.index.bookings_for(email=email)
+
+    def booking_count(self, email: Optional[str] = None) -> int:
+        """Number of bookings system-wide, or for one user"""
+        with self._lock:
+            if email is None:
+                return len(self.bookings)
+            return len(self.index.user_booking_ids(email))
+
+    def bookings_page(self, start: int, stop: int, email: Optional[str] = None) -> List[Dict]:
+        """Slice of the booking list (system-wide or one user's) for paged views"""
+        with self._lock:
+            if email is None:
+                return self.bookings[start:stop]
+            return [self.bookings.get(booking_id)
+                    for booking_id in self.index.user_booking_ids(email)[start:stop]]
+
+    def bookings_for(self, route_id: Optional[int] = None, date: Optional[str] = None,
+                     email: Optional[str] = None) -> List[Dict]:
+        """Indexed booking query, e.g. all passengers on a route on a date"""
+        with self._lock:
+            return self.index.bookings_for(route_id=route_id, date=date, email=email)
+
+    def users_with_bookings(self) -> List[str]:
+        with self._lock:
+            return self.index.users_with_bookings()
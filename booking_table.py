@@ -0,0 +1,303 @@
+"""Compact column store of bookings, kept in booking_id order.
+
+Bookings live in typed column arrays, one row per booking: emails, dates
+and route names as codes into a list of their distinct strings and
+``booked_at`` as seconds. A million bookings then take a few arrays instead
+of a million dicts, and the columns turn into bytes and back in one copy
+each, which is what lets the engine snapshot and restore them quickly.
+``BookingTable`` is also a sequence of booking dicts, made on access, for
+code that reads bookings as dicts; changes go through the table.
+
+Removing a booking only marks its row dead, since closing the gap would
+move every later row of every column; dead rows are dropped in one pass
+once they are a thirty-second of the table.
+"""
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from collections.abc import Sequence
+from datetime import date as Date, datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set
+
+
+def stamp_seconds(booked_at: str) -> int:
+    """Seconds since 0001-01-01 of a "YYYY-MM-DDTHH:MM:SS" timestamp
+
+    Divided by 3600 or 86400 this gives the hour and day numbers the
+    ridership counters use.
+    """
+    moment = datetime.fromisoformat(booked_at)
+    return moment.toordinal() * 86400 + moment.hour * 3600 + moment.minute * 60 + moment.second
+
+
+# "HH:MM" of every minute and ":SS" of every second of a day
+_CLOCK = [f"{minute // 60:02d}:{minute % 60:02d}" for minute in range(24 * 60)]
+_SECONDS = [f":{second:02d}" for second in range(60)]
+
+
+@lru_cache(maxsize=4096)
+def _day_iso(day: int) -> str:
+    return Date.fromordinal(day).isoformat()
+
+
+def format_stamp(seconds: int) -> str:
+    # Bookings are read back a page at a time; a datetime per row would
+    # cost more than the rest of the row together
+    day, rest = divmod(seconds, 86400)
+    minute, second = divmod(rest, 60)
+    return _day_iso(day) + "T" + _CLOCK[minute] + _SECONDS[second]
+
+
+class StringCodes:
+    """Distinct strings of one column, each with a small integer code"""
+
+    def __init__(self, values: Iterable[str] = ()):
+        self.values: List[str] = list(values)
+        self.codes: Dict[str, int] = {value: code for code, value in enumerate(self.values)}
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class BookingTable(Sequence):
+    """Array-backed bookings, usable as a list of booking dicts"""
+
+    def __init__(self, bookings: Iterable[Dict] = ()):
+        self.ids = array('q')
+        self.route_ids = array('i')
+        self.seats = array('i')     # 0 = no seat assigned
+        self.stamps = array('q')    # booked_at as stamp_seconds(), 0 = unknown
+        self.email_codes = array('i')
+        self.date_codes = array('i')
+        self.name_codes = array('i')
+        self.emails = StringCodes()
+        self.dates = StringCodes()
+        self.route_names = StringCodes()
+        # booked_at strings that the seconds would not give back unchanged
+        self._odd_stamps: Dict[int, str] = {}
+        # Rows of removed bookings, sorted, until _compact() drops them
+        self._dead: List[int] = []
+        self._dead_rows: Set[int] = set()
+        self._columns = (self.ids, self.route_ids, self.seats, self.stamps,
+                         self.email_codes, self.date_codes, self.name_codes)
+        self.extend(bookings)
+
+    def _stamp(self, booking_id: int, booked_at: Optional[str]) -> int:
+        stamp = 0
+        if booked_at:
+            try:
+                stamp = stamp_seconds(booked_at)
+            except ValueError:
+                pass
+            if len(booked_at) != 19 or booked_at[10] != 'T' or not stamp:
+                self._odd_stamps[booking_id] = booked_at
+        return stamp
+
+    def _values(self, booking: Dict) -> tuple:
+        return (booking['booking_id'], booking['route_id'], booking.get('seat') or 0,
+                self._stamp(booking['booking_id'], booking.get('booked_at')),
+                self.emails.code(booking['email']), self.dates.code(booking['date']),
+                self.route_names.code(booking['route_name']))
+
+    def _rows(self, start: int, stop: int) -> List[Dict]:
+        """Live rows from ``start`` up to ``stop`` as dicts, a column slice at a time"""
+        emails, names, dates = self.emails.values, self.route_names.values, self.dates.values
+        odd_stamps, dead = self._odd_stamps, self._dead_rows
+        return [
+            {
+                'booking_id': booking_id,
+                'email': emails[email],
+                'route_name': names[name],
+                'date': dates[date],
+                'route_id': route_id,
+                'seat': seat or None,
+                'booked_at': odd_stamps.get(booking_id) or (format_stamp(stamp) if stamp else None)
+            }
+            for row, booking_id, route_id, seat, stamp, email, date, name in zip(
+                range(start, stop), *[column[start:stop] for column in self._columns])
+            if row not in dead
+        ]
+
+    def _row(self, row: int) -> Dict:
+        booking_id, stamp = self.ids[row], self.stamps[row]
+        return {
+            'booking_id': booking_id,
+            'email': self.emails.values[self.email_codes[row]],
+            'route_name': self.route_names.values[self.name_codes[row]],
+            'date': self.dates.values[self.date_codes[row]],
+            'route_id': self.route_ids[row],
+            'seat': self.seats[row] or None,
+            'booked_at': self._odd_stamps.get(booking_id) or (format_stamp(stamp) if stamp else None)
+        }
+
+    # Sequence protocol (compatibility view)
+
+    def __len__(self):
+        return len(self.ids) - len(self._dead)
+
+    def _position_row(self, position: int) -> int:
+        """Row of the live booking at ``position``"""
+        row = position
+        while True:
+            moved = position + bisect_right(self._dead, row)
+            if moved == row:
+                return row
+            row = moved
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[position] for position in range(start, stop, step)]
+            if start >= stop:
+                return []
+            return self._rows(self._position_row(start), self._position_row(stop - 1) + 1)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("booking index out of range")
+        return self._row(self._position_row(index))
+
+    def __iter__(self):
+        for start in range(0, len(self.ids), 1024):
+            yield from self._rows(start, start + 1024)
+
+    # Lookups by booking_id
+
+    def find(self, booking_id: int) -> int:
+        """Row of a booking, or -1"""
+        row = bisect_left(self.ids, booking_id)
+        if row < len(self.ids) and self.ids[row] == booking_id and row not in self._dead_rows:
+            return row
+        return -1
+
+    def get(self, booking_id: int) -> Optional[Dict]:
+        row = self.find(booking_id)
+        return self._row(row) if row >= 0 else None
+
+    def last_id(self) -> int:
+        row = len(self.ids) - 1
+        while row in self._dead_rows:
+            row -= 1
+        return self.ids[row] if row >= 0 else 0
+
+    # Changes
+
+    def add(self, booking: Dict):
+        """Add a booking; one stored again under the same booking_id replaces it"""
+        values = self._values(booking)
+        booking_id = values[0]
+        if not self.ids or booking_id > self.ids[-1]:
+            for column, value in zip(self._columns, values):
+                column.append(value)
+            return
+        row = bisect_left(self.ids, booking_id)
+        if self.ids[row] == booking_id:
+            for column, value in zip(self._columns, values):
+                column[row] = value
+            if row in self._dead_rows:
+                self._dead_rows.remove(row)
+                self._dead.remove(row)
+            return
+        # Concurrent writers can store bookings slightly out of id order;
+        # rows after this one move, so drop the dead ones first
+        self._compact()
+        row = bisect_left(self.ids, booking_id)
+        for column, value in zip(self._columns, values):
+            column.insert(row, value)
+
+    def extend(self, bookings: Iterable[Dict]):
+        bookings = list(bookings)
+        ids = [booking['booking_id'] for booking in bookings]
+        if (self.ids and ids and ids[0] <= self.ids[-1]) or any(a >= b for a, b in zip(ids, ids[1:])):
+            for booking in bookings:
+                self.add(booking)
+            return
+        # Ascending ids past the end, as storage loads them: fill column by column
+        self.ids.extend(ids)
+        self.route_ids.extend([booking['route_id'] for booking in bookings])
+        self.seats.extend([booking.get('seat') or 0 for booking in bookings])
+        self.stamps.extend([self._stamp(booking['booking_id'], booking.get('booked_at'))
+                            for booking in bookings])
+        self.email_codes.extend([self.emails.code(booking['email']) for booking in bookings])
+        self.date_codes.extend([self.dates.code(booking['date']) for booking in bookings])
+        self.name_codes.extend([self.route_names.code(booking['route_name'])
+                                for booking in bookings])
+
+    def remove(self, booking_id: int) -> Optional[Dict]:
+        """Remove a booking; returns it, or None if there is no such booking"""
+        row = self.find(booking_id)
+        if row < 0:
+            return None
+        booking = self._row(row)
+        insort(self._dead, row)
+        self._dead_rows.add(row)
+        self._odd_stamps.pop(booking_id, None)
+        if len(self._dead) > 64 + len(self.ids) // 32:
+            self._compact()
+        return booking
+
+    def _compact(self):
+        """Drop dead rows from every column, copying the live runs between them"""
+        if not self._dead:
+            return
+        runs = []
+        start = 0
+        for row in self._dead + [len(self.ids)]:
+            if start < row:
+                runs.append((start, row))
+            start = row + 1
+        for column in self._columns:
+            compacted = array(column.typecode)
+            for start, stop in runs:
+                compacted += column[start:stop]
+            column[:] = compacted
+        self._dead = []
+        self._dead_rows = set()
+
+    def set_seat(self, booking_id: int, seat: Optional[int]):
+        row = self.find(booking_id)
+        if row < 0:
+            raise KeyError(booking_id)
+        self.seats[row] = seat or 0
+
+    def clear(self):
+        for column in self._columns:
+            del column[:]
+        self._odd_stamps.clear()
+        self._dead = []
+        self._dead_rows = set()
+
+    # Bulk reads
+
+    def hour_counts(self) -> Dict[int, int]:
+        """Bookings per hour they were made in, by stamp_seconds() // 3600"""
+        self._compact()
+        return Counter(stamp // 3600 for stamp in self.stamps if stamp)
+
+    # Snapshots
+
+    def state(self) -> tuple:
+        """The columns as bytes and lists, for marshal"""
+        self._compact()
+        return (tuple(column.tobytes() for column in self._columns),
+                list(self.emails.values), list(self.dates.values), list(self.route_names.values),
+                dict(self._odd_stamps))
+
+    def load_state(self, state: tuple):
+        """Replace every row with those of a state()"""
+        columns, emails, dates, route_names, odd_stamps = state
+        for column, data in zip(self._columns, columns):
+            del column[:]
+            column.frombytes(data)
+        self.emails = StringCodes(emails)
+        self.dates = StringCodes(dates)
+        self.route_names = StringCodes(route_names)
+        self._odd_stamps = dict(odd_stamps)
+        self._dead = []
+        self._dead_rows = set()
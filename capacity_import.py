@@ -0,0 +1,57 @@
+"""Bulk import of seats per departure from CSV.
+
+The file needs a header row with a ``seats`` column and either ``route_id``
+or ``route`` (the route name), e.g.
+
+    route_id,seats
+    1,18
+    2,18
+
+Every row is checked before anything is returned, so a bad file is rejected
+as a whole with the line numbers of its problems instead of being applied
+halfway.
+"""
+import csv
+from typing import Callable, Dict, Iterable, Optional
+
+MAX_REPORTED_ERRORS = 10
+
+
+def read_capacity_csv(lines: Iterable[str],
+                      find_route_id: Callable[[str], Optional[int]],
+                      known_route: Callable[[int], bool]) -> Dict[int, int]:
+    """Parse capacity rows into {route_id: seats}; raises ValueError listing bad rows"""
+    reader = csv.DictReader(lines)
+    fields = {name.strip().lower() for name in reader.fieldnames or ()}
+    if "seats" not in fields or not fields & {"route_id", "route"}:
+        raise ValueError("CSV needs a header with 'seats' and 'route_id' or 'route' columns")
+
+    seats_by_route: Dict[int, int] = {}
+    errors = []
+    for row in reader:
+        row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+        line = reader.line_num
+        try:
+            if row.get("route_id"):
+                route_id = int(row["route_id"])
+                if not known_route(route_id):
+                    raise ValueError(f"unknown route {route_id}")
+            else:
+                route_id = find_route_id(row.get("route", ""))
+                if route_id is None:
+                    raise ValueError(f"unknown route {row.get('route', '')!r}")
+            seats = int(row["seats"])
+            if seats < 0:
+                raise ValueError("seats cannot be negative")
+        except (KeyError, ValueError) as e:
+            errors.append(f"line {line}: {e}")
+            continue
+        if seats_by_route.get(route_id, seats) != seats:
+            errors.append(f"line {line}: route {route_id} listed twice with different seats")
+        seats_by_route[route_id] = seats
+
+    if errors:
+        more = len(errors) - MAX_REPORTED_ERRORS
+        raise ValueError("\n".join(errors[:MAX_REPORTED_ERRORS])
+                         + (f"\n...and {more} more" if more > 0 else ""))
+    return seats_by_route
@@ -0,0 +1,91 @@
+"""Precomputed stop-to-stop distance and ETA tables for all route stops.
+
+Stops come from the route table's stop table, whose coordinates are already
+floats, and the full great-circle distance matrix is computed with one
+vectorized haversine call; screens then read distances and travel times by
+lookup.
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from route_model import RouteTable
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_matrix(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Pairwise great-circle distances in km between all points"""
+    lat = np.radians(lats)[:, None]
+    lon = np.radians(lons)[:, None]
+    dlat = lat - lat.T
+    dlon = lon - lon.T
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class DistanceMatrix:
+    """Stop-to-stop distance (km) and ETA (minutes) tables over ROUTES
+
+    Straight-line distance is scaled by ``road_factor`` to approximate road
+    distance, and ETA assumes ``average_speed_kmh``. The tables are rebuilt
+    only when the set of routes or their coordinates change.
+    """
+
+    def __init__(self, routes: RouteTable, average_speed_kmh: float = 30.0,
+                 road_factor: float = 1.3):
+        self.routes = routes
+        self.average_speed_kmh = average_speed_kmh
+        self.road_factor = road_factor
+        self._fingerprint = None
+        self.stops: List[str] = []
+        self.stop_index: Dict[str, int] = {}
+        self.route_stops: Dict[int, Tuple[int, int]] = {}
+        self.points = np.zeros((0, 2))
+        self.distances_km = np.zeros((0, 0))
+        self.eta_minutes = np.zeros((0, 0))
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """Rebuild the tables if the route set changed; returns True if rebuilt"""
+        if self.routes.version == self._fingerprint:
+            return False
+
+        stops = self.routes.stops
+        # np.array copies the float arrays, so the stop table stays resizable
+        points = np.column_stack((
+            np.array(stops.lat, dtype=float),
+            np.array(stops.lon, dtype=float)
+        )).reshape(-1, 2)
+        self.distances_km = haversine_matrix(points[:, 0], points[:, 1]) * self.road_factor
+        self.eta_minutes = self.distances_km / self.average_speed_kmh * 60.0
+        self.points = points
+        self.stops = list(stops.names)
+        self.stop_index = dict(stops.index)
+        self.route_stops = {route_id: self.routes.endpoint_ids(route_id) for route_id in self.routes}
+        self._fingerprint = self.routes.version
+        return True
+
+    def distance_km(self, origin: str, destination: str) -> float:
+        return float(self.distances_km[self.stop_index[origin], self.stop_index[destination]])
+
+    def eta(self, origin: str, destination: str) -> float:
+        return float(self.eta_minutes[self.stop_index[origin], self.stop_index[destination]])
+
+    def route_distance_km(self, route_id: int) -> float:
+        i, j = self.route_stops[route_id]
+        return float(self.distances_km[i, j])
+
+    def route_eta_minutes(self, route_id: int) -> float:
+        i, j = self.route_stops[route_id]
+        return float(self.eta_minutes[i, j])
+
+    def describe_route(self, route_id: int) -> str:
+        """Short "12.3 km · ~25 min" text for screens"""
+        return format_trip(self.route_distance_km(route_id), self.route_eta_minutes(route_id))
+
+
+def format_trip(distance_km: float, eta_minutes: float) -> str:
+    hours, minutes = divmod(int(round(eta_minutes)), 60)
+    eta = f"{hours} h {minutes} min" if hours else f"{minutes} min"
+    return f"{distance_km:.1f} km · ~{eta}"
@@ -0,0 +1,93 @@
+"""Streaming export of bookings and users to CSV or JSONL, optionally gzipped.
+
+Rows come from generators (a page at a time from the engine, or a cursor over
+the SQLite database) and are written one by one, so memory stays flat however
+many bookings there are. The output format follows the file name
+(``.csv``, ``.jsonl``, either with ``.gz``) unless given explicitly.
+"""
+import csv
+import gzip
+import json
+import os
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence
+
+BOOKING_FIELDS = ("booking_id", "email", "route_id", "route_name", "date", "seat", "booked_at")
+# Password hashes never leave the system
+USER_FIELDS = ("email", "name", "is_admin", "bookings")
+
+FORMATS = ("csv", "jsonl")
+
+
+def booking_matches(booking: Dict, route_id: Optional[int] = None,
+                    date_from: Optional[str] = None, date_to: Optional[str] = None) -> bool:
+    """Route and inclusive date-range filter (ISO dates compare as strings)"""
+    return ((route_id is None or booking['route_id'] == route_id)
+            and (date_from is None or booking['date'] >= date_from)
+            and (date_to is None or booking['date'] <= date_to))
+
+
+def engine_bookings(engine, route_id: Optional[int] = None, date_from: Optional[str] = None,
+                    date_to: Optional[str] = None, page_size: int = 1000) -> Iterator[Dict]:
+    """Bookings from a live BookingEngine, copied one page at a time"""
+    start = 0
+    while True:
+        page = engine.bookings_page(start, start + page_size)
+        if not page:
+            return
+        for booking in page:
+            if booking_matches(booking, route_id, date_from, date_to):
+                yield booking
+        start += len(page)
+
+
+def engine_users(engine) -> Iterator[Dict]:
+    for email in list(engine.users):
+        user = engine.users.get(email)
+        if user is not None:
+            yield {
+                "email": email,
+                "name": user["name"],
+                "is_admin": bool(user.get("is_admin", False)),
+                "bookings": engine.booking_count(email)
+            }
+
+
+def detect_format(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    return "jsonl" if name.endswith((".jsonl", ".json")) else "csv"
+
+
+def write_rows(rows: Iterable[Dict], fields: Sequence[str], path: str,
+               fmt: Optional[str] = None, compress: Optional[bool] = None,
+               progress: Optional[Callable[[int], None]] = None) -> int:
+    """Stream rows to ``path``; returns the number of rows written"""
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}")
+    compress = path.endswith(".gz") if compress is None else compress
+
+    # Write next to the final name and rename, so a failed export leaves no half file
+    tmp_path = path + ".tmp"
+    opener = gzip.open if compress else open
+    count = 0
+    try:
+        with opener(tmp_path, "wt", newline="", encoding="utf-8") as out:
+            if fmt == "csv":
+                writer = csv.DictWriter(out, fieldnames=fields, extrasaction="ignore")
+                writer.writeheader()
+                write = writer.writerow
+            else:
+                def write(row):
+                    out.write(json.dumps({field: row.get(field) for field in fields}))
+                    out.write("\n")
+            for row in rows:
+                write(row)
+                count += 1
+                if progress is not None and count % 10000 == 0:
+                    progress(count)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
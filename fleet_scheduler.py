@@ -0,0 +1,330 @@
+"""Fleet scheduling: chain the day's departures into one block per vehicle.
+
+Every scheduled departure of every route is a trip, expecting the route's
+mean daily bookings split over its departures. ``FleetScheduler.schedule``
+assigns the trips to a fleet of vehicles, each with a seat capacity and a
+depot town. It minimises a cost in kilometres:
+- empty running (deadhead) out of the depot, between trips and back;
+- ``missed_trip_km`` for each timetabled departure left unrun;
+- ``unmet_passenger_km`` for each expected passenger who does not fit,
+  multiplied by ``remote_weight`` on trips to or from one of the
+  ``remote_stops`` (the towns remote barangays are reached through).
+
+It is a heuristic in two passes, fast enough for hundreds of vehicles and
+thousands of trips:
+
+1. Trips are taken in departure order. Idle vehicles are kept in lists per
+   (stop, capacity), sorted by when each becomes free. Finding the vehicle
+   at a stop that is free latest but can still reach a trip's origin in
+   time is one bisect per list. The cheapest such vehicle takes the trip;
+   among equally cheap ones, the smallest vehicle that carries everyone.
+2. Trips still unrun are taken most valuable first, so remote passengers
+   come before the rest. Each is tried in every vehicle's block: in a gap
+   if there is one wide enough, otherwise by bumping the cheaper trips
+   around that slot. It goes wherever that lowers the total cost most, and
+   bumped trips get their own turn.
+"""
+import csv
+import heapq
+import math
+from bisect import bisect_left, bisect_right, insort
+from operator import attrgetter
+from typing import Callable, Collection, Dict, Iterable, Iterator, List, NamedTuple
+
+from distance_matrix import DistanceMatrix
+from route_model import RouteTable, format_minutes
+
+# Vehicles leave their depot from midnight on
+START_OF_DAY = 0
+MAX_REPORTED_ERRORS = 10
+
+BLOCK_FIELDS = ("vehicle_id", "capacity", "depot", "trip", "route_id", "route_name",
+                "departure", "arrival", "expected_passengers", "deadhead_km")
+
+
+class Vehicle(NamedTuple):
+    vehicle_id: str
+    capacity: int
+    depot: str
+
+
+class Trip(NamedTuple):
+    trip_id: int
+    route_id: int
+    origin: int        # stop ids
+    destination: int
+    departure: int     # minutes since midnight
+    arrival: int
+    demand: float      # expected passengers
+    remote: bool
+
+
+class Block(NamedTuple):
+    vehicle: Vehicle
+    trips: List[Trip]
+    deadhead_km: float
+
+
+class FleetSchedule(NamedTuple):
+    blocks: List[Block]    # only vehicles that run at least one trip
+    unserved: List[Trip]
+    deadhead_km: float
+    unmet: float           # expected passengers left behind, remote ones included
+    unmet_remote: float
+
+    def summary(self) -> str:
+        trips = sum(len(block.trips) for block in self.blocks)
+        return (f"{len(self.blocks)} vehicles run {trips} trips "
+                f"({len(self.unserved)} not run), {self.deadhead_km:.0f} km empty running\n"
+                f"{self.unmet:.0f} expected passengers left behind, "
+                f"{self.unmet_remote:.0f} of them in remote areas")
+
+
+def daily_demand(bookings: Iterable[Dict]) -> Dict[int, float]:
+    """Mean bookings per travel day for each route, over the days in the history"""
+    counts: Dict[int, int] = {}
+    dates = set()
+    for booking in bookings:
+        counts[booking['route_id']] = counts.get(booking['route_id'], 0) + 1
+        dates.add(booking['date'])
+    days = len(dates) or 1
+    return {route_id: count / days for route_id, count in counts.items()}
+
+
+def read_fleet_csv(lines: Iterable[str], known_stop: Callable[[str], bool]) -> List[Vehicle]:
+    """Parse ``vehicle_id,capacity,depot`` rows; raises ValueError listing bad rows"""
+    reader = csv.DictReader(lines)
+    fields = {name.strip().lower() for name in reader.fieldnames or ()}
+    if not {"vehicle_id", "capacity", "depot"} <= fields:
+        raise ValueError("CSV needs a header with 'vehicle_id', 'capacity' and 'depot' columns")
+
+    fleet: List[Vehicle] = []
+    seen = set()
+    errors = []
+    for row in reader:
+        row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+        line = reader.line_num
+        try:
+            vehicle_id = row["vehicle_id"]
+            if not vehicle_id:
+                raise ValueError("missing vehicle_id")
+            if vehicle_id in seen:
+                raise ValueError(f"vehicle {vehicle_id!r} listed twice")
+            capacity = int(row["capacity"])
+            if capacity <= 0:
+                raise ValueError("capacity must be positive")
+            if not known_stop(row["depot"]):
+                raise ValueError(f"depot {row['depot']!r} is not a route stop")
+        except (KeyError, ValueError) as e:
+            errors.append(f"line {line}: {e}")
+            continue
+        seen.add(vehicle_id)
+        fleet.append(Vehicle(vehicle_id, capacity, row["depot"]))
+
+    if errors:
+        more = len(errors) - MAX_REPORTED_ERRORS
+        raise ValueError("\n".join(errors[:MAX_REPORTED_ERRORS])
+                         + (f"\n...and {more} more" if more > 0 else ""))
+    if not fleet:
+        raise ValueError("The fleet file lists no vehicles")
+    return fleet
+
+
+def schedule_rows(schedule: FleetSchedule, routes: RouteTable) -> Iterator[Dict]:
+    """One row per trip in each vehicle's block, for exporter.write_rows"""
+    for block in schedule.blocks:
+        vehicle = block.vehicle
+        for n, trip in enumerate(block.trips, 1):
+            yield {
+                "vehicle_id": vehicle.vehicle_id,
+                "capacity": vehicle.capacity,
+                "depot": vehicle.depot,
+                "trip": n,
+                "route_id": trip.route_id,
+                "route_name": routes.name(trip.route_id),
+                "departure": format_minutes(trip.departure),
+                "arrival": format_minutes(trip.arrival),
+                "expected_passengers": round(trip.demand, 1),
+                # The block's whole empty running, on its first row
+                "deadhead_km": round(block.deadhead_km, 1) if n == 1 else ""
+            }
+
+
+class FleetScheduler:
+    def __init__(self, routes: RouteTable, distances: DistanceMatrix,
+                 remote_stops: Collection[str] = (), turnaround_minutes: int = 10,
+                 missed_trip_km: float = 50.0, unmet_passenger_km: float = 5.0,
+                 remote_weight: float = 4.0):
+        self.routes = routes
+        self.distances = distances
+        self.remote_stops = {name.casefold() for name in remote_stops}
+        self.turnaround_minutes = turnaround_minutes
+        self.missed_trip_km = missed_trip_km
+        self.unmet_passenger_km = unmet_passenger_km
+        self.remote_weight = remote_weight
+
+    def trips(self, demand: Dict[int, float]) -> List[Trip]:
+        """Today's departures in time order; ``demand`` is passengers per day by route_id"""
+        self.distances.refresh()
+        names = self.routes.stops.names
+        trips = []
+        for route_id in self.routes:
+            origin, destination = self.routes.endpoint_ids(route_id)
+            duration = max(1, int(round(self.distances.route_eta_minutes(route_id))))
+            remote = (names[origin].casefold() in self.remote_stops
+                      or names[destination].casefold() in self.remote_stops)
+            departures = self.routes.departures(route_id)
+            per_departure = demand.get(route_id, 0.0) / max(1, len(departures))
+            for departure in departures:
+                trips.append((departure, route_id, origin, destination, departure + duration,
+                              per_departure, remote))
+        trips.sort()
+        return [Trip(trip_id, route_id, origin, destination, departure, arrival, load, remote)
+                for trip_id, (departure, route_id, origin, destination, arrival, load, remote)
+                in enumerate(trips)]
+
+    def _unmet_cost(self, trip: Trip, capacity: int) -> float:
+        left = trip.demand - capacity
+        if left <= 0:
+            return 0.0
+        return left * self.unmet_passenger_km * (self.remote_weight if trip.remote else 1.0)
+
+    def _value(self, trip: Trip, capacity: int) -> float:
+        """What running ``trip`` with ``capacity`` seats saves over not running it"""
+        return self.missed_trip_km + self._unmet_cost(trip, 0) - self._unmet_cost(trip, capacity)
+
+    def schedule(self, fleet: List[Vehicle], demand: Dict[int, float]) -> FleetSchedule:
+        """Vehicle blocks covering as much of today's timetable as pays off"""
+        trips = self.trips(demand)
+        stop_index = self.distances.stop_index
+        for vehicle in fleet:
+            if vehicle.depot not in stop_index:
+                raise ValueError(f"Depot {vehicle.depot!r} of vehicle {vehicle.vehicle_id} is not a route stop")
+        depots = [stop_index[vehicle.depot] for vehicle in fleet]
+        # Plain nested lists: element lookups in the loops below are much
+        # cheaper than on numpy arrays
+        km = self.distances.distances_km.tolist()
+        minutes = [[math.ceil(m) for m in row] for row in self.distances.eta_minutes.tolist()]
+
+        blocks: List[List[Trip]] = [[] for _ in fleet]
+        leftover = self._assign(trips, fleet, depots, blocks, km, minutes)
+        self._repair(trips, leftover, fleet, depots, blocks, km, minutes)
+
+        served = set()
+        result = []
+        total_km = unmet = unmet_remote = 0.0
+        for vehicle, depot, block in zip(fleet, depots, blocks):
+            if not block:
+                continue
+            stops = [depot]
+            for trip in block:
+                stops += [trip.origin, trip.destination]
+                served.add(trip.trip_id)
+                left = max(0.0, trip.demand - vehicle.capacity)
+                unmet += left
+                unmet_remote += left if trip.remote else 0.0
+            stops.append(depot)
+            deadhead = sum(km[a][b] for a, b in zip(stops[::2], stops[1::2]))
+            total_km += deadhead
+            result.append(Block(vehicle, block, deadhead))
+        unserved = [trip for trip in trips if trip.trip_id not in served]
+        for trip in unserved:
+            unmet += trip.demand
+            unmet_remote += trip.demand if trip.remote else 0.0
+        return FleetSchedule(result, unserved, total_km, unmet, unmet_remote)
+
+    def _assign(self, trips, fleet, depots, blocks, km, minutes) -> List[Trip]:
+        """First pass, in departure order; returns the trips left unrun"""
+        turnaround = self.turnaround_minutes
+        # (stop, capacity) -> [(free from minute, vehicle index)], sorted
+        idle: Dict[tuple, list] = {}
+        for i, vehicle in enumerate(fleet):
+            idle.setdefault((depots[i], vehicle.capacity), []).append((START_OF_DAY, i))
+        for waiting in idle.values():
+            waiting.sort()
+
+        leftover = []
+        unmet_cost = self._unmet_cost
+        for trip in trips:
+            origin = trip.origin
+            best = None
+            for key, waiting in idle.items():
+                stop, capacity = key
+                # Latest-free vehicle that still makes it, leaving the ones
+                # free longer for trips that need more slack
+                position = bisect_right(waiting, (trip.departure - minutes[stop][origin], len(fleet)))
+                if not position:
+                    continue
+                cost = km[stop][origin] + unmet_cost(trip, capacity)
+                if best is None or cost < best[0] or (cost == best[0] and capacity < best[1]):
+                    best = (cost, capacity, key, position - 1)
+            if best is None or best[0] - unmet_cost(trip, 0) >= self.missed_trip_km:
+                leftover.append(trip)
+                continue
+            _, capacity, key, position = best
+            _, i = idle[key].pop(position)
+            if not idle[key]:
+                del idle[key]
+            blocks[i].append(trip)
+            insort(idle.setdefault((trip.destination, capacity), []), (trip.arrival + turnaround, i))
+        return leftover
+
+    def _repair(self, trips, leftover, fleet, depots, blocks, km, minutes):
+        """Second pass: fit unrun trips into blocks, most valuable first"""
+        turnaround = self.turnaround_minutes
+        departure_of = attrgetter('departure')
+        # Value of each trip on each size of vehicle, looked up in the loop
+        capacities = {vehicle.capacity for vehicle in fleet} | {math.inf}
+        values = [{capacity: self._value(trip, capacity) for capacity in capacities}
+                  for trip in trips]
+
+        queue = [(-values[trip.trip_id][math.inf], trip.trip_id, trip) for trip in leftover]
+        heapq.heapify(queue)
+        # Every move lowers the total cost, so this only guards against
+        # endless shuffling by rounding
+        moves_left = 10 * len(leftover) + len(fleet)
+        while queue and moves_left:
+            _, _, trip = heapq.heappop(queue)
+            departure, origin = trip.departure, trip.origin
+            free_after, destination = trip.arrival + turnaround, trip.destination
+            best = None
+            for i, block in enumerate(blocks):
+                capacity = fleet[i].capacity
+
+                # Bump trips before the slot until the vehicle can make it in
+                # time, and after it until it can make the next one
+                at = bisect_left(block, departure, key=departure_of)
+                start = at
+                while start:
+                    other = block[start - 1]
+                    if other.arrival + turnaround + minutes[other.destination][origin] <= departure:
+                        break
+                    start -= 1
+                if not start and START_OF_DAY + minutes[depots[i]][origin] > departure:
+                    continue
+                end = at
+                while end < len(block):
+                    other = block[end]
+                    if free_after + minutes[destination][other.origin] <= other.departure:
+                        break
+                    end += 1
+
+                before = block[start - 1].destination if start else depots[i]
+                after = block[end].origin if end < len(block) else depots[i]
+                # Value gained, plus the empty running saved
+                gain = values[trip.trip_id][capacity] - km[before][origin] - km[destination][after]
+                stop = before
+                for other in block[start:end]:
+                    gain += km[stop][other.origin] - values[other.trip_id][capacity]
+                    stop = other.destination
+                gain += km[stop][after]
+                if gain > 1e-9 and (best is None or gain > best[0]):
+                    best = (gain, i, start, end)
+
+            if best is None:
+                continue
+            _, i, start, end = best
+            for other in blocks[i][start:end]:
+                heapq.heappush(queue, (-values[other.trip_id][math.inf], other.trip_id, other))
+            blocks[i][start:end] = [trip]
+            moves_left -= 1
@@ -0,0 +1,225 @@
+"""Non-blocking reverse geocoding with an LRU + on-disk cache.
+
+Lookups are keyed by coordinates rounded to ``precision`` decimals. Cache
+hits are answered immediately; misses are queued to a single worker thread
+that calls the geocoder through geopy's ``RateLimiter``. Results are handed
+back through callbacks, on the Tk thread once ``attach_tk`` is called.
+"""
+import json
+import os
+import queue
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from geopy.extra.rate_limiter import RateLimiter
+from geopy.location import Location
+
+Callback = Callable[[Optional[Location]], None]
+
+
+class FakeGeocoder:
+    """Offline geocoder that answers with the nearest known place
+
+    Useful for tests and for terminals without network access. ``calls``
+    counts how many lookups reached it.
+    """
+
+    def __init__(self, places: Dict[str, Tuple[float, float]]):
+        self.places = places
+        self.calls = 0
+
+    def reverse(self, query, **kwargs):
+        self.calls += 1
+        lat, lon = query
+        name, (plat, plon) = min(
+            self.places.items(),
+            key=lambda item: (item[1][0] - lat) ** 2 + (item[1][1] - lon) ** 2
+        )
+        return Location(f"{name}, Marinduque, Philippines", (plat, plon), {"name": name})
+
+
+class GeocodingService:
+    def __init__(self, geocoder=None, cache_path: Optional[str] = None,
+                 max_entries: int = 1024, precision: int = 4, min_delay_seconds: float = 1.0):
+        # Nominatim's usage policy allows at most one request per second
+        self._geocoder = geocoder
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.precision = precision
+        self.min_delay_seconds = min_delay_seconds
+        self.network_calls = 0
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[Tuple[float, float], Location]" = OrderedDict()
+        self._disk: Dict[str, Dict] = self._load_disk_cache()
+        self._pending: Dict[Tuple[float, float], list] = {}
+
+        self._requests: "queue.Queue" = queue.Queue()
+        self._results: Optional["queue.Queue"] = None
+        self._worker = threading.Thread(target=self._work, name="geocoder", daemon=True)
+        self._worker.start()
+
+    def _key(self, lat: float, lon: float) -> Tuple[float, float]:
+        return round(lat, self.precision), round(lon, self.precision)
+
+    def _load_disk_cache(self) -> Dict[str, Dict]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable geocoding cache: {e}")
+            return {}
+
+    def _save_disk_cache(self):
+        if not self.cache_path:
+            return
+        with self._lock:
+            data = json.dumps(self._disk)
+        # Write to a temporary file first so a crash never leaves half a cache
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self.cache_path)
+
+    def _cached(self, key: Tuple[float, float]) -> Tuple[bool, Optional[Location]]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return True, self._memory[key]
+            entry = self._disk.get(f"{key[0]},{key[1]}")
+            if entry is None:
+                return False, None
+            location = Location(entry["address"], (entry["latitude"], entry["longitude"]),
+                                entry.get("raw", {}))
+            self._remember(key, location)
+            return True, location
+
+    def _remember(self, key, location: Optional[Location]):
+        self._memory[key] = location
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _store(self, key, location: Optional[Location]):
+        # Failed lookups are not cached so they are retried next time
+        if location is None:
+            return
+        with self._lock:
+            self._remember(key, location)
+            self._disk[f"{key[0]},{key[1]}"] = {
+                "address": location.address,
+                "latitude": location.latitude,
+                "longitude": location.longitude,
+                "raw": location.raw
+            }
+        self._save_disk_cache()
+
+    def seed(self, places: Dict[str, Tuple[float, float]], region: str = "Marinduque, Philippines"):
+        """Pre-fill the memory cache with known places so they never hit the network"""
+        with self._lock:
+            for name, (lat, lon) in places.items():
+                location = Location(f"{name}, {region}", (lat, lon), {"name": name})
+                self._remember(self._key(lat, lon), location)
+
+    def attach_tk(self, root, interval_ms: int = 50):
+        """Deliver callbacks on the Tk thread by polling from root.after"""
+        self._results = queue.Queue()
+
+        def poll():
+            while True:
+                try:
+                    callback, location = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                callback(location)
+            root.after(interval_ms, poll)
+
+        root.after(interval_ms, poll)
+
+    def _deliver(self, callback: Callback, location: Optional[Location]):
+        if self._results is not None:
+            self._results.put((callback, location))
+        else:
+            callback(location)
+
+    def reverse_async(self, lat: float, lon: float, callback: Callback):
+        """Look up an address without blocking; ``callback`` gets a Location or None"""
+        key = self._key(lat, lon)
+        hit, location = self._cached(key)
+        if hit:
+            self._deliver(callback, location)
+            return
+
+        # Coalesce concurrent requests for the same point into one lookup
+        with self._lock:
+            waiting = self._pending.setdefault(key, [])
+            waiting.append((callback, True))
+            first = len(waiting) == 1
+        if first:
+            self._requests.put(key)
+
+    def reverse(self, lat: float, lon: float, timeout: Optional[float] = None) -> Optional[Location]:
+        """Blocking lookup for non-UI callers; uses the same cache and worker"""
+        done = threading.Event()
+        result = []
+
+        def callback(location):
+            result.append(location)
+            done.set()
+
+        key = self._key(lat, lon)
+        hit, location = self._cached(key)
+        if hit:
+            return location
+        with self._lock:
+            # Delivered straight from the worker, not through Tk, so this
+            # cannot deadlock when called on the Tk thread
+            waiting = self._pending.setdefault(key, [])
+            waiting.append((callback, False))
+            first = len(waiting) == 1
+        if first:
+            self._requests.put(key)
+        done.wait(timeout)
+        return result[0] if result else None
+
+    def _get_geocoder(self):
+        if self._geocoder is None:
+            from geopy.geocoders import Nominatim
+            self._geocoder = Nominatim(user_agent="transconnect")
+        return self._geocoder
+
+    def _work(self):
+        limited_reverse = None
+        while True:
+            key = self._requests.get()
+            if key is None:
+                break
+            if limited_reverse is None:
+                limited_reverse = RateLimiter(self._get_geocoder().reverse,
+                                              min_delay_seconds=self.min_delay_seconds)
+
+            # Another request may have filled the cache while this one waited
+            hit, location = self._cached(key)
+            if not hit:
+                self.network_calls += 1
+                try:
+                    location = limited_reverse(key)
+                except Exception as e:
+                    print(f"Error getting location: {e}")
+                    location = None
+                self._store(key, location)
+
+            with self._lock:
+                callbacks = self._pending.pop(key, [])
+            for callback, via_tk in callbacks:
+                if via_tk:
+                    self._deliver(callback, location)
+                else:
+                    callback(location)
+
+    def close(self):
+        self._requests.put(None)
+        self._worker.join()
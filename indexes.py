@@ -0,0 +1,172 @@
+"""Secondary indexes over routes and bookings.
+
+Lookups by booking_id, route name, route, date, user and (route, date)
+cost time proportional to the result instead of a scan over every route or
+booking.
+Each bucket is an array of booking_ids in ascending (booking) order, so
+adding a booking is usually an append and removing one is a binary search.
+Buckets restored from an engine snapshot stay the bytes they were saved as
+until first used, so startup does not build tens of thousands of arrays.
+The bookings themselves are looked up in the ``BookingTable``.
+"""
+from array import array
+from bisect import bisect_left, insort
+from collections import defaultdict
+from functools import partial
+from typing import Dict, Hashable, List, Optional
+
+from booking_table import BookingTable
+
+
+def _bucket(buckets: Dict[Hashable, array], key: Hashable) -> Optional[array]:
+    bucket = buckets.get(key)
+    if bucket.__class__ is bytes:
+        # Still as loaded from a snapshot
+        data, bucket = bucket, array('q')
+        bucket.frombytes(data)
+        buckets[key] = bucket
+    return bucket
+
+
+def _insert(buckets: Dict[Hashable, array], key: Hashable, booking_id: int):
+    bucket = _bucket(buckets, key)
+    if bucket is None:
+        bucket = buckets[key] = array('q')
+    if not bucket or bucket[-1] < booking_id:
+        bucket.append(booking_id)
+    else:
+        insort(bucket, booking_id)
+
+
+def _discard(buckets: Dict[Hashable, array], key: Hashable, booking_id: int):
+    bucket = _bucket(buckets, key)
+    if bucket is None:
+        return
+    i = bisect_left(bucket, booking_id)
+    if i < len(bucket) and bucket[i] == booking_id:
+        del bucket[i]
+        if not bucket:
+            del buckets[key]
+
+
+def _bucket_state(buckets: Dict[Hashable, array]) -> Dict[Hashable, bytes]:
+    return {key: bucket if bucket.__class__ is bytes else bucket.tobytes()
+            for key, bucket in buckets.items()}
+
+
+class BookingIndex:
+    def __init__(self, routes: Dict[int, Dict], bookings: BookingTable):
+        self.routes = routes
+        self.bookings = bookings
+        self.route_ids_by_name: Dict[str, int] = {}
+        self.by_route: Dict[int, array] = {}
+        self.by_date: Dict[str, array] = {}
+        self.by_user: Dict[str, array] = {}
+        self.by_route_date: Dict[tuple, array] = {}
+        self.rebuild_routes()
+
+    def rebuild_routes(self):
+        """Refresh the name lookup after routes are added or renamed"""
+        self.route_ids_by_name = {
+            route['name']: route_id for route_id, route in self.routes.items()
+        }
+        self._routes_version = getattr(self.routes, 'version', None)
+
+    def add(self, booking: Dict):
+        booking_id, route_id, date = booking['booking_id'], booking['route_id'], booking['date']
+        _insert(self.by_route, route_id, booking_id)
+        _insert(self.by_date, date, booking_id)
+        _insert(self.by_user, booking['email'], booking_id)
+        _insert(self.by_route_date, (route_id, date), booking_id)
+
+    def rebuild(self):
+        """Index every booking in the table from scratch, in bulk"""
+        table = self.bookings
+        # Group by the table's integer codes first; ints hash faster than
+        # the strings they stand for
+        by_route = defaultdict(partial(array, 'q'))
+        by_date = defaultdict(partial(array, 'q'))
+        by_user = defaultdict(partial(array, 'q'))
+        by_route_date = defaultdict(partial(array, 'q'))
+        for booking_id, route_id, date, email in zip(table.ids, table.route_ids,
+                                                     table.date_codes, table.email_codes):
+            by_route[route_id].append(booking_id)
+            by_date[date].append(booking_id)
+            by_user[email].append(booking_id)
+            by_route_date[route_id, date].append(booking_id)
+        dates, emails = table.dates.values, table.emails.values
+        self.by_route = dict(by_route)
+        self.by_date = {dates[code]: bucket for code, bucket in by_date.items()}
+        self.by_user = {emails[code]: bucket for code, bucket in by_user.items()}
+        self.by_route_date = {(route_id, dates[code]): bucket
+                              for (route_id, code), bucket in by_route_date.items()}
+
+    def remove(self, booking: Dict):
+        booking_id, route_id, date = booking['booking_id'], booking['route_id'], booking['date']
+        _discard(self.by_route, route_id, booking_id)
+        _discard(self.by_date, date, booking_id)
+        _discard(self.by_user, booking['email'], booking_id)
+        _discard(self.by_route_date, (route_id, date), booking_id)
+
+    def clear(self):
+        self.by_route.clear()
+        self.by_date.clear()
+        self.by_user.clear()
+        self.by_route_date.clear()
+
+    def booking(self, booking_id: int) -> Optional[Dict]:
+        return self.bookings.get(booking_id)
+
+    def route_id(self, route_name: str) -> Optional[int]:
+        # A RouteTable bumps its version when routes are added or renamed
+        if getattr(self.routes, 'version', None) != self._routes_version:
+            self.rebuild_routes()
+        return self.route_ids_by_name.get(route_name)
+
+    def bookings_for(self, route_id: Optional[int] = None, date: Optional[str] = None,
+                     email: Optional[str] = None) -> List[Dict]:
+        """Return bookings matching every given filter, in booking order"""
+        # Start from the most selective index available, then filter the rest
+        if route_id is not None and date is not None:
+            candidates = _bucket(self.by_route_date, (route_id, date))
+        elif email is not None:
+            candidates = _bucket(self.by_user, email)
+        elif route_id is not None:
+            candidates = _bucket(self.by_route, route_id)
+        elif date is not None:
+            candidates = _bucket(self.by_date, date)
+        else:
+            raise ValueError("At least one of route_id, date or email is required")
+
+        get = self.bookings.get
+        return [
+            booking for booking in map(get, candidates or ())
+            if (route_id is None or booking['route_id'] == route_id)
+            and (date is None or booking['date'] == date)
+            and (email is None or booking['email'] == email)
+        ]
+
+    def user_booking_ids(self, email: str) -> array:
+        bucket = _bucket(self.by_user, email)
+        return array('q') if bucket is None else bucket
+
+    def departure_counts(self) -> Dict[tuple, int]:
+        """Bookings per (route_id, date)"""
+        return {key: len(bucket) // 8 if bucket.__class__ is bytes else len(bucket)
+                for key, bucket in self.by_route_date.items()}
+
+    def users_with_bookings(self) -> List[str]:
+        return [email for email, bucket in self.by_user.items() if bucket]
+
+    # Snapshots
+
+    def state(self) -> tuple:
+        return (_bucket_state(self.by_route), _bucket_state(self.by_date),
+                _bucket_state(self.by_user), _bucket_state(self.by_route_date))
+
+    def load_state(self, state: tuple):
+        by_route, by_date, by_user, by_route_date = state
+        self.by_route = dict(by_route)
+        self.by_date = dict(by_date)
+        self.by_user = dict(by_user)
+        self.by_route_date = dict(by_route_date)
@@ -0,0 +1,624 @@
+"""Append-only binary journal storage with snapshots.
+
+``JournalStorage`` is a drop-in alternative to ``SQLiteStorage``: every
+registration, booking, cancellation and capacity change is appended to one
+journal file as a length- and CRC-framed record, so the full history is
+kept and a crash can at worst lose a torn record at the very end, which is
+cut off on the next start.
+
+A snapshot is the state of the engine attached with ``set_state_source``
+(its booking columns, index arrays, seat bitsets and counters; see
+``BookingEngine.snapshot_state``) as of a journal offset, so startup
+restores that and hands over only the records after it. Snapshots are
+written by a background thread once ``snapshot_every`` records have been
+appended since the last one, which bounds the records startup applies on
+top; they are a cache of the journal, so a missing or unreadable snapshot
+only means a full replay. Replay reads the journal through mmap and
+decodes records in place from a memoryview.
+
+Journal layout::
+
+    b"TCJOURNAL1\\n"
+    record*:  <I body length> <I crc32(body)> body
+    body:     <B type> payload
+"""
+import marshal
+import mmap
+import os
+import queue
+import struct
+import threading
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from exporter import booking_matches
+from storage import Commit, StorageError
+
+MAGIC = b"TCJOURNAL1\n"
+# Version 1 snapshots held the replayed tuples below and are ignored
+SNAPSHOT_MAGIC = b"TCSNAPSHOT2\n"
+
+FRAME = struct.Struct("<II")
+SNAPSHOT_HEADER = struct.Struct("<QI")  # journal offset, crc32 of the body
+STR_LEN = struct.Struct("<H")
+USER = struct.Struct("<B")              # is_admin; then email, name, password
+BOOKING = struct.Struct("<qii")         # booking_id, route_id, seat (0 = none); then strings
+SEATS_COUNT = struct.Struct("<I")
+SEATS_ROW = struct.Struct("<ii")
+CANCEL = struct.Struct("<q")            # booking_id
+BOOKING_SEAT = struct.Struct("<qi")     # booking_id, seat; after a SEATS_COUNT
+
+RECORD_USER = 1
+RECORD_BOOKING = 2
+RECORD_SEATS = 3
+RECORD_CANCEL = 4
+RECORD_BOOKING_SEATS = 5
+
+# Replayed state as plain tuples: users {email: (name, password, is_admin)}, bookings [(booking_id, email,
+# route_id, route_name, date, seat, booked_at)], capacities {route_id: seats}
+State = Tuple[Dict[str, tuple], List[tuple], Dict[int, int]]
+
+
+def _pack_str(value: Optional[str]) -> bytes:
+    data = (value or "").encode("utf-8")
+    return STR_LEN.pack(len(data)) + data
+
+
+def _unpack_strs(buf, offset: int, count: int, intern: Callable[[str, str], str]) -> List[str]:
+    values = []
+    for _ in range(count):
+        (length,) = STR_LEN.unpack_from(buf, offset)
+        offset += STR_LEN.size
+        value = str(buf[offset:offset + length], "utf-8")
+        values.append(intern(value, value))
+        offset += length
+    return values
+
+
+def _frame(body: bytes) -> bytes:
+    return FRAME.pack(len(body), zlib.crc32(body)) + body
+
+
+def encode_user(email: str, user: Dict) -> bytes:
+    return _frame(bytes([RECORD_USER]) + USER.pack(int(user.get('is_admin', False)))
+                  + _pack_str(email) + _pack_str(user['name']) + _pack_str(user['password']))
+
+
+def encode_booking(booking: Dict) -> bytes:
+    return _frame(
+        bytes([RECORD_BOOKING])
+        + BOOKING.pack(booking['booking_id'], booking['route_id'], booking.get('seat') or 0)
+        + _pack_str(booking['email']) + _pack_str(booking['route_name'])
+        + _pack_str(booking['date']) + _pack_str(booking.get('booked_at'))
+    )
+
+
+def encode_seats(seats_by_route: Dict[int, int]) -> bytes:
+    return _frame(bytes([RECORD_SEATS]) + SEATS_COUNT.pack(len(seats_by_route))
+                  + b"".join(SEATS_ROW.pack(r, s) for r, s in seats_by_route.items()))
+
+
+def encode_cancel(booking_id: int) -> bytes:
+    return _frame(bytes([RECORD_CANCEL]) + CANCEL.pack(booking_id))
+
+
+def encode_booking_seats(seats_by_booking: Dict[int, int]) -> bytes:
+    return _frame(bytes([RECORD_BOOKING_SEATS]) + SEATS_COUNT.pack(len(seats_by_booking))
+                  + b"".join(BOOKING_SEAT.pack(b, s) for b, s in seats_by_booking.items()))
+
+
+def _bodies(buf, start: int, end: int) -> Iterator[Tuple[int, int, int]]:
+    """(record type, payload offset, record end) of each record in
+    ``buf[start:end]``, up to the first torn or corrupt one"""
+    offset = start
+    while offset + FRAME.size <= end:
+        length, crc = FRAME.unpack_from(buf, offset)
+        body_start = offset + FRAME.size
+        body_end = body_start + length
+        if length == 0 or body_end > end or zlib.crc32(buf[body_start:body_end]) != crc:
+            return
+        yield buf[body_start], body_start + 1, body_end
+        offset = body_end
+
+
+def _decode(buf, kind: int, pos: int, intern: Callable[[str, str], str]):
+    """Payload of one record as plain values; None for unknown record types"""
+    if kind == RECORD_USER:
+        (is_admin,) = USER.unpack_from(buf, pos)
+        email, name, password = _unpack_strs(buf, pos + USER.size, 3, intern)
+        return email, name, password, bool(is_admin)
+    if kind == RECORD_BOOKING:
+        booking_id, route_id, seat = BOOKING.unpack_from(buf, pos)
+        email, route_name, date, booked_at = _unpack_strs(buf, pos + BOOKING.size, 4, intern)
+        return booking_id, email, route_id, route_name, date, seat or None, booked_at or None
+    if kind == RECORD_SEATS:
+        (count,) = SEATS_COUNT.unpack_from(buf, pos)
+        pos += SEATS_COUNT.size
+        return dict(SEATS_ROW.unpack_from(buf, pos + i * SEATS_ROW.size) for i in range(count))
+    if kind == RECORD_BOOKING_SEATS:
+        (count,) = SEATS_COUNT.unpack_from(buf, pos)
+        pos += SEATS_COUNT.size
+        return dict(BOOKING_SEAT.unpack_from(buf, pos + i * BOOKING_SEAT.size) for i in range(count))
+    if kind == RECORD_CANCEL:
+        return CANCEL.unpack_from(buf, pos)[0]
+    # Unknown record types from newer versions are skipped
+    return None
+
+
+def replay(buf, start: int, end: int, state: State) -> Tuple[int, int]:
+    """Apply the records in ``buf[start:end]`` to ``state``
+
+    Stops at the first torn or corrupt record; returns (offset after the last
+    good record, records applied).
+    """
+    users, bookings, capacities = state
+    # Emails, route names and dates repeat across bookings; share one str each
+    intern = {}.setdefault
+    # booking_id -> number of bookings in the list when it was last
+    # cancelled; ids of cancelled bookings can be handed out again
+    cancelled: Dict[int, int] = {}
+    # booking_id -> (number of bookings in the list then, seat) of the
+    # last seat assigned to a booking saved without one
+    assigned: Dict[int, Tuple[int, int]] = {}
+    offset = start
+    applied = 0
+    for kind, pos, offset in _bodies(buf, start, end):
+        value = _decode(buf, kind, pos, intern)
+        if kind == RECORD_USER:
+            email, name, password, is_admin = value
+            users[email] = (name, password, is_admin)
+        elif kind == RECORD_BOOKING:
+            bookings.append(value)
+        elif kind == RECORD_SEATS:
+            capacities.update(value)
+        elif kind == RECORD_CANCEL:
+            cancelled[value] = len(bookings)
+        elif kind == RECORD_BOOKING_SEATS:
+            for booking_id, seat in value.items():
+                assigned[booking_id] = (len(bookings), seat)
+        applied += 1
+    if assigned:
+        for i, booking in enumerate(bookings):
+            before, seat = assigned.get(booking[0], (0, None))
+            if i < before:
+                bookings[i] = booking[:5] + (seat,) + booking[6:]
+    if cancelled:
+        # One pass at the end instead of a list search per cancellation
+        bookings[:] = [
+            booking for i, booking in enumerate(bookings)
+            if i >= cancelled.get(booking[0], 0)
+        ]
+    return offset, applied
+
+
+def read_records(buf, start: int, end: int) -> Tuple[int, List[tuple]]:
+    """The records in ``buf[start:end]`` in journal order, as ("user",
+    (email, user)), ("booking", booking), ("seats", seats_by_route),
+    ("cancel", booking_id) and ("booking_seats", seats_by_booking); returns
+    (offset after the last good record, records)"""
+    intern = {}.setdefault
+    records = []
+    offset = start
+    for kind, pos, offset in _bodies(buf, start, end):
+        value = _decode(buf, kind, pos, intern)
+        if kind == RECORD_USER:
+            email, name, password, is_admin = value
+            records.append(('user', (email, {"name": name, "password": password,
+                                             "is_admin": is_admin})))
+        elif kind == RECORD_BOOKING:
+            booking_id, email, route_id, route_name, date, seat, booked_at = value
+            records.append(('booking', {
+                'booking_id': booking_id,
+                'email': email,
+                'route_name': route_name,
+                'date': date,
+                'route_id': route_id,
+                'seat': seat,
+                'booked_at': booked_at
+            }))
+        elif kind == RECORD_SEATS:
+            records.append(('seats', value))
+        elif kind == RECORD_CANCEL:
+            records.append(('cancel', value))
+        elif kind == RECORD_BOOKING_SEATS:
+            records.append(('booking_seats', value))
+    return offset, records
+
+
+def _no_intern(value: str, default: str) -> str:
+    return value
+
+
+class JournalReader:
+    """Read-only view of a journal, for exports while the app may be writing it
+
+    Records are read through mmap up to the last complete one; the file is
+    never truncated or written and no threads are started. Bookings stream
+    in journal order (booking order, but for concurrent writers). A first
+    pass collects the cancellations and assigned seats, so memory grows with
+    those, not with the bookings.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise StorageError(f"{path} is not a TransConnect journal")
+
+    @contextmanager
+    def _mapped(self):
+        """(buffer, end) of the journal as it is now"""
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    yield view, size
+                finally:
+                    view.release()
+
+    @staticmethod
+    def _changes(buf, end: int) -> Tuple[Dict[int, int], Dict[int, Tuple[int, int]]]:
+        """booking_id -> index of its last cancellation, and booking_id ->
+        (index, seat) of the last seat assigned to it"""
+        cancelled: Dict[int, int] = {}
+        assigned: Dict[int, Tuple[int, int]] = {}
+        for index, (kind, pos, _) in enumerate(_bodies(buf, len(MAGIC), end)):
+            if kind == RECORD_CANCEL:
+                cancelled[_decode(buf, kind, pos, _no_intern)] = index
+            elif kind == RECORD_BOOKING_SEATS:
+                for booking_id, seat in _decode(buf, kind, pos, _no_intern).items():
+                    assigned[booking_id] = (index, seat)
+        return cancelled, assigned
+
+    def iter_bookings(self, route_id: Optional[int] = None, date_from: Optional[str] = None,
+                      date_to: Optional[str] = None) -> Iterator[Dict]:
+        """Stored bookings, filtered as SQLiteStorage.iter_bookings"""
+        with self._mapped() as (buf, end):
+            cancelled, assigned = self._changes(buf, end)
+            for index, (kind, pos, _) in enumerate(_bodies(buf, len(MAGIC), end)):
+                if kind != RECORD_BOOKING:
+                    continue
+                booking_id, email, route_id_, route_name, date, seat, booked_at = _decode(
+                    buf, kind, pos, _no_intern)
+                # Cancelled after this save (the id may be saved again later)
+                if cancelled.get(booking_id, -1) > index:
+                    continue
+                assigned_at, assigned_seat = assigned.get(booking_id, (-1, None))
+                booking = {
+                    'booking_id': booking_id,
+                    'email': email,
+                    'route_name': route_name,
+                    'date': date,
+                    'route_id': route_id_,
+                    'seat': assigned_seat if assigned_at > index else seat,
+                    'booked_at': booked_at
+                }
+                if booking_matches(booking, route_id, date_from, date_to):
+                    yield booking
+
+    def iter_users(self) -> Iterator[Dict]:
+        """Stored users with their booking counts (no password hashes), by email"""
+        with self._mapped() as (buf, end):
+            cancelled, _ = self._changes(buf, end)
+            users: Dict[str, Tuple[str, bool]] = {}
+            counts: Counter = Counter()
+            for index, (kind, pos, _) in enumerate(_bodies(buf, len(MAGIC), end)):
+                if kind == RECORD_USER:
+                    email, name, _, is_admin = _decode(buf, kind, pos, _no_intern)
+                    users[email] = (name, is_admin)
+                elif kind == RECORD_BOOKING:
+                    booking_id = BOOKING.unpack_from(buf, pos)[0]
+                    if cancelled.get(booking_id, -1) < index:
+                        counts[_unpack_strs(buf, pos + BOOKING.size, 1, _no_intern)[0]] += 1
+        for email in sorted(users):
+            name, is_admin = users[email]
+            yield {"email": email, "name": name, "is_admin": is_admin, "bookings": counts[email]}
+
+    def close(self):
+        pass
+
+
+class JournalStorage:
+    """Journal + snapshot storage with a background group-commit writer
+
+    Writes are queued and appended by one thread; writes queued while a
+    batch is being synced go out together in the next one. With
+    ``durable=True`` each batch is fsynced before its commits complete.
+    """
+
+    def __init__(self, path: str, durable: bool = True, snapshot_every: int = 10000,
+                 max_batch: int = 512):
+        self.path = path
+        self.snapshot_path = path + ".snapshot"
+        self.durable = durable
+        self.snapshot_every = snapshot_every
+        self.max_batch = max_batch
+
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "wb") as f:
+                f.write(MAGIC)
+                f.flush()
+                os.fsync(f.fileno())
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise StorageError(f"{path} is not a TransConnect journal")
+
+        # Read the records after the snapshot (all of them without one) to
+        # find where the good records end, and cut off a record torn by a
+        # crash so new records follow valid ones; load_state() and load()
+        # hand out what was read here instead of reading again
+        self._snapshot_offset, self._snapshot_body = self._load_snapshot()
+        self._tail: Optional[List[tuple]] = None
+        self._loaded: Optional[State] = None
+        if self._snapshot_body is None:
+            self._loaded = ({}, [], {})
+            end, records = self._scan(len(MAGIC), lambda buf, start, stop: replay(
+                buf, start, stop, self._loaded))
+        else:
+            end, self._tail = self._scan(self._snapshot_offset, read_records)
+            records = len(self._tail)
+        if end < os.path.getsize(path):
+            with open(path, "r+b") as f:
+                f.truncate(end)
+
+        # Journal end and records written since the snapshot's offset; the
+        # writer advances them together, snapshots read them together.
+        # _submitted is where the journal will end once every queued write
+        # is on disk
+        self._end = end
+        self._records = records
+        self._snapshot_records = 0
+        self._submitted = end
+        self._submitted_records = records
+        self._failed = False
+        # Set when a failed write could not be cut off again; every later
+        # write fails with it, since it would follow a torn record
+        self._broken: Optional[BaseException] = None
+        self._position_lock = threading.Lock()
+        self._written = threading.Condition(self._position_lock)
+
+        self._state_source: Optional[Callable[[], tuple]] = None
+        self._snapshot_lock = threading.Lock()
+        self._snapshotting = False
+        self._flag_lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+        self._writer = threading.Thread(target=self._write_loop, name="journal-writer", daemon=True)
+        self._writer.start()
+
+    # Reading
+
+    def _scan(self, start: int, read: Callable, end: Optional[int] = None):
+        """``read(buf, start, end)`` over the journal file through mmap"""
+        size = os.path.getsize(self.path) if end is None else end
+        if size <= start:
+            return read(b"", start, start)
+        with open(self.path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    return read(view, start, size)
+                finally:
+                    view.release()
+
+    def _load_snapshot(self) -> Tuple[int, Optional[memoryview]]:
+        """(journal offset, marshalled state) of the snapshot, or of an empty journal"""
+        empty = (len(MAGIC), None)
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return empty
+        start = len(SNAPSHOT_MAGIC) + SNAPSHOT_HEADER.size
+        if not data.startswith(SNAPSHOT_MAGIC) or len(data) < start:
+            return empty
+        offset, crc = SNAPSHOT_HEADER.unpack_from(data, len(SNAPSHOT_MAGIC))
+        body = memoryview(data)[start:]
+        if zlib.crc32(body) != crc or not len(MAGIC) <= offset <= os.path.getsize(self.path):
+            return empty
+        return offset, body
+
+    def load_state(self) -> Optional[Tuple[object, List[tuple]]]:
+        """(snapshot state, records written after it) or None without a usable
+        snapshot; records are as read_records() returns them"""
+        body, self._snapshot_body = self._snapshot_body, None
+        records, self._tail = self._tail, None
+        if body is None:
+            return None
+        try:
+            return marshal.loads(body), records
+        except (EOFError, ValueError, TypeError):
+            # e.g. written by another Python version; the journal has it all
+            return None
+
+    def load(self) -> Tuple[Dict[str, Dict], List[Dict], Dict[int, int]]:
+        """Return (users, bookings, seats per departure of each route),
+        replaying the whole journal"""
+        state, self._loaded = self._loaded, None
+        if state is None:
+            state = ({}, [], {})
+            self._scan(len(MAGIC), lambda buf, start, stop: replay(buf, start, stop, state),
+                       self._end)
+        users, bookings, capacities = state
+        # Concurrent bookings can reach the journal slightly out of id order;
+        # on sorted input this is one linear pass
+        bookings.sort()
+        return (
+            {
+                email: {"name": name, "password": password, "is_admin": is_admin}
+                for email, (name, password, is_admin) in users.items()
+            },
+            [
+                {
+                    'booking_id': booking_id,
+                    'email': email,
+                    'route_name': route_name,
+                    'date': date,
+                    'route_id': route_id,
+                    'seat': seat,
+                    'booked_at': booked_at
+                }
+                for booking_id, email, route_id, route_name, date, seat, booked_at in bookings
+            ],
+            capacities
+        )
+
+    def iter_bookings(self, route_id: Optional[int] = None, date_from: Optional[str] = None,
+                      date_to: Optional[str] = None) -> Iterator[Dict]:
+        """Stored bookings, streamed as JournalReader.iter_bookings"""
+        return JournalReader(self.path).iter_bookings(route_id, date_from, date_to)
+
+    def iter_users(self) -> Iterator[Dict]:
+        return JournalReader(self.path).iter_users()
+
+    # Writing
+
+    def _submit(self, record: bytes) -> Commit:
+        commit = Commit()
+        with self._position_lock:
+            self._submitted += len(record)
+            self._submitted_records += 1
+            self._queue.put((record, commit))
+        return commit
+
+    def position(self) -> Tuple[int, int]:
+        """(journal offset, records since the snapshot) once every write
+        queued so far is on disk"""
+        with self._position_lock:
+            return self._submitted, self._submitted_records
+
+    def save_user(self, email: str, user: Dict) -> Commit:
+        return self._submit(encode_user(email, user))
+
+    def save_booking(self, booking: Dict) -> Commit:
+        return self._submit(encode_booking(booking))
+
+    def save_seats(self, seats_by_route: Dict[int, int]) -> Commit:
+        """Several routes' seats go in one record, so they apply all or nothing"""
+        return self._submit(encode_seats(seats_by_route))
+
+    def cancel_booking(self, booking_id: int) -> Commit:
+        return self._submit(encode_cancel(booking_id))
+
+    def assign_seats(self, seats_by_booking: Dict[int, int]) -> Commit:
+        """Seats given to stored bookings that had none, in one record"""
+        return self._submit(encode_booking_seats(seats_by_booking))
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            # Drain whatever queued up while the previous batch was syncing
+            batch = [item]
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            data = b"".join(record for record, _ in batch)
+            error = self._broken
+            if error is None:
+                try:
+                    written = os.write(self._fd, data)
+                    while written < len(data):
+                        written += os.write(self._fd, data[written:])
+                    if self.durable:
+                        os.fsync(self._fd)
+                except OSError as e:
+                    error = e
+                    self._cut_back()
+            with self._written:
+                if error is None:
+                    self._end += len(data)
+                    self._records += len(batch)
+                else:
+                    # Offsets of queued writes no longer match the file
+                    self._failed = True
+                self._written.notify_all()
+            for _, commit in batch:
+                commit._finish(error)
+
+            if self._records - self._snapshot_records >= self.snapshot_every:
+                self.snapshot_async()
+            if stop:
+                break
+        os.close(self._fd)
+
+    def _cut_back(self):
+        """Drop whatever part of a failed batch reached the file, so later
+        records follow the last good one instead of a torn record that
+        replay would stop at"""
+        try:
+            os.ftruncate(self._fd, self._end)
+            if self.durable:
+                os.fsync(self._fd)
+        except OSError as e:
+            self._broken = StorageError(f"{self.path} ends in a partly written record "
+                                        f"that could not be removed ({e}); restart to recover")
+
+    # Snapshots
+
+    def set_state_source(self, source: Callable[[], tuple]):
+        """Take snapshots of ``source()``, which returns (position(), state)
+        with state made of what marshal can save; see BookingEngine.snapshot_state"""
+        self._state_source = source
+        # A long replay at startup is worth a snapshot right away
+        if self._records - self._snapshot_records >= self.snapshot_every:
+            self.snapshot_async()
+
+    def snapshot(self):
+        """Write a snapshot of the state source as of now (blocking)"""
+        with self._snapshot_lock:
+            if self._state_source is None:
+                return
+            (end, records), state = self._state_source()
+            if end == self._snapshot_offset:
+                return
+            body = marshal.dumps(state)
+            with self._written:
+                # The snapshot may only point past records that are on disk
+                self._written.wait_for(lambda: self._end >= end or self._failed)
+                if self._failed:
+                    return
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(SNAPSHOT_MAGIC + SNAPSHOT_HEADER.pack(end, zlib.crc32(body)))
+                f.write(body)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            self._snapshot_offset = end
+            self._snapshot_records = records
+
+    def snapshot_async(self):
+        """Start a snapshot on a background thread unless one is running"""
+        with self._flag_lock:
+            if self._snapshotting or self._state_source is None:
+                return
+            self._snapshotting = True
+
+        def run():
+            try:
+                self.snapshot()
+            except OSError:
+                pass  # the journal is still complete; retry at the next threshold
+            finally:
+                self._snapshotting = False
+
+        threading.Thread(target=run, name="journal-snapshot", daemon=True).start()
+
+    def close(self):
+        """Flush pending writes and stop the writer thread"""
+        self._queue.put(None)
+        self._writer.join()
@@ -0,0 +1,138 @@
+"""Schedule-aware multi-leg journey planner using the Connection Scan Algorithm.
+
+Every scheduled departure of every route is an elementary connection
+(from stop, to stop, departure minute, arrival minute). Connections are kept
+in compact ``array`` columns sorted by departure time, and an earliest-arrival
+query is one forward scan from the first connection after the requested
+departure time, so it stays in the low milliseconds for thousands of daily
+departures.
+"""
+from array import array
+from bisect import bisect_left
+from typing import List, NamedTuple, Optional
+
+from distance_matrix import DistanceMatrix
+from route_model import RouteTable, format_minutes
+
+UNREACHED = 2 ** 31 - 1
+
+
+class Leg(NamedTuple):
+    route_id: int
+    origin: str
+    destination: str
+    departure: int
+    arrival: int
+
+
+class Itinerary(NamedTuple):
+    legs: List[Leg]
+
+    @property
+    def departure(self) -> int:
+        return self.legs[0].departure
+
+    @property
+    def arrival(self) -> int:
+        return self.legs[-1].arrival
+
+    @property
+    def route_ids(self) -> List[int]:
+        return [leg.route_id for leg in self.legs]
+
+    def describe(self) -> str:
+        """One-line summary for list widgets"""
+        path = " → ".join([self.legs[0].origin] + [leg.destination for leg in self.legs])
+        transfers = len(self.legs) - 1
+        return (
+            f"{format_minutes(self.departure)} → {format_minutes(self.arrival)}  "
+            f"{path}  ({transfers} transfer{'s' if transfers != 1 else ''})"
+        )
+
+
+class JourneyPlanner:
+    def __init__(self, routes: RouteTable, distances: DistanceMatrix,
+                 min_transfer_minutes: int = 5):
+        self.routes = routes
+        self.distances = distances
+        self.min_transfer_minutes = min_transfer_minutes
+        self._fingerprint = None
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """Rebuild the connection arrays if routes or schedules changed"""
+        if self.routes.version == self._fingerprint:
+            return False
+        self.distances.refresh()
+
+        # Schedules were parsed into minutes when the routes were loaded
+        connections = []
+        for route_id in self.routes:
+            origin, destination = self.routes.endpoint_ids(route_id)
+            duration = max(1, int(round(self.distances.route_eta_minutes(route_id))))
+            for departure in self.routes.departures(route_id):
+                connections.append(
+                    (departure, departure + duration, origin, destination, route_id)
+                )
+        connections.sort()
+
+        # Column-oriented storage keeps the scan loop tight and memory small
+        self.dep_time = array('i', (c[0] for c in connections))
+        self.arr_time = array('i', (c[1] for c in connections))
+        self.dep_stop = array('i', (c[2] for c in connections))
+        self.arr_stop = array('i', (c[3] for c in connections))
+        self.route_id = array('i', (c[4] for c in connections))
+        self.stops = list(self.distances.stops)
+        self.stop_index = dict(self.distances.stop_index)
+        self._fingerprint = self.routes.version
+        return True
+
+    def earliest_arrival(self, origin: str, destination: str,
+                         depart_after: int = 0) -> Optional[Itinerary]:
+        """Fastest itinerary leaving ``origin`` at or after ``depart_after`` today"""
+        source = self.stop_index.get(origin)
+        target = self.stop_index.get(destination)
+        if source is None or target is None or source == target:
+            return None
+
+        earliest = [UNREACHED] * len(self.stops)
+        in_connection = [-1] * len(self.stops)
+        earliest[source] = depart_after - self.min_transfer_minutes
+
+        dep_time, arr_time = self.dep_time, self.arr_time
+        dep_stop, arr_stop = self.dep_stop, self.arr_stop
+        transfer = self.min_transfer_minutes
+        for c in range(bisect_left(dep_time, depart_after), len(dep_time)):
+            departure = dep_time[c]
+            # Nothing departing later can improve the arrival at the target
+            if departure >= earliest[target]:
+                break
+            if earliest[dep_stop[c]] + transfer <= departure and arr_time[c] < earliest[arr_stop[c]]:
+                earliest[arr_stop[c]] = arr_time[c]
+                in_connection[arr_stop[c]] = c
+
+        if in_connection[target] < 0:
+            return None
+
+        # Walk the chain of incoming connections back to the origin
+        legs = []
+        stop = target
+        while stop != source:
+            c = in_connection[stop]
+            legs.append(Leg(self.route_id[c], self.stops[dep_stop[c]], self.stops[arr_stop[c]],
+                            dep_time[c], arr_time[c]))
+            stop = dep_stop[c]
+        legs.reverse()
+        return Itinerary(legs)
+
+    def itineraries(self, origin: str, destination: str, depart_after: int = 0,
+                    limit: int = 3) -> List[Itinerary]:
+        """Up to ``limit`` alternatives, each leaving after the previous one"""
+        found = []
+        while len(found) < limit:
+            itinerary = self.earliest_arrival(origin, destination, depart_after)
+            if itinerary is None:
+                break
+            found.append(itinerary)
+            depart_after = itinerary.departure + 1
+        return found
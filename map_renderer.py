@@ -0,0 +1,109 @@
+"""Content-addressed cache and background rendering for the folium map.
+
+The map is described by a plain snapshot (municipality markers, route
+polylines and optionally bounds to zoom to). The snapshot's SHA-256 names
+the HTML file, so an unchanged route set reuses the file on disk, and a
+changed one is rendered by a background worker while the screen keeps
+showing the last good map.
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+
+def snapshot_key(snapshot: Dict) -> str:
+    data = json.dumps(snapshot, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+def render_map(snapshot: Dict, path: str):
+    """Build the folium map for a snapshot and write it to ``path``"""
+    import folium
+
+    m = folium.Map(location=snapshot["center"], zoom_start=11)
+    if "bounds" in snapshot:
+        m.fit_bounds(snapshot["bounds"])
+
+    # Add markers for each municipality
+    for name, data in snapshot["municipalities"].items():
+        folium.Marker(
+            data["coords"],
+            popup=f"{name} Municipality",
+            tooltip=name,
+            icon=folium.Icon(color=data["color"], icon='info-sign')
+        ).add_to(m)
+
+    # Draw routes between municipalities
+    for route in snapshot["routes"]:
+        folium.PolyLine(
+            locations=route["path"],
+            weight=3,
+            color='red',
+            opacity=0.6,
+            popup=route["popup"]
+        ).add_to(m)
+
+    # Write next to the final name and rename, so readers never see half a file
+    tmp_path = path + ".tmp"
+    m.save(tmp_path)
+    os.replace(tmp_path, path)
+
+
+class MapRenderer:
+    def __init__(self, cache_dir: str = "map_cache", keep: int = 5):
+        self.cache_dir = cache_dir
+        self.keep = keep
+        # Until something is rendered, fall back to the newest map from a previous run
+        cached = self._cached_files()
+        self.last_good: Optional[str] = cached[0] if cached else None
+        self._pending: Dict[str, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="map-render")
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"marinduque-{key}.html")
+
+    def request(self, snapshot: Dict) -> Tuple[Optional[str], Optional[Future]]:
+        """Return (path, None) if cached, else (last good path, future of new path)"""
+        key = snapshot_key(snapshot)
+        path = self.path_for(key)
+        if os.path.exists(path):
+            os.utime(path)  # keep it from being pruned as stale
+            self.last_good = path
+            return path, None
+
+        future = self._pending.get(key)
+        if future is None:
+            future = self._executor.submit(self._render, snapshot, path)
+            self._pending[key] = future
+        return self.last_good, future
+
+    def _render(self, snapshot: Dict, path: str) -> str:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        try:
+            render_map(snapshot, path)
+        finally:
+            self._pending.pop(snapshot_key(snapshot), None)
+        self.last_good = path
+        self._prune()
+        return path
+
+    def _cached_files(self) -> List[str]:
+        """Cached map files, newest first"""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return sorted(
+            (os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+             if name.endswith(".html")),
+            key=os.path.getmtime,
+            reverse=True
+        )
+
+    def _prune(self):
+        """Keep only the most recently used maps"""
+        for stale in self._cached_files()[self.keep:]:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
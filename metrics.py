@@ -0,0 +1,221 @@
+"""Lightweight timing metrics for the Tk screens.
+
+``instrument(cls, metrics)`` wraps the ``show_*`` and ``handle_*`` methods of
+a class so each call is observed in a latency histogram named after the
+method. ``EventLoopLagProbe`` schedules a Tk ``after`` callback at a fixed
+interval and records how late it fires, which is how long the UI was
+blocked. ``MetricsExporter`` writes everything to a file every few seconds,
+as Prometheus text (``.prom``/``.txt``) or JSON (``.json``).
+
+When metrics are disabled nothing is wrapped or scheduled, so the only cost
+is the ``if`` that decided not to.
+"""
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+# Upper bounds in seconds, from 0.1 ms to 10 s
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus style"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def snapshot(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in self.bounds] + ["+Inf"], self.counts))
+        }
+
+
+class Metrics:
+    """Named histograms and counters, safe to update from any thread"""
+
+    def __init__(self, enabled: bool = True, prefix: str = "transconnect"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name: str, amount: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def timed(self, name: str):
+        """Decorator observing each call's duration under ``name``"""
+        def decorate(func):
+            if not self.enabled:
+                return func
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "histograms": {name: h.snapshot() for name, h in sorted(self.histograms.items())},
+                "counters": dict(sorted(self.counters.items()))
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(dict(self.snapshot(), time=time.time()), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format; histograms share one family per
+        prefix (e.g. ``ui``) with the rest of the name as the ``name`` label"""
+        lines: List[str] = []
+        with self._lock:
+            # Sorted names keep each family's samples together
+            for name, histogram in sorted(self.histograms.items()):
+                family, _, label = name.partition(".")
+                metric = f"{self.prefix}_{family}_seconds"
+                if f"# TYPE {metric} histogram" not in lines:
+                    lines.append(f"# TYPE {metric} histogram")
+                labels = f'name="{label}",' if label else ""
+                cumulative = 0
+                for bound, count in zip(list(histogram.bounds) + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{{labels}le="{bound}"}} {cumulative}')
+                labels = f'{{name="{label}"}}' if label else ""
+                lines.append(f"{metric}_sum{labels} {histogram.sum}")
+                lines.append(f"{metric}_count{labels} {histogram.count}")
+            for name, value in sorted(self.counters.items()):
+                metric = f"{self.prefix}_{name.replace('.', '_')}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def instrument(cls, metrics: Metrics, prefixes: Sequence[str] = ("show_", "handle_")):
+    """Wrap every method of ``cls`` starting with one of ``prefixes`` in a
+    timer named ``ui.<method>``; does nothing when metrics are disabled"""
+    if not metrics.enabled:
+        return cls
+    for attr, value in list(vars(cls).items()):
+        if callable(value) and attr.startswith(tuple(prefixes)):
+            setattr(cls, attr, metrics.timed(f"ui.{attr}")(value))
+    return cls
+
+
+class EventLoopLagProbe:
+    """Records how late a periodic Tk ``after`` callback fires
+
+    A callback due every ``interval_ms`` that runs late was held up by
+    whatever occupied the event loop, so the lag is the time the UI was
+    unresponsive.
+    """
+
+    def __init__(self, root, metrics: Metrics, interval_ms: int = 100):
+        self.root = root
+        self.metrics = metrics
+        self.interval_ms = interval_ms
+        self._due = 0.0
+        self._job = None
+
+    def start(self):
+        if self.metrics.enabled and self._job is None:
+            self._schedule()
+
+    def _schedule(self):
+        self._due = time.perf_counter() + self.interval_ms / 1000
+        self._job = self.root.after(self.interval_ms, self._tick)
+
+    def _tick(self):
+        self.metrics.observe("event_loop.lag", max(0.0, time.perf_counter() - self._due))
+        self._schedule()
+
+    def stop(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+
+
+class MetricsExporter:
+    """Rewrites a metrics file every ``interval`` seconds from a daemon thread"""
+
+    def __init__(self, metrics: Metrics, path: str, interval: float = 10.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def write(self):
+        text = self.metrics.to_json() if self.path.endswith(".json") else self.metrics.to_prometheus()
+        # Readers (e.g. node_exporter's textfile collector) never see a half-written file
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as out:
+            out.write(text)
+        os.replace(tmp_path, self.path)
+
+    def start(self):
+        if not self.metrics.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError:
+                # A full disk or missing directory must not take the app down
+                pass
+
+    def stop(self):
+        """Stop the thread and write the final numbers"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.write()
@@ -0,0 +1,487 @@
+"""Offline road routing over an OpenStreetMap extract, with contraction hierarchies.
+
+``RoadRouter.open("marinduque.osm")`` reads the drivable roads of an OSM XML
+extract (optionally .gz or .bz2; convert a .pbf with ``osmium cat`` first)
+and joins each stretch of road between two junctions into one edge that
+keeps its shape. The graph is then preprocessed into a contraction
+hierarchy: nodes are contracted one at a time, least important first, and
+shortcut edges are added wherever that would break a shortest path. A query
+is a bidirectional Dijkstra in which both searches only move up to more
+important nodes, so it settles a few hundred nodes instead of the whole
+island; the shortcuts on the path found are unpacked into the roads they
+stand for, giving the polyline.
+
+Preprocessing is slow in pure Python, so the result is cached next to the
+extract (``<extract>.ch``) and reused until the extract changes. Edges are
+weighted by travel time from ``maxspeed`` or the road class; distances are
+measured along the road shape.
+"""
+import bz2
+import gzip
+import heapq
+import marshal
+import math
+import os
+import xml.etree.ElementTree as ET
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+Point = Tuple[float, float]
+
+# Same mean radius as distance_matrix, which imports numpy
+EARTH_RADIUS_KM = 6371.0088
+
+# km/h by OSM highway class, for ways without a usable maxspeed; other
+# classes (footway, path, steps, ...) are not driven on
+SPEEDS_KMH = {
+    "motorway": 80, "trunk": 70, "primary": 60, "secondary": 50, "tertiary": 40,
+    "motorway_link": 50, "trunk_link": 40, "primary_link": 40, "secondary_link": 35,
+    "tertiary_link": 30, "unclassified": 30, "road": 30, "residential": 25,
+    "living_street": 10, "service": 15, "track": 15,
+}
+# From a stop to the nearest road node and back
+ACCESS_SPEED_KMH = 15
+
+CACHE_VERSION = 1
+# Witness searches give up after settling this many nodes; a missed witness
+# only costs an unneeded shortcut, never a wrong route
+WITNESS_SETTLE_LIMIT = 60
+# Cell size of the grid used to snap coordinates to the nearest road node
+GRID_DEGREES = 0.004
+
+
+class RoadRoute(NamedTuple):
+    distance_km: float
+    minutes: float
+    path: List[Point]
+
+
+def haversine_km(a: Point, b: Point) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, h)))
+
+
+def _open_extract(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def _speed_kmh(tags: Dict[str, str]) -> Optional[float]:
+    """Driving speed on a way, or None if cars cannot use it"""
+    if tags.get("highway") not in SPEEDS_KMH:
+        return None
+    if tags.get("access") in ("no", "private") or tags.get("motor_vehicle") in ("no", "private"):
+        return None
+    maxspeed = tags.get("maxspeed", "").split(" ")[0]
+    return float(maxspeed) if maxspeed.isdigit() and int(maxspeed) > 0 else SPEEDS_KMH[tags["highway"]]
+
+
+def _direction(tags: Dict[str, str]) -> int:
+    """1 for one-way along the way, -1 against it, 0 for both ways"""
+    oneway = tags.get("oneway")
+    if oneway == "-1":
+        return -1
+    if oneway in ("yes", "true", "1") or tags.get("junction") == "roundabout":
+        return 1
+    return 1 if tags.get("highway") == "motorway" and oneway != "no" else 0
+
+
+def read_osm(path: str) -> Tuple[Dict[int, Point], List[Tuple[List[int], float, int]]]:
+    """Node coordinates and drivable ways (node ids, km/h, direction) of an OSM XML file"""
+    coords: Dict[int, Point] = {}
+    ways = []
+    with _open_extract(path) as f:
+        events = ET.iterparse(f, events=("start", "end"))
+        _, root = next(events)
+        for event, elem in events:
+            if event != "end":
+                continue
+            if elem.tag == "node":
+                coords[int(elem.get("id"))] = (float(elem.get("lat")), float(elem.get("lon")))
+            elif elem.tag == "way":
+                tags = {tag.get("k"): tag.get("v") for tag in elem.iter("tag")}
+                speed = _speed_kmh(tags)
+                if speed is not None:
+                    ways.append(([int(nd.get("ref")) for nd in elem.iter("nd")], speed,
+                                 _direction(tags)))
+            else:
+                continue
+            # Parsed elements are not needed again
+            root.clear()
+    return coords, ways
+
+
+def _segments(coords: Dict[int, Point], ways: List[Tuple[List[int], float, int]]):
+    """Split ways at junctions: (from, to, metres, seconds, direction, shape between)"""
+    uses: Dict[int, int] = {}
+    for refs, _, _ in ways:
+        for ref in refs:
+            uses[ref] = uses.get(ref, 0) + 1
+        # Way ends are always junctions
+        for ref in (refs[0], refs[-1]):
+            uses[ref] = uses.get(ref, 0) + 1
+    for refs, speed, direction in ways:
+        start, shape, metres = None, [], 0.0
+        for ref in refs:
+            point = coords.get(ref)
+            if point is None:
+                # Cut off by the extract's boundary
+                start, shape, metres = None, [], 0.0
+                continue
+            if start is not None:
+                metres += haversine_km(shape[-1] if shape else coords[start], point) * 1000
+            if uses[ref] > 1 or start is None:
+                if start is not None and ref != start:
+                    yield start, ref, metres, metres / (speed / 3.6), direction, shape
+                start, shape, metres = ref, [], 0.0
+            else:
+                shape.append(point)
+
+
+class RoadRouter:
+    def __init__(self, data: Dict):
+        self.lat: List[float] = data["lat"]
+        self.lon: List[float] = data["lon"]
+        self.up: List[List[Tuple[int, float]]] = data["up"]
+        self.down: List[List[Tuple[int, float]]] = data["down"]
+        # Keyed by u * n + v: the node a shortcut u->v skips over, and the
+        # shape and length of each road edge
+        self.middle: Dict[int, int] = data["middle"]
+        self.shape: Dict[int, tuple] = data["shape"]
+        self.metres: Dict[int, float] = data["metres"]
+        self.n = len(self.lat)
+
+        self.grid: Dict[Tuple[int, int], List[int]] = {}
+        for node in range(self.n):
+            self.grid.setdefault(self._cell(self.lat[node], self.lon[node]), []).append(node)
+
+    # Building
+
+    @classmethod
+    def open(cls, osm_path: str, cache_path: Optional[str] = None) -> "RoadRouter":
+        """Router for an OSM extract, from the preprocessed cache when it is current"""
+        cache_path = cache_path or osm_path + ".ch"
+        stat = os.stat(osm_path)
+        source = [stat.st_size, stat.st_mtime_ns]
+        try:
+            with open(cache_path, "rb") as f:
+                data = marshal.load(f)
+            if data.get("version") == CACHE_VERSION and data.get("source") == source:
+                return cls(data)
+        except (OSError, EOFError, ValueError, TypeError, AttributeError):
+            pass
+
+        data = cls.preprocess(*read_osm(osm_path))
+        data.update(version=CACHE_VERSION, source=source)
+        tmp_path = cache_path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                marshal.dump(data, f)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass  # read-only location: preprocess again next time
+        return cls(data)
+
+    @staticmethod
+    def preprocess(coords: Dict[int, Point], ways: List[Tuple[List[int], float, int]]) -> Dict:
+        """Road graph plus contraction hierarchy, as plain data for the cache"""
+        index: Dict[int, int] = {}
+        edges: Dict[Tuple[int, int], Tuple[float, float, tuple]] = {}
+
+        def add(u, v, metres, seconds, shape):
+            # Of parallel roads between two junctions, keep the quickest
+            if (u, v) not in edges or seconds < edges[(u, v)][1]:
+                edges[(u, v)] = (metres, seconds, tuple(c for point in shape for c in point))
+
+        for a, b, metres, seconds, direction, shape in _segments(coords, ways):
+            u, v = index.setdefault(a, len(index)), index.setdefault(b, len(index))
+            if direction >= 0:
+                add(u, v, metres, seconds, shape)
+            if direction <= 0:
+                add(v, u, metres, seconds, shape[::-1])
+
+        # Keep the largest connected piece; stops snapped onto a stray
+        # disconnected driveway would have no route anywhere
+        parent = list(range(len(index)))
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for u, v in edges:
+            parent[find(u)] = find(v)
+        sizes: Dict[int, int] = {}
+        for node in range(len(index)):
+            sizes[find(node)] = sizes.get(find(node), 0) + 1
+        largest = max(sizes, key=sizes.get) if sizes else None
+        kept = [node for node in range(len(index)) if find(node) == largest]
+        renumber = {old: new for new, old in enumerate(kept)}
+        points = [None] * len(index)
+        for osm_id, node in index.items():
+            points[node] = coords[osm_id]
+
+        n = len(kept)
+        weights: Dict[int, float] = {}
+        shape: Dict[int, tuple] = {}
+        metres: Dict[int, float] = {}
+        for (u, v), (length, seconds, line) in edges.items():
+            if u in renumber and v in renumber:
+                key = renumber[u] * n + renumber[v]
+                weights[key], shape[key], metres[key] = seconds, line, length
+
+        rank, middle = _contract(n, weights)
+        up: List[List[Tuple[int, float]]] = [[] for _ in range(n)]
+        down: List[List[Tuple[int, float]]] = [[] for _ in range(n)]
+        for key, seconds in weights.items():
+            u, v = divmod(key, n)
+            if rank[v] > rank[u]:
+                up[u].append((v, seconds))
+            else:
+                down[v].append((u, seconds))
+        return {
+            "lat": [points[old][0] for old in kept],
+            "lon": [points[old][1] for old in kept],
+            "up": up,
+            "down": down,
+            "middle": middle,
+            "shape": {key: line for key, line in shape.items() if key not in middle},
+            "metres": {key: length for key, length in metres.items() if key not in middle},
+        }
+
+    # Queries
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / GRID_DEGREES), math.floor(lon / GRID_DEGREES)
+
+    def nearest(self, lat: float, lon: float, max_rings: int = 30) -> Optional[int]:
+        """Road node closest to a coordinate, searching grid rings outwards"""
+        ci, cj = self._cell(lat, lon)
+        scale = math.cos(math.radians(lat))
+        best, best_d, found_ring = None, math.inf, None
+        for ring in range(max_rings):
+            if found_ring is not None and ring > found_ring + 1:
+                break
+            for i in range(ci - ring, ci + ring + 1):
+                for j in range(cj - ring, cj + ring + 1):
+                    if max(abs(i - ci), abs(j - cj)) != ring:
+                        continue
+                    for node in self.grid.get((i, j), ()):
+                        d = (self.lat[node] - lat) ** 2 + ((self.lon[node] - lon) * scale) ** 2
+                        if d < best_d:
+                            best, best_d = node, d
+            if best is not None and found_ring is None:
+                found_ring = ring
+        return best
+
+    def _search(self, source: int, target: int) -> Optional[Tuple[float, List[int]]]:
+        """Travel seconds and node path over the hierarchy (shortcuts still packed)"""
+        if source == target:
+            return 0.0, [source]
+        inf, heappop, heappush = math.inf, heapq.heappop, heapq.heappush
+        forward, backward = {source: 0.0}, {target: 0.0}
+        parent = ({source: -1}, {target: -1})
+        queues = ([(0.0, source)], [(0.0, target)])
+        # Per side: queue, own costs, other side's costs, edges to follow,
+        # edges the other way (for stalling), parents
+        sides = ((queues[0], forward, backward, self.up, self.down, parent[0]),
+                 (queues[1], backward, forward, self.down, self.up, parent[1]))
+        best, meet = inf, -1
+        while queues[0] or queues[1]:
+            for queue, mine, other, graph, reverse, parents in sides:
+                if not queue:
+                    continue
+                d, u = heappop(queue)
+                if d > mine[u]:
+                    continue
+                if d >= best:
+                    # Nothing left on this side can improve the route
+                    queue.clear()
+                    continue
+                total = d + other.get(u, inf)
+                if total < best:
+                    best, meet = total, u
+                # Stall on demand: a quicker way down into u from a node
+                # this side already reached means u is not on a shortest path
+                for x, w in reverse[u]:
+                    if mine.get(x, inf) + w < d:
+                        break
+                else:
+                    for v, w in graph[u]:
+                        nd = d + w
+                        if nd < mine.get(v, inf):
+                            mine[v] = nd
+                            parents[v] = u
+                            heappush(queue, (nd, v))
+        if meet < 0:
+            return None
+        path = []
+        node = meet
+        while node != -1:
+            path.append(node)
+            node = parent[0][node]
+        path.reverse()
+        node = parent[1][meet]
+        while node != -1:
+            path.append(node)
+            node = parent[1][node]
+        return best, path
+
+    def _unpack(self, a: int, b: int, roads: List[int]):
+        """Append the road edges a shortcut a->b stands for, in driving order"""
+        stack = [(a, b)]
+        while stack:
+            a, b = stack.pop()
+            mid = self.middle.get(a * self.n + b)
+            if mid is None:
+                roads.append(a * self.n + b)
+            else:
+                stack.append((mid, b))
+                stack.append((a, mid))
+
+    def route(self, start: Point, end: Point) -> Optional[RoadRoute]:
+        """Quickest road route between two coordinates, or None if unreachable"""
+        source, target = self.nearest(*start), self.nearest(*end)
+        if source is None or target is None:
+            return None
+        found = self._search(source, target)
+        if found is None:
+            return None
+        seconds, nodes = found
+
+        roads: List[int] = []
+        for a, b in zip(nodes, nodes[1:]):
+            self._unpack(a, b, roads)
+        first, last = (self.lat[source], self.lon[source]), (self.lat[target], self.lon[target])
+        path = [tuple(start), first]
+        metres = 0.0
+        for key in roads:
+            line = self.shape[key]
+            path.extend(zip(line[::2], line[1::2]))
+            v = key % self.n
+            path.append((self.lat[v], self.lon[v]))
+            metres += self.metres[key]
+        path.append(tuple(end))
+
+        access_km = haversine_km(start, first) + haversine_km(last, end)
+        return RoadRoute(
+            distance_km=metres / 1000 + access_km,
+            minutes=seconds / 60 + access_km / ACCESS_SPEED_KMH * 60,
+            path=path
+        )
+
+
+def _witness(out: List[Dict[int, float]], source: int, skip: int, limit: float,
+             targets: set) -> Dict[int, float]:
+    """Costs from ``source`` avoiding ``skip``, searched no further than ``limit``"""
+    dist = {source: 0.0}
+    queue = [(0.0, source)]
+    settled = 0
+    left = len(targets)
+    while queue:
+        d, u = heapq.heappop(queue)
+        if d > dist[u]:
+            continue
+        if d > limit or settled >= WITNESS_SETTLE_LIMIT:
+            break
+        settled += 1
+        if u in targets:
+            left -= 1
+            if not left:
+                break
+        for v, w in out[u].items():
+            if v != skip and d + w < dist.get(v, math.inf):
+                dist[v] = d + w
+                heapq.heappush(queue, (d + w, v))
+    return dist
+
+
+def _shortcuts(out: List[Dict[int, float]], into: List[Dict[int, float]],
+               v: int) -> List[Tuple[int, int, float]]:
+    """Shortcuts needed to contract ``v``: (from, to, cost) for each shortest path through it"""
+    if not out[v] or not into[v]:
+        return []
+    max_out = max(out[v].values())
+    needed = []
+    for u, w_in in into[v].items():
+        targets = {x for x in out[v] if x != u}
+        if not targets:
+            continue
+        dist = _witness(out, u, v, w_in + max_out, targets)
+        for x in targets:
+            cost = w_in + out[v][x]
+            if cost < dist.get(x, math.inf):
+                needed.append((u, x, cost))
+    return needed
+
+
+def _contract(n: int, weights: Dict[int, float]) -> Tuple[List[int], Dict[int, int]]:
+    """Contract every node; adds shortcuts to ``weights`` and returns (rank per
+    node, middle node per shortcut key)"""
+    out: List[Dict[int, float]] = [{} for _ in range(n)]
+    into: List[Dict[int, float]] = [{} for _ in range(n)]
+    for key, w in weights.items():
+        u, v = divmod(key, n)
+        out[u][v] = into[v][u] = w
+    middle: Dict[int, int] = {}
+    contracted_neighbours = [0] * n
+    level = [0] * n
+
+    def priority(v, shortcuts):
+        # Edge difference, plus spreading contraction evenly over the map and
+        # keeping the hierarchy shallow, which is what keeps queries small
+        return len(shortcuts) - len(out[v]) - len(into[v]) + contracted_neighbours[v] + level[v]
+
+    queue = [(priority(v, _shortcuts(out, into, v)), v) for v in range(n)]
+    heapq.heapify(queue)
+    rank = [0] * n
+    order = 0
+    while queue:
+        _, v = heapq.heappop(queue)
+        shortcuts = _shortcuts(out, into, v)
+        current = priority(v, shortcuts)
+        # Lazy update: contracting neighbours may have made v costlier
+        if queue and current > queue[0][0]:
+            heapq.heappush(queue, (current, v))
+            continue
+
+        for u, x, cost in shortcuts:
+            key = u * n + x
+            if cost < weights.get(key, math.inf):
+                weights[key] = cost
+                middle[key] = v
+                out[u][x] = into[x][u] = cost
+        for u in into[v]:
+            del out[u][v]
+            contracted_neighbours[u] += 1
+            level[u] = max(level[u], level[v] + 1)
+        for x in out[v]:
+            del into[x][v]
+            contracted_neighbours[x] += 1
+            level[x] = max(level[x], level[v] + 1)
+        out[v], into[v] = {}, {}
+        rank[v] = order
+        order += 1
+    return rank, middle
+
+
+def main():
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Preprocess an OSM extract for offline routing")
+    parser.add_argument("extract", help="OSM XML file (.osm, .osm.gz or .osm.bz2)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    router = RoadRouter.open(args.extract)
+    print(f"{router.n} road nodes ready in {time.perf_counter() - start:.1f}s "
+          f"(cached in {args.extract}.ch)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""Compact typed route and stop model.
+
+Routes live in column arrays (one row per route) and stops in a shared stop
+table with float coordinates, so GPS strings and schedules are parsed once
+when a route is added. ``RouteTable`` is also a mapping of route_id to a
+dict-like ``RouteView``, which keeps ``ROUTES[route_id]['seats']`` and the
+other existing string fields working for code that has not moved to the
+typed accessors yet.
+"""
+from array import array
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Tuple
+
+MINUTES_PER_DAY = 24 * 60
+
+# Fields every route has; anything else is kept in a small per-route dict
+ROUTE_FIELDS = ("name", "start_gps", "end_gps", "seats", "schedule")
+
+
+def parse_gps(gps: str) -> Tuple[float, float]:
+    """Parse a "lat, lon" string into floats"""
+    lat, lon = gps.split(',')
+    return float(lat), float(lon)
+
+
+def parse_schedule(schedule: str) -> List[int]:
+    """Parse "7:00 AM" or "7:00 AM, 1:00 PM" into minutes since midnight"""
+    minutes = []
+    for part in schedule.split(','):
+        # Hand-rolled instead of time.strptime, which is far slower when
+        # loading thousands of departures
+        clock, _, period = part.strip().partition(' ')
+        hours, _, mins = clock.partition(':')
+        hours, mins, period = int(hours), int(mins), period.strip().upper()
+        if not (1 <= hours <= 12 and 0 <= mins < 60 and period in ("AM", "PM")):
+            raise ValueError(f"Invalid schedule time: {part.strip()!r}")
+        minutes.append((hours % 12 + (12 if period == "PM" else 0)) * 60 + mins)
+    return sorted(minutes)
+
+
+def format_minutes(minutes: int) -> str:
+    """Minutes since midnight as "7:09 AM" (wrapping past midnight)"""
+    hours, mins = divmod(minutes % MINUTES_PER_DAY, 60)
+    return f"{(hours % 12) or 12}:{mins:02d} {'AM' if hours < 12 else 'PM'}"
+
+
+def route_endpoints(route) -> Tuple[str, str]:
+    """Origin and destination town names from a "<origin> to <destination>" name"""
+    origin, _, destination = route['name'].partition(' to ')
+    return origin.strip(), destination.strip() or f"{origin.strip()} (end)"
+
+
+class Stop:
+    __slots__ = ("stop_id", "name", "lat", "lon")
+
+    def __init__(self, stop_id: int, name: str, lat: float, lon: float):
+        self.stop_id = stop_id
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+
+    @property
+    def coords(self) -> Tuple[float, float]:
+        return self.lat, self.lon
+
+    def __repr__(self):
+        return f"Stop({self.stop_id}, {self.name!r}, {self.lat}, {self.lon})"
+
+
+class StopTable:
+    """Stops keyed by town name, with coordinates in float arrays"""
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.lat = array('d')
+        self.lon = array('d')
+        self.index: Dict[str, int] = {}
+
+    def add(self, name: str, lat: float, lon: float) -> int:
+        """Return the id of the named stop, adding it if new (first coordinates win)"""
+        stop_id = self.index.get(name)
+        if stop_id is None:
+            stop_id = self.index[name] = len(self.names)
+            self.names.append(name)
+            self.lat.append(lat)
+            self.lon.append(lon)
+        return stop_id
+
+    def __getitem__(self, stop_id: int) -> Stop:
+        return Stop(stop_id, self.names[stop_id], self.lat[stop_id], self.lon[stop_id])
+
+    def __len__(self):
+        return len(self.names)
+
+
+class RouteView(MutableMapping):
+    """Dict-style view of one route row, for the existing screens"""
+
+    __slots__ = ("_table", "route_id")
+
+    def __init__(self, table: "RouteTable", route_id: int):
+        self._table = table
+        self.route_id = route_id
+
+    def __getitem__(self, key):
+        return self._table._get_field(self.route_id, key)
+
+    def __setitem__(self, key, value):
+        self._table._set_field(self.route_id, key, value)
+
+    def __delitem__(self, key):
+        raise TypeError("Route fields cannot be deleted")
+
+    def __iter__(self) -> Iterator[str]:
+        yield from ROUTE_FIELDS
+        yield from self._table._extras.get(self.route_id, ())
+
+    def __len__(self):
+        return len(ROUTE_FIELDS) + len(self._table._extras.get(self.route_id, ()))
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class RouteTable(MutableMapping):
+    """Array-backed table of routes, usable as ``{route_id: route_dict}``
+
+    ``version`` increases whenever a route is added, removed or changes name,
+    coordinates or schedule (but not seats), so derived structures such as the
+    distance matrix can check for staleness in O(1).
+    """
+
+    def __init__(self):
+        self.stops = StopTable()
+        self.version = 0
+        self._rows: Dict[int, int] = {}
+        self._ids = array('i')
+        self._names: List[str] = []
+        self._origin = array('i')
+        self._destination = array('i')
+        # The GPS strings as given, so the dict view hands them back unchanged
+        self._gps: List[Tuple[str, str]] = []
+        self._seats = array('i')
+        # Each row's departures are a slice of one shared pool
+        self._dep_start = array('I')
+        self._dep_count = array('H')
+        self._departures = array('H')
+        # Pool slots no row points at any more, reclaimed by _compact_departures
+        self._dead_departures = 0
+        self._extras: Dict[int, Dict] = {}
+
+    @classmethod
+    def from_dicts(cls, routes: Dict[int, Dict]) -> "RouteTable":
+        table = cls()
+        for route_id, route in routes.items():
+            table[route_id] = route
+        return table
+
+    # Mapping protocol (compatibility view)
+
+    def __getitem__(self, route_id: int) -> RouteView:
+        if route_id not in self._rows:
+            raise KeyError(route_id)
+        return RouteView(self, route_id)
+
+    def __setitem__(self, route_id: int, route: Dict):
+        route = dict(route)
+        origin, destination = route_endpoints(route)
+        origin_id = self.stops.add(origin, *parse_gps(route['start_gps']))
+        destination_id = self.stops.add(destination, *parse_gps(route['end_gps']))
+        departures = parse_schedule(route['schedule'])
+        extras = {k: v for k, v in route.items() if k not in ROUTE_FIELDS}
+
+        row = self._rows.get(route_id)
+        if row is None:
+            row = self._rows[route_id] = len(self._ids)
+            self._ids.append(route_id)
+            self._names.append(route['name'])
+            self._origin.append(origin_id)
+            self._destination.append(destination_id)
+            self._gps.append((route['start_gps'], route['end_gps']))
+            self._seats.append(int(route['seats']))
+            self._dep_start.append(len(self._departures))
+            self._dep_count.append(len(departures))
+            self._departures.extend(departures)
+        else:
+            self._names[row] = route['name']
+            self._origin[row] = origin_id
+            self._destination[row] = destination_id
+            self._gps[row] = (route['start_gps'], route['end_gps'])
+            self._seats[row] = int(route['seats'])
+            start, count = self._dep_start[row], self._dep_count[row]
+            if len(departures) <= count:
+                # Fits in the row's old slice: overwrite it in place
+                self._departures[start:start + len(departures)] = array('H', departures)
+                self._dead_departures += count - len(departures)
+            else:
+                self._dep_start[row] = len(self._departures)
+                self._departures.extend(departures)
+                self._dead_departures += count
+            self._dep_count[row] = len(departures)
+            if self._dead_departures > len(self._departures) // 2:
+                self._compact_departures()
+
+        if extras:
+            self._extras[route_id] = extras
+        else:
+            self._extras.pop(route_id, None)
+        self.version += 1
+
+    def _compact_departures(self):
+        """Copy every row's departures into a fresh pool with no dead slots"""
+        pool = array('H')
+        for row in range(len(self._ids)):
+            start = self._dep_start[row]
+            self._dep_start[row] = len(pool)
+            pool.extend(self._departures[start:start + self._dep_count[row]])
+        self._departures = pool
+        self._dead_departures = 0
+
+    def __delitem__(self, route_id: int):
+        if route_id not in self._rows:
+            raise KeyError(route_id)
+        # Rare admin operation: rebuild the columns without the row
+        remaining = {rid: dict(self[rid]) for rid in self._ids if rid != route_id}
+        version = self.version
+        self.__init__()
+        for rid, route in remaining.items():
+            self[rid] = route
+        self.version = version + 1
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, route_id) -> bool:
+        return route_id in self._rows
+
+    def _get_field(self, route_id: int, key: str):
+        row = self._rows[route_id]
+        if key == "seats":
+            return self._seats[row]
+        if key == "name":
+            return self._names[row]
+        if key == "start_gps":
+            return self._gps[row][0]
+        if key == "end_gps":
+            return self._gps[row][1]
+        if key == "schedule":
+            return ", ".join(format_minutes(m) for m in self.departures(route_id))
+        return self._extras.get(route_id, {})[key]
+
+    def _set_field(self, route_id: int, key: str, value):
+        if key == "seats":
+            self._seats[self._rows[route_id]] = value
+            return
+        # Structural fields are re-parsed through the normal insert path
+        route = dict(self[route_id])
+        route[key] = value
+        self[route_id] = route
+
+    # Typed accessors
+
+    def name(self, route_id: int) -> str:
+        return self._names[self._rows[route_id]]
+
+    def seats(self, route_id: int) -> int:
+        return self._seats[self._rows[route_id]]
+
+    def origin(self, route_id: int) -> Stop:
+        return self.stops[self._origin[self._rows[route_id]]]
+
+    def destination(self, route_id: int) -> Stop:
+        return self.stops[self._destination[self._rows[route_id]]]
+
+    def endpoint_ids(self, route_id: int) -> Tuple[int, int]:
+        row = self._rows[route_id]
+        return self._origin[row], self._destination[row]
+
+    def coords(self, route_id: int) -> Tuple[Tuple[float, float], Tuple[float, float]]:
+        """(lat, lon) of the start and end stops"""
+        start, end = self.endpoint_ids(route_id)
+        return (
+            (self.stops.lat[start], self.stops.lon[start]),
+            (self.stops.lat[end], self.stops.lon[end])
+        )
+
+    def departures(self, route_id: int) -> array:
+        """Departure times of a route in minutes since midnight"""
+        row = self._rows[route_id]
+        start = self._dep_start[row]
+        return self._departures[start:start + self._dep_count[row]]
@@ -0,0 +1,189 @@
+"""Incremental route search over route and town names.
+
+Every word of every route name (so both end towns, e.g. "santa" and "cruz")
+goes into a prefix trie whose nodes keep the route_ids of the words below
+them, so the routes matching a typed prefix are one walk down the trie.
+Query words with no prefix match (typos such as "mogpgo") fall back to a
+fuzzy index: every word prefix is stored under itself and each of its
+one-letter deletions, and two strings one edit apart (a swap of two
+letters counts as one edit) always share such a variant. So the prefixes
+within one edit of a query word are found by looking up its own variants,
+without comparing it to the whole vocabulary. A route matches a query when
+it matches every query word.
+
+The index follows ``RouteTable.version`` and is rebuilt after routes are
+added or renamed.
+"""
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+WORD = re.compile(r"\w+")
+
+# How well a query word matched a route; lower ranks first
+EXACT, PREFIX, FUZZY = 0, 1, 2
+
+# Short forms used on signs and tickets, e.g. "Sta. Cruz"
+ABBREVIATIONS = {"sta": "santa", "sto": "santo"}
+
+
+def words(text: str) -> List[str]:
+    # "to" only joins the two towns of a name
+    return [w for w in WORD.findall(text.casefold()) if w != "to"]
+
+
+def _variants(text: str) -> Set[str]:
+    """``text`` and every string made by deleting one letter of it"""
+    return {text} | {text[:i] + text[i + 1:] for i in range(len(text))}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Edit distance counting insertions, deletions, substitutions and swaps
+    of neighbouring letters; ``limit + 1`` once it is known to exceed ``limit``"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+class _Node:
+    __slots__ = ("children", "route_ids", "ranked")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.route_ids: Set[int] = set()
+        # route_ids in result order for this prefix, sorted on first use
+        self.ranked: Optional[List[int]] = None
+
+
+class RouteSearch:
+    def __init__(self, routes: Dict[int, Dict]):
+        self.routes = routes
+        self.rebuild()
+
+    def rebuild(self):
+        root = _Node()
+        by_word: Dict[str, Set[int]] = {}
+        names: Dict[int, str] = {}
+        leading: Dict[int, str] = {}
+        for route_id, route in self.routes.items():
+            names[route_id] = route['name']
+            leading[route_id] = route['name'].casefold()
+            for word in words(route['name']):
+                by_word.setdefault(word, set()).add(route_id)
+                node = root
+                node.route_ids.add(route_id)
+                for char in word:
+                    node = node.children.setdefault(char, _Node())
+                    node.route_ids.add(route_id)
+        # Fuzzy matching starts at three typed letters, so shorter prefixes
+        # are only needed as deletions of those
+        by_variant: Dict[str, Set[str]] = {}
+        prefixes = {word[:end] for word in by_word for end in range(2, len(word) + 1)}
+        for prefix in prefixes:
+            for variant in _variants(prefix):
+                by_variant.setdefault(variant, set()).add(prefix)
+
+        # Position in name order, the last tie-break when ranking
+        order = {route_id: i for i, route_id in enumerate(sorted(names, key=names.get))}
+
+        # Swapped in together, so a search on another thread sees one version
+        self._root, self._by_word, self._by_variant = root, by_word, by_variant
+        self._names, self._leading, self._order = names, leading, order
+        self._version = getattr(self.routes, 'version', None)
+
+    def _node(self, word: str) -> Optional[_Node]:
+        node = self._root
+        for char in word:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def _prefix(self, word: str) -> Set[int]:
+        node = self._node(word)
+        return node.route_ids if node is not None else set()
+
+    def _rank_key(self, first: str):
+        # Routes that start with the first query word (leaving from that
+        # town) go before the others with the same score, then name order
+        leading, order = self._leading, self._order
+        return lambda route_id: (not leading[route_id].startswith(first), order[route_id])
+
+    def _search_prefix(self, word: str, limit: int) -> Optional[List[int]]:
+        """One typed word (the first keystrokes): exact word matches, then the
+        node's cached ranking, without scoring every route under the prefix"""
+        node = self._node(word)
+        if node is None:
+            return None
+        if node.ranked is None:
+            node.ranked = sorted(node.route_ids, key=self._rank_key(word))
+        exact = self._by_word.get(word, set())
+        results = sorted(exact, key=self._rank_key(word))[:limit]
+        for route_id in node.ranked:
+            if len(results) >= limit:
+                break
+            if route_id not in exact:
+                results.append(route_id)
+        return results
+
+    def _fuzzy(self, word: str) -> Set[int]:
+        """Routes with a word starting within one edit of ``word``"""
+        if len(word) < 3:
+            return set()
+        matched: Set[int] = set()
+        for variant in _variants(word):
+            for prefix in self._by_variant.get(variant, ()):
+                # Sharing a variant can also mean two edits apart
+                if edit_distance(word, prefix, 1) <= 1:
+                    matched |= self._prefix(prefix)
+        return matched
+
+    def _match(self, word: str) -> Tuple[Set[int], int]:
+        routes = self._prefix(word)
+        if word in ABBREVIATIONS:
+            routes = routes | self._prefix(ABBREVIATIONS[word])
+        if routes:
+            return routes, PREFIX
+        return self._fuzzy(word), FUZZY
+
+    def search(self, text: str, limit: int = 20) -> List[int]:
+        """route_ids whose names match every word of ``text``, best first"""
+        if getattr(self.routes, 'version', None) != self._version:
+            self.rebuild()
+        query = words(text)
+        if not query:
+            return sorted(self._order, key=self._order.get)[:limit]
+        if len(query) == 1 and query[0] not in ABBREVIATIONS:
+            results = self._search_prefix(query[0], limit)
+            if results is not None:
+                return results
+
+        scores: Dict[int, int] = {}
+        for i, word in enumerate(query):
+            routes, rank = self._match(word)
+            exact = self._by_word.get(ABBREVIATIONS.get(word, word), ())
+            if i:
+                routes = [route_id for route_id in scores if route_id in routes]
+            scores = {
+                route_id: scores.get(route_id, 0) + (EXACT if route_id in exact else rank)
+                for route_id in routes
+            }
+            if not scores:
+                return []
+
+        rank_key = self._rank_key(ABBREVIATIONS.get(query[0], query[0]))
+        return sorted(scores, key=lambda route_id: (scores[route_id], rank_key(route_id)))[:limit]
+
+    def name(self, route_id: int) -> Optional[str]:
+        return self._names.get(route_id)
+
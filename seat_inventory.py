@@ -0,0 +1,413 @@
+"""Seat-level inventory stored as bitsets over (seat x segment), per date.
+
+A through-trip is one vehicle running several routes back to back, e.g.
+Boac→Mogpog→Santa Cruz; each route is one segment of the trip and a route
+that is not part of a through-trip is a trip with a single segment. For each
+segment a departure keeps a Python int whose bit ``s`` is set while seat
+``s`` is free, so finding a seat free over segments i..j is an AND of
+j - i + 1 ints plus a lowest-set-bit, and a passenger leaving at Mogpog frees
+the same seat for someone boarding there.
+
+Every trip runs once per day. The seat map of a departure is created the
+first time that date is touched and only dates inside the booking window
+(today and the next ``window_days - 1`` days) can be booked. When the day
+rolls over, past departures are compacted into ``DepartureSummary`` records
+(seats sold per route) so memory does not grow with every day the system runs.
+
+The per-route ``seats`` counters the screens show are today's seats left,
+derived from the bitsets (popcount of the route's segment).
+"""
+import logging
+import threading
+from datetime import date as Date, timedelta
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from route_model import route_endpoints
+
+TripKey = Tuple[int, ...]
+
+log = logging.getLogger(__name__)
+
+
+def _lowest_bit(bits: int) -> int:
+    return (bits & -bits).bit_length() - 1
+
+
+class SeatMap:
+    """Free-seat bitsets of one vehicle departure, one int per segment"""
+
+    def __init__(self, capacity: int, segments: int):
+        self.capacity = capacity
+        self.free = [(1 << capacity) - 1] * segments
+
+    def _free_over(self, first: int, last: int) -> int:
+        bits = self.free[first]
+        for segment in range(first + 1, last + 1):
+            bits &= self.free[segment]
+        return bits
+
+    def find(self, first: int, last: int) -> Optional[int]:
+        """Seat free on every segment first..last, or None"""
+        candidates = self._free_over(first, last)
+        if not candidates:
+            return None
+        # Prefer a seat already sold on other segments, keeping seats that are
+        # free end to end for passengers riding the whole trip
+        partly_used = candidates & ~self._free_over(0, len(self.free) - 1)
+        return _lowest_bit(partly_used or candidates)
+
+    def take(self, seat: int, first: int, last: int) -> bool:
+        bit = 1 << seat
+        if seat >= self.capacity or not self._free_over(first, last) & bit:
+            return False
+        for segment in range(first, last + 1):
+            self.free[segment] &= ~bit
+        return True
+
+    def release(self, seat: int, first: int, last: int):
+        bit = 1 << seat
+        for segment in range(first, last + 1):
+            self.free[segment] |= bit
+
+    def available(self, segment: int) -> int:
+        return self.free[segment].bit_count()
+
+    def sold(self, segment: int) -> int:
+        return self.capacity - self.available(segment)
+
+    def can_resize(self, capacity: int) -> bool:
+        """Seats removed from the high end must be unsold on every segment"""
+        if capacity >= self.capacity:
+            return True
+        removed = ((1 << self.capacity) - 1) ^ ((1 << capacity) - 1)
+        return self._free_over(0, len(self.free) - 1) & removed == removed
+
+    def resize(self, capacity: int):
+        if not self.can_resize(capacity):
+            raise ValueError("Cannot remove seats that are already booked!")
+        if capacity > self.capacity:
+            added = ((1 << capacity) - 1) ^ ((1 << self.capacity) - 1)
+            self.free = [bits | added for bits in self.free]
+        elif capacity < self.capacity:
+            kept = (1 << capacity) - 1
+            self.free = [bits & kept for bits in self.free]
+        self.capacity = capacity
+
+
+class DepartureSummary(NamedTuple):
+    """What is kept of a departure once its date has passed"""
+    date: str
+    route_id: int
+    capacity: int
+    sold: int
+
+
+class SeatInventory:
+    """Per-date seat maps for every trip, keyed by the tuple of route_ids it runs"""
+
+    def __init__(self, routes: Dict[int, Dict], trips: Iterable[Sequence[int]] = (),
+                 window_days: int = 14, history_days: int = 366,
+                 today: Callable[[], Date] = Date.today):
+        self.routes = routes
+        self.window_days = window_days
+        self.history_days = history_days
+        self._clock = today
+        self.capacity: Dict[TripKey, int] = {}
+        self.segment_of: Dict[int, Tuple[TripKey, int]] = {}
+        self.departures: Dict[Tuple[TripKey, str], SeatMap] = {}
+        self.summaries: Dict[Tuple[str, int], DepartureSummary] = {}
+        # Guards the departures dict itself; a departure's seat map is
+        # guarded by the caller's per-trip lock
+        self._lock = threading.RLock()
+        self.today = self._clock().isoformat()
+        for trip in trips:
+            self.add_trip(trip)
+        for route_id in routes:
+            if route_id not in self.segment_of:
+                self.add_trip((route_id,))
+
+    def add_trip(self, route_ids: Sequence[int]):
+        key = tuple(route_ids)
+        for a, b in zip(key, key[1:]):
+            if route_endpoints(self.routes[a])[1] != route_endpoints(self.routes[b])[0]:
+                raise ValueError(f"Route {b} does not start where route {a} ends")
+        for route_id in key:
+            if route_id in self.segment_of:
+                raise ValueError(f"Route {route_id} is already part of a trip")
+        with self._lock:
+            # The vehicle has as many seats as its largest segment offers
+            self.capacity[key] = max(self.routes[r]['seats'] for r in key)
+            for segment, route_id in enumerate(key):
+                self.segment_of[route_id] = (key, segment)
+            self._sync_today(key)
+
+    def trip_key(self, route_id: int) -> TripKey:
+        if route_id not in self.segment_of:
+            # Routes added after startup run on their own
+            self.add_trip((route_id,))
+        return self.segment_of[route_id][0]
+
+    def runs(self, route_ids: Sequence[int]) -> List[List[int]]:
+        """Split a journey into runs of consecutive segments of the same trip"""
+        runs: List[List[int]] = []
+        for route_id in route_ids:
+            key, segment = self.segment_of[route_id] if route_id in self.segment_of else (None, None)
+            if runs and key is not None:
+                last_key, last_segment = self.segment_of[runs[-1][-1]]
+                if last_key == key and last_segment + 1 == segment:
+                    runs[-1].append(route_id)
+                    continue
+            runs.append([route_id])
+        return runs
+
+    # Dates and the rolling window
+
+    def bookable_dates(self) -> List[str]:
+        self.roll()
+        start = Date.fromisoformat(self.today)
+        return [(start + timedelta(days=i)).isoformat() for i in range(self.window_days)]
+
+    def check_date(self, date: str):
+        """Raise ValueError unless ``date`` is inside the booking window"""
+        self.roll()
+        try:
+            offset = (Date.fromisoformat(date) - Date.fromisoformat(self.today)).days
+        except (TypeError, ValueError):
+            raise ValueError("Please select a valid travel date!")
+        if offset < 0:
+            raise ValueError("Cannot book a departure in the past!")
+        if offset >= self.window_days:
+            raise ValueError(f"Bookings are open for the next {self.window_days} days only!")
+
+    def roll(self):
+        """On a new day, compact past departures into summaries"""
+        today = self._clock().isoformat()
+        if today == self.today:
+            return
+        with self._lock:
+            if today == self.today:
+                return
+            for (key, date), seat_map in list(self.departures.items()):
+                if date < today:
+                    for segment, route_id in enumerate(key):
+                        self.summaries[(date, route_id)] = DepartureSummary(
+                            date, route_id, seat_map.capacity, seat_map.sold(segment)
+                        )
+                    del self.departures[(key, date)]
+            oldest = (Date.fromisoformat(today) - timedelta(days=self.history_days)).isoformat()
+            for summary_key in [k for k in self.summaries if k[0] < oldest]:
+                del self.summaries[summary_key]
+            self.today = today
+            for key in self.capacity:
+                self._sync_today(key)
+
+    def departure(self, key: TripKey, date: str) -> SeatMap:
+        """Seat map of one departure, created on first use"""
+        seat_map = self.departures.get((key, date))
+        if seat_map is None:
+            with self._lock:
+                seat_map = self.departures.setdefault(
+                    (key, date), SeatMap(self.capacity[key], len(key))
+                )
+        return seat_map
+
+    def _sync_today(self, key: TripKey):
+        """Write today's seats left back to the routes' counters"""
+        seat_map = self.departures.get((key, self.today))
+        for segment, route_id in enumerate(key):
+            self.routes[route_id]['seats'] = (
+                seat_map.available(segment) if seat_map else self.capacity[key]
+            )
+
+    # Seats
+
+    def _span(self, route_ids: Sequence[int]) -> Tuple[TripKey, int, int]:
+        key = self.trip_key(route_ids[0])
+        return key, self.segment_of[route_ids[0]][1], self.segment_of[route_ids[-1]][1]
+
+    def allocate(self, route_ids: Sequence[int], date: str) -> Optional[int]:
+        """Take one seat over a run of consecutive segments; returns the 1-based seat"""
+        key, first, last = self._span(route_ids)
+        seat_map = self.departure(key, date)
+        seat = seat_map.find(first, last)
+        if seat is None:
+            return None
+        seat_map.take(seat, first, last)
+        if date == self.today:
+            self._sync_today(key)
+        return seat + 1
+
+    def occupy(self, route_id: int, date: str, seat: Optional[int]) -> bool:
+        """Mark a known seat as sold (e.g. when reloading stored bookings)
+
+        A departure that has already left only counts the seat.
+        """
+        key, segment, _ = self._span([route_id])
+        if date < self.today:
+            self._count_sold(key, route_id, date, 1)
+            return True
+        taken = bool(seat) and self.departure(key, date).take(seat - 1, segment, segment)
+        if date == self.today:
+            self._sync_today(key)
+        return taken
+
+    def forget(self, route_id: int, date: str, seat: Optional[int]):
+        """Undo occupy() for a stored booking that was later cancelled"""
+        key, segment, _ = self._span([route_id])
+        if date < self.today:
+            self._count_sold(key, route_id, date, -1)
+        elif seat:
+            self.release([route_id], date, seat)
+
+    def _count_sold(self, key: TripKey, route_id: int, date: str, delta: int):
+        with self._lock:
+            summary = self.summaries.get((date, route_id))
+            sold = (summary.sold if summary else 0) + delta
+            if sold > 0:
+                self.summaries[(date, route_id)] = DepartureSummary(
+                    date, route_id, summary.capacity if summary else self.capacity[key], sold
+                )
+            else:
+                self.summaries.pop((date, route_id), None)
+
+    def release(self, route_ids: Sequence[int], date: str, seat: int):
+        key, first, last = self._span(route_ids)
+        self.departure(key, date).release(seat - 1, first, last)
+        if date == self.today:
+            self._sync_today(key)
+
+    def available(self, route_id: int, date: str) -> int:
+        key, segment, _ = self._span([route_id])
+        seat_map = self.departures.get((key, date))
+        return seat_map.available(segment) if seat_map else self.capacity[key]
+
+    def free_seats(self, route_id: int, date: str) -> List[bool]:
+        """Per seat, whether it is still free on this route and date"""
+        key, segment, _ = self._span([route_id])
+        seat_map = self.departure(key, date)
+        return [bool(seat_map.free[segment] >> seat & 1) for seat in range(seat_map.capacity)]
+
+    def set_capacities(self, seats_by_route: Dict[int, int]) -> List[TripKey]:
+        """Seats per departure for several routes' vehicles, all or nothing
+
+        Open dates are resized too. Every change is validated before any is
+        applied; returns the trips that changed.
+        """
+        seats_by_trip: Dict[TripKey, int] = {}
+        for route_id, seats in seats_by_route.items():
+            key = self.trip_key(route_id)
+            if seats_by_trip.setdefault(key, seats) != seats:
+                raise ValueError(f"Routes {', '.join(map(str, key))} share a vehicle "
+                                 f"and need the same number of seats!")
+        with self._lock:
+            open_maps: Dict[TripKey, List[SeatMap]] = {key: [] for key in seats_by_trip}
+            for (key, _), seat_map in self.departures.items():
+                if key in open_maps:
+                    open_maps[key].append(seat_map)
+            for key, seats in seats_by_trip.items():
+                if not all(seat_map.can_resize(seats) for seat_map in open_maps[key]):
+                    raise ValueError(f"Cannot remove seats that are already booked "
+                                     f"on route {key[0]}!")
+
+            for key, seats in seats_by_trip.items():
+                for seat_map in open_maps[key]:
+                    seat_map.resize(seats)
+                self.capacity[key] = seats
+                self._sync_today(key)
+        return list(seats_by_trip)
+
+    def rebuild(self, bookings: Iterable[Dict], capacities: Dict[int, int],
+                sold: Optional[Dict[Tuple[str, int], int]] = None) -> List[Dict]:
+        """Recreate the departures from stored capacities and bookings
+
+        Past departures only need their counts, which callers that already
+        have them (per (date, route_id)) can pass as ``sold`` instead of
+        the bookings themselves. Returns the bookings that had no seat (or
+        one already taken), with ``seat`` set to the one they were given, or
+        to None (logged) where the departure has no seat left for them.
+        """
+        self.roll()
+        with self._lock:
+            for key in self.capacity:
+                stored = [capacities[r] for r in key if r in capacities]
+                if stored:
+                    self.capacity[key] = max(stored)
+            self.departures.clear()
+            self.summaries.clear()
+
+            # Past dates only need their counts
+            sold = dict(sold or {})
+            unseated = []
+            segment_of = self.segment_of
+            for booking in bookings:
+                route_id, date = booking['route_id'], booking['date']
+                if route_id not in segment_of:
+                    if route_id not in self.routes:
+                        continue
+                    self.trip_key(route_id)
+                if date < self.today:
+                    sold[(date, route_id)] = sold.get((date, route_id), 0) + 1
+                    continue
+                # occupy(), inlined for startup with millions of bookings
+                key, segment = segment_of[route_id]
+                seat_map = self.departures.get((key, date)) or self.departure(key, date)
+                seat = booking.get('seat')
+                if not seat or not seat_map.take(seat - 1, segment, segment):
+                    unseated.append(booking)
+            for (date, route_id), count in sold.items():
+                if route_id not in self.routes:
+                    continue
+                key = self.trip_key(route_id)
+                self.summaries[(date, route_id)] = DepartureSummary(
+                    date, route_id, self.capacity[key], count
+                )
+
+            # Bookings made before seat maps existed get a seat assigned now
+            overbooked: Dict[Tuple[int, str], List[int]] = {}
+            for booking in unseated:
+                booking['seat'] = self.allocate([booking['route_id']], booking['date'])
+                if booking['seat'] is None:
+                    overbooked.setdefault((booking['route_id'], booking['date']), []).append(
+                        booking['booking_id'])
+            for (route_id, date), booking_ids in overbooked.items():
+                log.warning("Route %s on %s is overbooked: no seat for booking(s) %s",
+                            route_id, date, ", ".join(map(str, booking_ids)))
+            for key in self.capacity:
+                self._sync_today(key)
+        return unseated
+
+    # Snapshots
+
+    def state(self) -> tuple:
+        """Capacities, open seat maps and past summaries, for marshal"""
+        with self._lock:
+            return (
+                self.today,
+                dict(self.capacity),
+                {key: (seat_map.capacity, list(seat_map.free))
+                 for key, seat_map in self.departures.items()},
+                {key: (summary.capacity, summary.sold) for key, summary in self.summaries.items()}
+            )
+
+    def load_state(self, state: tuple) -> bool:
+        """Restore a state(); False (and nothing changed) if the trips differ"""
+        today, capacity, departures, summaries = state
+        if set(capacity) != set(self.capacity):
+            return False
+        with self._lock:
+            self.capacity.update(capacity)
+            self.departures.clear()
+            for (key, date), (seats, free) in departures.items():
+                seat_map = self.departures[(key, date)] = SeatMap(seats, 0)
+                seat_map.free = free
+            self.summaries = {
+                (date, route_id): DepartureSummary(date, route_id, seats, sold)
+                for (date, route_id), (seats, sold) in summaries.items()
+            }
+            self.today = today
+        # Compacts the departures that left since the snapshot
+        self.roll()
+        with self._lock:
+            for key in self.capacity:
+                self._sync_today(key)
+        return True
@@ -0,0 +1,331 @@
+"""Pluggable persistence for users, bookings and seats per departure.
+
+``MemoryStorage`` keeps the original in-process behaviour. ``SQLiteStorage``
+writes to a SQLite database in WAL mode from a single writer thread that
+batches queued writes into group commits, so many bookings share one fsync.
+"""
+import os
+import queue
+import sqlite3
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class StorageError(Exception):
+    """Raised when a write could not be made durable"""
+
+
+class Commit:
+    """Handle for a queued write; ``wait()`` blocks until it is committed"""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    def _finish(self, error=None):
+        self._error = error
+        self._done.set()
+
+    def wait(self, timeout: Optional[float] = None):
+        if not self._done.wait(timeout):
+            raise StorageError("Timed out waiting for commit")
+        if self._error is not None:
+            raise StorageError(str(self._error)) from self._error
+
+
+# Shared handle for storages that have nothing to wait for
+_COMMITTED = Commit()
+_COMMITTED._finish()
+
+
+class MemoryStorage:
+    """Storage that keeps nothing; state lives only in process memory"""
+
+    durable = False
+
+    def load(self) -> Tuple[Dict[str, Dict], List[Dict], Dict[int, int]]:
+        return {}, [], {}
+
+    def save_user(self, email: str, user: Dict) -> Commit:
+        return _COMMITTED
+
+    def save_booking(self, booking: Dict) -> Commit:
+        return _COMMITTED
+
+    def save_seats(self, seats_by_route: Dict[int, int]) -> Commit:
+        return _COMMITTED
+
+    def cancel_booking(self, booking_id: int) -> Commit:
+        return _COMMITTED
+
+    def assign_seats(self, seats_by_booking: Dict[int, int]) -> Commit:
+        return _COMMITTED
+
+    def close(self):
+        pass
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    email TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    password TEXT NOT NULL,
+    is_admin INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS bookings (
+    booking_id INTEGER PRIMARY KEY,
+    email TEXT NOT NULL,
+    route_id INTEGER NOT NULL,
+    route_name TEXT NOT NULL,
+    date TEXT NOT NULL,
+    seat INTEGER,
+    booked_at TEXT
+);
+CREATE TABLE IF NOT EXISTS route_seats (
+    route_id INTEGER PRIMARY KEY,
+    seats INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS route_capacity (
+    route_id INTEGER PRIMARY KEY,
+    seats INTEGER NOT NULL
+);
+"""
+
+
+class SQLiteStorage:
+    """SQLite (WAL) storage with a background group-commit writer
+
+    With ``durable=True`` every commit is fsynced and callers of ``wait()``
+    block until their write is on disk; writes queued while a commit is in
+    flight are committed together in the next batch. With ``durable=False``
+    SQLite skips fsync and callers do not need to wait at all.
+    """
+
+    def __init__(self, path: str, durable: bool = True, max_batch: int = 512):
+        self.path = path
+        self.durable = durable
+        self.max_batch = max_batch
+
+        # Reads happen once at startup on the caller's thread
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        # Databases from before seat maps have no seat column yet
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(bookings)")}
+        if 'seat' not in columns:
+            conn.execute("ALTER TABLE bookings ADD COLUMN seat INTEGER")
+        # Nor when each booking was made
+        if 'booked_at' not in columns:
+            conn.execute("ALTER TABLE bookings ADD COLUMN booked_at TEXT")
+        # route_seats held one never-resetting "seats left" counter per route;
+        # the seats per departure were that counter plus every seat ever sold
+        if conn.execute("SELECT COUNT(*) FROM route_capacity").fetchone()[0] == 0:
+            conn.execute(
+                "INSERT INTO route_capacity (route_id, seats) "
+                "SELECT route_id, seats + (SELECT COUNT(*) FROM bookings b "
+                "WHERE b.route_id = s.route_id) FROM route_seats s"
+            )
+        conn.commit()
+        conn.close()
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="sqlite-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # In WAL mode FULL syncs on every commit, OFF leaves it to the OS
+        conn.execute(f"PRAGMA synchronous={'FULL' if self.durable else 'OFF'}")
+        return conn
+
+    def load(self) -> Tuple[Dict[str, Dict], List[Dict], Dict[int, int]]:
+        """Return (users, bookings, seats per departure of each route) as stored on disk"""
+        conn = self._connect()
+        try:
+            users = {
+                email: {
+                    "name": name,
+                    "password": password,
+                    "is_admin": bool(is_admin)
+                }
+                for email, name, password, is_admin in conn.execute(
+                    "SELECT email, name, password, is_admin FROM users"
+                )
+            }
+            bookings = [
+                {
+                    'booking_id': booking_id,
+                    'email': email,
+                    'route_name': route_name,
+                    'date': date,
+                    'route_id': route_id,
+                    'seat': seat,
+                    'booked_at': booked_at
+                }
+                for booking_id, email, route_id, route_name, date, seat, booked_at in conn.execute(
+                    "SELECT booking_id, email, route_id, route_name, date, seat, booked_at "
+                    "FROM bookings ORDER BY booking_id"
+                )
+            ]
+            seats = dict(conn.execute("SELECT route_id, seats FROM route_capacity"))
+        finally:
+            conn.close()
+        return users, bookings, seats
+
+    def iter_bookings(self, route_id: Optional[int] = None, date_from: Optional[str] = None,
+                      date_to: Optional[str] = None, batch_size: int = 1000) -> Iterator[Dict]:
+        """Stream stored bookings in booking order without loading them all"""
+        conditions, params = [], []
+        if route_id is not None:
+            conditions.append("route_id = ?")
+            params.append(route_id)
+        if date_from is not None:
+            conditions.append("date >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            conditions.append("date <= ?")
+            params.append(date_to)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "SELECT booking_id, email, route_id, route_name, date, seat, booked_at "
+                f"FROM bookings {where}ORDER BY booking_id", params
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for booking_id, email, route_id_, route_name, date, seat, booked_at in rows:
+                    yield {
+                        'booking_id': booking_id,
+                        'email': email,
+                        'route_id': route_id_,
+                        'route_name': route_name,
+                        'date': date,
+                        'seat': seat,
+                        'booked_at': booked_at
+                    }
+        finally:
+            conn.close()
+
+    def iter_users(self) -> Iterator[Dict]:
+        """Stream stored users with their booking counts (no password hashes)"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "SELECT u.email, u.name, u.is_admin, COUNT(b.booking_id) FROM users u "
+                "LEFT JOIN bookings b ON b.email = u.email GROUP BY u.email ORDER BY u.email"
+            )
+            for email, name, is_admin, count in cursor:
+                yield {"email": email, "name": name, "is_admin": bool(is_admin), "bookings": count}
+        finally:
+            conn.close()
+
+    def _submit(self, sql: str, params: tuple) -> Commit:
+        commit = Commit()
+        self._queue.put((sql, params, commit))
+        return commit
+
+    def save_user(self, email: str, user: Dict) -> Commit:
+        return self._submit(
+            "INSERT OR REPLACE INTO users (email, name, password, is_admin) VALUES (?, ?, ?, ?)",
+            (email, user['name'], user['password'], int(user.get('is_admin', False)))
+        )
+
+    def save_booking(self, booking: Dict) -> Commit:
+        return self._submit(
+            "INSERT INTO bookings (booking_id, email, route_id, route_name, date, seat, booked_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (booking['booking_id'], booking['email'], booking['route_id'],
+             booking['route_name'], booking['date'], booking.get('seat'), booking.get('booked_at'))
+        )
+
+    def cancel_booking(self, booking_id: int) -> Commit:
+        return self._submit("DELETE FROM bookings WHERE booking_id = ?", (booking_id,))
+
+    def save_seats(self, seats_by_route: Dict[int, int]) -> Commit:
+        """Store the seats per departure of any number of routes in one statement"""
+        return self._submit(
+            "INSERT OR REPLACE INTO route_capacity (route_id, seats) VALUES (?, ?)",
+            list(seats_by_route.items())
+        )
+
+    def assign_seats(self, seats_by_booking: Dict[int, int]) -> Commit:
+        """Store seats given to bookings saved without one, in one statement"""
+        return self._submit(
+            "UPDATE bookings SET seat = ? WHERE booking_id = ?",
+            [(seat, booking_id) for booking_id, seat in seats_by_booking.items()]
+        )
+
+    @staticmethod
+    def _execute(conn: sqlite3.Connection, sql: str, params):
+        # A list of rows is one executemany, so it is applied in full or not at all
+        if isinstance(params, list):
+            conn.executemany(sql, params)
+        else:
+            conn.execute(sql, params)
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            # Drain whatever queued up while the previous commit was syncing
+            batch = [item]
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            try:
+                with conn:
+                    for sql, params, _ in batch:
+                        self._execute(conn, sql, params)
+                errors = [None] * len(batch)
+            except sqlite3.Error:
+                # One bad write (e.g. a duplicate booking_id) rolled back the
+                # whole group; redo each write alone so only that one fails
+                errors = []
+                for sql, params, _ in batch:
+                    try:
+                        with conn:
+                            self._execute(conn, sql, params)
+                        errors.append(None)
+                    except sqlite3.Error as e:
+                        errors.append(e)
+            for (_, _, commit), error in zip(batch, errors):
+                commit._finish(error)
+
+            if stop:
+                break
+        conn.close()
+
+    def close(self):
+        """Flush pending writes and stop the writer thread"""
+        self._queue.put(None)
+        self._writer.join()
+
+
+def open_storage(db_path: Optional[str] = None, journal_path: Optional[str] = None,
+                 read_only: bool = False):
+    """The storage the app runs on: the append-only journal when
+    ``journal_path`` or TRANSCONNECT_JOURNAL names one, otherwise SQLite at
+    ``db_path`` or TRANSCONNECT_DB; an explicit ``db_path`` wins over the
+    environment's journal. ``read_only`` opens a journal with a
+    ``JournalReader``, which leaves the file alone for a running app."""
+    if journal_path is None and db_path is None:
+        journal_path = os.environ.get("TRANSCONNECT_JOURNAL")
+    if journal_path:
+        from journal import JournalReader, JournalStorage
+        return JournalReader(journal_path) if read_only else JournalStorage(journal_path)
+    return SQLiteStorage(db_path or os.environ.get("TRANSCONNECT_DB", "transconnect.db"))
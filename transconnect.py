@@ -1,91 +1,197 @@
 # Import required Python libraries
 import time
-from typing import Dict, List
+_IMPORT_START = time.perf_counter()
+from typing import Dict
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import ttkbootstrap as ttk  # For modern styling (pip install ttkbootstrap)
-import folium
-from geopy.geocoders import Nominatim
-from geopy.location import Location
-from geopy import distance
-import webbrowser
 import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date as Date
 
-# Create in-memory storage using dictionaries and lists
-# users: stores user information like name, email, password, and their bookings
-# bookings: stores all booking information across the system
-users: Dict[str, Dict] = {
-    "admin@gmail.com": {
-        "name": "Admin",
-        "password": "admin123",
-        "is_admin": True,
-        "bookings": []
-    }
+from app_state import REMOTE_BARANGAYS, REMOTE_STOPS, ROUTES, auth, engine, users
+from booking_engine import BookingError
+from capacity_import import read_capacity_csv
+from exporter import BOOKING_FIELDS, USER_FIELDS, engine_bookings, engine_users, write_rows
+from map_renderer import MapRenderer
+from metrics import EventLoopLagProbe, Metrics, MetricsExporter, instrument
+from route_model import RouteTable
+from storage import open_storage
+from widgets import EditableGrid, ScreenManager, SearchBox, Sparkline, VirtualList
+
+# Municipality map HTML, cached by content hash and rendered in the background
+map_renderer = MapRenderer()
+# Single-route maps opened after booking, kept apart so the municipality
+# screen never falls back to one of them
+route_map_renderer = MapRenderer(cache_dir=os.path.join("map_cache", "routes"))
+
+# OpenStreetMap extract for offline road routing (road_router.py); without
+# it routes are drawn as straight lines between their end points
+ROAD_EXTRACT = os.environ.get("TRANSCONNECT_OSM", "marinduque.osm")
+
+# Long-running admin jobs such as exports, kept off the Tk thread
+background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="background")
+
+# Screen timings and event-loop lag, written to the file named by
+# TRANSCONNECT_METRICS (.json, otherwise Prometheus text); off when unset
+metrics = Metrics(enabled=bool(os.environ.get("TRANSCONNECT_METRICS")))
+
+# Municipality town centres shown on the map and pre-seeded into the geocoder
+MUNICIPALITIES = {
+    "Boac": {"coords": [13.4488, 121.8386], "color": "red"},        # Provincial Capital
+    "Mogpog": {"coords": [13.4819, 121.8637], "color": "blue"},
+    "Santa Cruz": {"coords": [13.4280, 122.0094], "color": "green"},
+    "Torrijos": {"coords": [13.3127, 122.0871], "color": "purple"},
+    "Buenavista": {"coords": [13.2574, 121.9226], "color": "orange"},
+    "Gasan": {"coords": [13.3197, 121.8685], "color": "darkblue"}
 }
-bookings: List[Dict] = []
-
-# Define available transportation routes in Marinduque
-# Each route has: name, GPS coordinates for start/end points, available seats, and schedule
-ROUTES = {
-    1: {
-        "name": "Boac to Mogpog",
-        "start_gps": "13.449078, 121.839003",  # Boac town proper
-        "end_gps": "13.473615, 121.860948",    # Mogpog town proper
-        "seats": 15,
-        "schedule": "7:00 AM"
-    },
-    2: {
-        "name": "Mogpog to Santa Cruz", 
-        "start_gps": "13.473615, 121.860948",  # Mogpog town proper
-        "end_gps": "13.475758368354766, 122.03110517819835",    # Santa Cruz town proper
-        "seats": 15,
-        "schedule": "9:00 AM"
-    },
-    3: {
-        "name": "Santa Cruz to Torrijos",
-        "start_gps": "13.475758368354766, 122.03110517819835",  # Santa Cruz town proper
-        "end_gps": "13.320148, 122.084475",    # Torrijos town proper
-        "seats": 15,
-        "schedule": "11:00 AM"
-    },
-    4: {
-        "name": "Torrijos to Buenavista",
-        "start_gps": "13.320148, 122.084475",  # Torrijos town proper
-        "end_gps": "13.473615, 121.860948",    # Buenavista town proper DONE
-        "seats": 15,
-        "schedule": "1:00 PM"
-    },
-    5: {
-        "name": "Buenavista to Gasan",
-        "start_gps": "13.473615, 121.860948",  # Buenavista town proper
-        "end_gps": "13.328510, 121.845800",    # Gasan town proper
-        "seats": 15,
-        "schedule": "3:00 PM"
-    },
-    6: {
-        "name": "Gasan to Boac",
-        "start_gps": "13.328510, 121.845800",  # Gasan town proper
-        "end_gps": "13.449078, 121.839003",    # Boac town proper
-        "seats": 15,
-        "schedule": "3:00 PM"
+
+# Center of Marinduque, used until we read device GPS or IP-based location
+MARINDUQUE_CENTER = (13.4013, 121.9694)
+
+def route_line(routes: RouteTable, route_id: int, distance_matrix, router=None) -> Dict:
+    """A route's polyline and popup: along the roads when there is a road
+    router, otherwise a straight line with the estimated road distance"""
+    # Coordinates were parsed once when the RouteTable was loaded
+    start, end = routes.coords(route_id)
+    road = router.route(start, end) if router is not None else None
+    if road is None:
+        path, trip = [start, end], distance_matrix.describe_route(route_id)
+    else:
+        from distance_matrix import format_trip
+        path, trip = road.path, format_trip(road.distance_km, road.minutes)
+    return {
+        "path": [list(point) for point in path],
+        "popup": f"Route {route_id}: {routes[route_id]['name']} ({trip})"
     }
-}
 
-def get_current_location():
-    """Get the current location using geopy's Nominatim service"""
-    try:
-        geolocator = Nominatim(user_agent="transconnect")
-        # For demo purposes, we'll use Marinduque's center coordinates
-        # In a real app, you'd use device GPS or IP-based location
-        location = geolocator.reverse("13.4013° N, 121.9694° E")
-        return location
-    except Exception as e:
-        print(f"Error getting location: {e}")
+def map_snapshot(routes: RouteTable, distance_matrix, router=None) -> Dict:
+    """Everything drawn on the municipality map, as plain data"""
+    distance_matrix.refresh()
+    return {
+        "center": list(MARINDUQUE_CENTER),
+        "municipalities": MUNICIPALITIES,
+        "routes": [route_line(routes, route_id, distance_matrix, router) for route_id in routes]
+    }
+
+def route_map_snapshot(routes: RouteTable, route_id: int, distance_matrix, router=None) -> Dict:
+    """One route on the municipality map, zoomed to fit it"""
+    line = route_line(routes, route_id, distance_matrix, router)
+    lats, lons = [p[0] for p in line["path"]], [p[1] for p in line["path"]]
+    return {
+        "center": [(min(lats) + max(lats)) / 2, (min(lons) + max(lons)) / 2],
+        "bounds": [[min(lats), min(lons)], [max(lats), max(lons)]],
+        "municipalities": MUNICIPALITIES,
+        "routes": [line]
+    }
+
+# numpy, geopy and folium take most of the startup time, so everything that
+# needs them is created on first use (or by preload_in_background once the
+# login screen is up) instead of at import
+_lazy_lock = threading.RLock()
+_distances = None
+_planner = None
+_geocoding_service = None
+_geocoding_tk_root = None
+# Preprocessing an extract can take a while, so the road router has its own
+# lock rather than holding up the distance tables
+_road_router_lock = threading.Lock()
+_road_router = None
+_road_router_checked = False
+
+def get_distances():
+    """Stop-to-stop distance/ETA tables, rebuilt only when the route set changes"""
+    global _distances
+    with _lazy_lock:
+        if _distances is None:
+            from distance_matrix import DistanceMatrix
+            _distances = DistanceMatrix(ROUTES)
+    return _distances
+
+def get_planner():
+    """Earliest-arrival trip planner over the route schedules"""
+    global _planner
+    with _lazy_lock:
+        if _planner is None:
+            from journey_planner import JourneyPlanner
+            _planner = JourneyPlanner(ROUTES, get_distances())
+    return _planner
+
+def get_road_router():
+    """Offline road router over ROAD_EXTRACT, or None when there is no extract"""
+    global _road_router, _road_router_checked
+    with _road_router_lock:
+        if not _road_router_checked:
+            _road_router_checked = True
+            if os.path.exists(ROAD_EXTRACT):
+                from road_router import RoadRouter
+                _road_router = RoadRouter.open(ROAD_EXTRACT)
+    return _road_router
+
+def loaded_road_router():
+    """The road router if it is already loaded; never waits for it"""
+    return _road_router
+
+def get_geocoding_service():
+    """Shared background geocoder, created on first use (on the Tk thread)"""
+    global _geocoding_service
+    if _geocoding_service is None:
+        from geocoding import GeocodingService
+        _geocoding_service = GeocodingService(cache_path="geocode_cache.json")
+        _geocoding_service.seed({
+            name: tuple(data["coords"]) for name, data in MUNICIPALITIES.items()
+        })
+        # The point get_current_location() asks about, so a fresh install's
+        # first map visit does not wait on Nominatim either
+        _geocoding_service.seed({"Marinduque": MARINDUQUE_CENTER}, region="Philippines")
+        if _geocoding_tk_root is not None:
+            _geocoding_service.attach_tk(_geocoding_tk_root)
+    return _geocoding_service
+
+def attach_geocoding_to_tk(root):
+    """Deliver geocoding results on the Tk thread, whenever the service starts"""
+    global _geocoding_tk_root
+    _geocoding_tk_root = root
+    if _geocoding_service is not None:
+        _geocoding_service.attach_tk(root)
+
+def preload_in_background():
+    """Import the heavy libraries and build the distance tables off the Tk thread"""
+    def preload():
+        get_planner()
+        import folium  # noqa: F401  (used by map_renderer.render_map)
+        import geocoding  # noqa: F401
+        get_road_router()
+    threading.Thread(target=preload, name="preload", daemon=True).start()
+
+def after_first_paint(root, callback):
+    """Call ``callback()`` once the window has been mapped and drawn"""
+    def on_map(event):
+        if event.widget is root:
+            root.unbind("<Map>", binding)
+            # Redraws are idle callbacks queued by the map, so this runs after them
+            root.after_idle(callback)
+    binding = root.bind("<Map>", on_map, add="+")
+
+def get_current_location(callback=None):
+    """Get the current location using geopy's Nominatim service
+    
+    With a callback the lookup runs in the background and the callback gets
+    the Location (or None); without one this blocks and returns it.
+    """
+    service = get_geocoding_service()
+    if callback is not None:
+        service.reverse_async(*MARINDUQUE_CENTER, callback)
         return None
+    return service.reverse(*MARINDUQUE_CENTER, timeout=30)
 
 class TransConnectApp:
-    def __init__(self, root):
+    def __init__(self, root, booking_engine=None, auth_service=None):
         self.root = root
+        self.engine = booking_engine or engine
+        self.auth = auth_service or auth
         self.root.title("TransConnect")
         self.root.geometry("1024x768")
         self.current_user = None
@@ -114,7 +220,11 @@ class TransConnectApp:
         # Configure the root window background
         self.root.configure(bg='#F5F5F5')  # Light gray background
         
+        # Geocoding results are delivered back on the Tk thread
+        attach_geocoding_to_tk(self.root)
+        
         self.setup_main_frame()
+        self.setup_screens()
         self.show_login_frame()
     
     def setup_main_frame(self):
@@ -141,14 +251,40 @@ class TransConnectApp:
         )
         subheader.pack(pady=(0, 30))
     
+    def setup_screens(self):
+        # Each screen is built once on first visit and then only hidden and
+        # shown again; the refresh callbacks update data-driven widgets
+        self.screens = ScreenManager()
+        self._stats_job = None
+        screen_fill = dict(pady=20, fill=tk.BOTH, expand=True)
+        screen_card = dict(pady=20, padx=40, ipadx=40, ipady=30)
+        self.screens.register('login', self.build_login_frame, self.refresh_login_frame,
+                              pady=20, padx=20, ipadx=40, ipady=30)
+        self.screens.register('register', self.build_register_frame, self.refresh_register_frame,
+                              **screen_card)
+        self.screens.register('user_dashboard', self.build_user_dashboard,
+                              self.refresh_user_dashboard, **screen_fill)
+        self.screens.register('routes', self.build_routes, self.refresh_routes, **screen_fill)
+        self.screens.register('booking_form', self.build_booking_form, self.refresh_booking_form,
+                              **screen_card)
+        self.screens.register('my_bookings', self.build_my_bookings,
+                              self.refresh_my_bookings, **screen_fill)
+        self.screens.register('location_map', self.build_location_map,
+                              self.refresh_location_map, **screen_fill)
+        self.screens.register('admin_dashboard', self.build_admin_dashboard,
+                              self.refresh_admin_dashboard, **screen_fill)
+        self.screens.register('seat_management', self.build_seat_management,
+                              self.refresh_seat_management, **screen_fill)
+        self.screens.register('all_bookings', self.build_all_bookings,
+                              lambda: self.all_bookings_list.refresh(), **screen_fill)
+        self.screens.register('export', self.build_export, self.refresh_export, **screen_card)
+    
     def show_login_frame(self):
-        # Clear previous frames
-        for widget in self.main_frame.winfo_children()[1:]:
-            widget.destroy()
-        
+        self.screens.show('login')
+
+    def build_login_frame(self):
         # Create card-like container
         login_frame = ttk.Frame(self.main_frame, style='Card.TFrame')
-        login_frame.pack(pady=20, padx=20, ipadx=40, ipady=30)
         
         # Login header
         ttk.Label(
@@ -160,18 +296,18 @@ class TransConnectApp:
         
         # Styled input fields
         ttk.Label(login_frame, text="Email:", font=("Helvetica", 11)).grid(row=1, column=0, pady=10, sticky='e', padx=10)
-        email_entry = ttk.Entry(login_frame, width=35, font=("Helvetica", 11))
+        email_entry = self.login_email_entry = ttk.Entry(login_frame, width=35, font=("Helvetica", 11))
         email_entry.grid(row=1, column=1, pady=10, padx=10)
         
         ttk.Label(login_frame, text="Password:", font=("Helvetica", 11)).grid(row=2, column=0, pady=10, sticky='e', padx=10)
-        password_entry = ttk.Entry(login_frame, width=35, show="•", font=("Helvetica", 11))
+        password_entry = self.login_password_entry = ttk.Entry(login_frame, width=35, show="•", font=("Helvetica", 11))
         password_entry.grid(row=2, column=1, pady=10, padx=10)
         
         # Styled buttons
         button_frame = ttk.Frame(login_frame)
         button_frame.grid(row=3, column=0, columnspan=2, pady=25)
         
-        login_btn = ttk.Button(
+        login_btn = self.login_button = ttk.Button(
             button_frame,
             text="Login",
             style='Action.TButton',
@@ -186,15 +322,19 @@ class TransConnectApp:
             command=self.show_register_frame
         )
         register_btn.pack(side=tk.LEFT, padx=10)
-    
+        return login_frame
+
+    def refresh_login_frame(self):
+        # Start every visit with an empty form
+        self.login_email_entry.delete(0, tk.END)
+        self.login_password_entry.delete(0, tk.END)
+
     def show_register_frame(self):
-        # Clear previous frames
-        for widget in self.main_frame.winfo_children()[1:]:
-            widget.destroy()
-        
+        self.screens.show('register')
+
+    def build_register_frame(self):
         # Create modern registration card
         register_frame = ttk.Frame(self.main_frame, style='Card.TFrame')
-        register_frame.pack(pady=20, padx=40, ipadx=40, ipady=30)
         
         # Registration header
         ttk.Label(
@@ -222,7 +362,7 @@ class TransConnectApp:
             ("Password", "password_entry", "*")
         ]
         
-        entries = {}
+        entries = self.register_entries = {}
         for i, (label, key, *args) in enumerate(fields):
             ttk.Label(
                 input_frame,
@@ -245,7 +385,7 @@ class TransConnectApp:
         button_frame.pack(pady=30)
         
         # Styled buttons
-        register_btn = ttk.Button(
+        register_btn = self.register_button = ttk.Button(
             button_frame,
             text="Create Account",
             style='Action.TButton',
@@ -264,26 +404,30 @@ class TransConnectApp:
             command=self.show_login_frame
         )
         back_btn.pack(side=tk.LEFT, padx=10)
+        return register_frame
+
+    def refresh_register_frame(self):
+        for entry in self.register_entries.values():
+            entry.delete(0, tk.END)
 
     def show_user_dashboard(self):
-        # Clear previous frames
-        for widget in self.main_frame.winfo_children()[1:]:
-            widget.destroy()
-        
+        self.screens.show('user_dashboard')
+
+    def build_user_dashboard(self):
         # Create modern dashboard layout
         dashboard_frame = ttk.Frame(self.main_frame)
-        dashboard_frame.pack(pady=20, fill=tk.BOTH, expand=True)
         
         # Welcome section with user info
         welcome_frame = ttk.Frame(dashboard_frame, style='Card.TFrame')
         welcome_frame.pack(fill=tk.X, padx=20, pady=10, ipady=15)
         
-        ttk.Label(
+        # Filled in with the logged-in user's name on every show
+        self.welcome_label = ttk.Label(
             welcome_frame,
-            text=f"Welcome back, {users[self.current_user]['name']}",
             font=("Helvetica", 20, "bold"),
             foreground='#2196F3'
-        ).pack(pady=(10, 5))
+        )
+        self.welcome_label.pack(pady=(10, 5))
         
         ttk.Label(
             welcome_frame,
@@ -326,6 +470,10 @@ class TransConnectApp:
             "Sign out of your account",
             self.logout
         )
+        return dashboard_frame
+
+    def refresh_user_dashboard(self):
+        self.welcome_label.configure(text=f"Welcome back, {users[self.current_user]['name']}")
 
     def create_dashboard_card(self, parent, row, col, title, description, command):
         # Updated card style with shadows and hover effect
@@ -374,20 +522,21 @@ class TransConnectApp:
             messagebox.showerror("Error", "All fields are required!")
             return
         
-        # Check if email already exists
-        if email in users:
-            messagebox.showerror("Error", "Email already registered!")
-            return
+        # Hash the password and register in the background; fails if the email already exists
+        self.register_button.configure(state=tk.DISABLED)
         
-        # Register new user
-        users[email] = {
-            "name": name,
-            "password": password,
-            "bookings": []
-        }
+        def on_registered(future):
+            self.register_button.configure(state=tk.NORMAL)
+            try:
+                future.result()
+            except BookingError as e:
+                messagebox.showerror("Error", str(e))
+                return
+            
+            messagebox.showinfo("Success", "Registration successful! Please login.")
+            self.show_login_frame()
         
-        messagebox.showinfo("Success", "Registration successful! Please login.")
-        self.show_login_frame()
+        self.when_done(self.auth.register_async(name, email, password), on_registered)
 
     def handle_login(self, email, password):
         # Input validation
@@ -395,25 +544,41 @@ class TransConnectApp:
             messagebox.showerror("Error", "All fields are required!")
             return
         
-        # Check if user exists and password matches
-        if email in users and users[email]["password"] == password:
+        # Check if user exists and password matches; the hash check runs in
+        # the auth worker pool so the window stays responsive
+        self.login_button.configure(state=tk.DISABLED)
+        
+        def on_verified(future):
+            self.login_button.configure(state=tk.NORMAL)
+            user = future.result()
+            if user is None:
+                messagebox.showerror("Error", "Invalid email or password!")
+                return
+            
             self.current_user = email
-            self.is_admin = users[email].get("is_admin", False)  # Check if user is admin
+            self.is_admin = user.get("is_admin", False)  # Check if user is admin
             if self.is_admin:
                 self.show_admin_dashboard()
             else:
                 self.show_user_dashboard()
-        else:
-            messagebox.showerror("Error", "Invalid email or password!")
+        
+        self.when_done(self.auth.authenticate_async(email, password), on_verified)
+
+    def when_done(self, future, callback, interval_ms=20):
+        """Call ``callback(future)`` on the Tk thread once a background job finishes"""
+        def check():
+            if future.done():
+                callback(future)
+            else:
+                self.root.after(interval_ms, check)
+        check()
 
     def show_routes(self):
-        # Clear previous frames
-        for widget in self.main_frame.winfo_children()[1:]:
-            widget.destroy()
-        
+        self.screens.show('routes')
+
+    def build_routes(self):
         # Create container
         routes_frame = ttk.Frame(self.main_frame)
-        routes_frame.pack(pady=20, fill=tk.BOTH, expand=True)
         
         # Header
         ttk.Label(
@@ -423,114 +588,133 @@ class TransConnectApp:
             foreground='#2196F3'
         ).pack(pady=(0, 20))
         
-        # Create canvas and scrollbar for scrolling
-        canvas = tk.Canvas(routes_frame)
-        scrollbar = ttk.Scrollbar(routes_frame, orient="vertical", command=canvas.yview)
-        scrollable_frame = ttk.Frame(canvas)
+        # Back button
+        self.routes_back_button = ttk.Button(
+            routes_frame,
+            text="Back to Dashboard",
+            style='Action.TButton'
+        )
+        self.routes_back_button.pack(side=tk.BOTTOM, pady=30)
         
-        # Configure scrolling
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+        # Virtualized list of route cards; only visible rows have widgets
+        route_ids = self.route_ids = list(ROUTES)
+        self.routes_list = VirtualList(
+            routes_frame,
+            row_count=lambda: len(route_ids),
+            fetch_rows=lambda start, stop: [(rid, ROUTES[rid]) for rid in route_ids[start:stop]],
+            create_row=self.create_route_row,
+            fill_row=self.fill_route_row,
+            row_height=150
+        )
+        self.routes_list.pack(fill=tk.BOTH, expand=True, padx=(40, 0))
+        return routes_frame
+
+    def refresh_routes(self):
+        # Only the visible rows are refilled, which picks up new seat counts
+        get_distances().refresh()
+        self.route_ids[:] = list(ROUTES)
+        back_command = self.show_admin_dashboard if self.is_admin else self.show_user_dashboard
+        self.routes_back_button.configure(command=back_command)
+        self.routes_list.refresh()
+
+    def create_route_row(self, parent):
+        """Build one reusable route card for the routes list"""
+        row = ttk.Frame(parent)
+        route_card = ttk.Frame(row, style='Card.TFrame')
+        route_card.pack(pady=10, fill=tk.BOTH, expand=True)
+        
+        # Add inner padding
+        inner_card = ttk.Frame(route_card)
+        inner_card.pack(padx=20, pady=15, fill=tk.X)
+        
+        # Route header with updated colors
+        row.title_label = ttk.Label(
+            inner_card,
+            font=("Helvetica", 14, "bold"),
+            foreground='#1976D2'  # Darker blue
         )
+        row.title_label.pack(anchor="w", pady=(0, 5))
         
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw", width=canvas.winfo_reqwidth())
-        canvas.configure(yscrollcommand=scrollbar.set)
+        row.name_label = ttk.Label(
+            inner_card,
+            font=("Helvetica", 12, "bold"),
+            foreground='#424242'
+        )
+        row.name_label.pack(anchor="w")
         
-        # Pack scrollbar and canvas
-        scrollbar.pack(side="right", fill="y")
-        canvas.pack(side="left", fill="both", expand=True, padx=(40, 0))
+        # Route details
+        details_frame = ttk.Frame(inner_card)
+        details_frame.pack(fill=tk.X, padx=20, pady=(10, 0))
         
-        # Update route cards with modern styling
-        for route_id, route_info in ROUTES.items():
-            route_card = ttk.Frame(scrollable_frame, style='Card.TFrame')
-            route_card.pack(pady=10, fill=tk.X)
-            
-            # Add inner padding
-            inner_card = ttk.Frame(route_card)
-            inner_card.pack(padx=20, pady=20, fill=tk.X)
-            
-            # Route header with updated colors
-            ttk.Label(
-                inner_card,
-                text=f"Route {route_id}",
-                font=("Helvetica", 14, "bold"),
-                foreground='#1976D2'  # Darker blue
-            ).pack(anchor="w", pady=(0, 5))
-            
-            ttk.Label(
-                inner_card,
-                text=route_info['name'],
-                font=("Helvetica", 12, "bold"),
-                foreground='#424242'
-            ).pack(anchor="w")
-            
-            # Route details
-            details_frame = ttk.Frame(inner_card)
-            details_frame.pack(fill=tk.X, padx=20, pady=(10, 0))
-            
-            # Schedule
-            schedule_frame = ttk.Frame(details_frame)
-            schedule_frame.pack(side=tk.LEFT, padx=(0, 30))
-            
-            ttk.Label(
-                schedule_frame,
-                text="Schedule",
-                font=("Helvetica", 10),
-                foreground='#757575'
-            ).pack(anchor="w")
-            
-            ttk.Label(
-                schedule_frame,
-                text=route_info['schedule'],
-                font=("Helvetica", 12, "bold"),
-                foreground='#424242'
-            ).pack(anchor="w")
-            
-            # Available seats
-            seats_frame = ttk.Frame(details_frame)
-            seats_frame.pack(side=tk.LEFT)
-            
-            ttk.Label(
-                seats_frame,
-                text="Available Seats",
-                font=("Helvetica", 10),
-                foreground='#757575'
-            ).pack(anchor="w")
-            
-            ttk.Label(
-                seats_frame,
-                text=str(route_info['seats']),
-                font=("Helvetica", 12, "bold"),
-                foreground='#424242'
-            ).pack(anchor="w")
+        # Schedule
+        schedule_frame = ttk.Frame(details_frame)
+        schedule_frame.pack(side=tk.LEFT, padx=(0, 30))
         
-        # Back button with unbinding
-        def on_back():
-            self.root.unbind_all("<MouseWheel>")  # Unbind mousewheel before destroying
-            self.show_user_dashboard()
+        ttk.Label(
+            schedule_frame,
+            text="Schedule",
+            font=("Helvetica", 10),
+            foreground='#757575'
+        ).pack(anchor="w")
         
-        ttk.Button(
-            routes_frame,
-            text="Back to Dashboard",
-            style='Action.TButton',
-            command=on_back
-        ).pack(pady=30)
+        row.schedule_label = ttk.Label(
+            schedule_frame,
+            font=("Helvetica", 12, "bold"),
+            foreground='#424242'
+        )
+        row.schedule_label.pack(anchor="w")
+        
+        # Available seats
+        seats_frame = ttk.Frame(details_frame)
+        seats_frame.pack(side=tk.LEFT)
+        
+        ttk.Label(
+            seats_frame,
+            text="Available Seats",
+            font=("Helvetica", 10),
+            foreground='#757575'
+        ).pack(anchor="w")
+        
+        row.seats_label = ttk.Label(
+            seats_frame,
+            font=("Helvetica", 12, "bold"),
+            foreground='#424242'
+        )
+        row.seats_label.pack(anchor="w")
         
-        # Configure canvas scrolling
-        def on_mousewheel(event):
-            canvas.yview_scroll(int(-1*(event.delta/120)), "units")
+        # Distance and estimated travel time
+        trip_frame = ttk.Frame(details_frame)
+        trip_frame.pack(side=tk.LEFT, padx=(30, 0))
         
-        self.root.bind_all("<MouseWheel>", on_mousewheel)
+        ttk.Label(
+            trip_frame,
+            text="Distance / Travel Time",
+            font=("Helvetica", 10),
+            foreground='#757575'
+        ).pack(anchor="w")
+        
+        row.trip_label = ttk.Label(
+            trip_frame,
+            font=("Helvetica", 12, "bold"),
+            foreground='#424242'
+        )
+        row.trip_label.pack(anchor="w")
+        return row
+
+    def fill_route_row(self, row, item):
+        route_id, route_info = item
+        row.title_label.configure(text=f"Route {route_id}")
+        row.name_label.configure(text=route_info['name'])
+        row.schedule_label.configure(text=route_info['schedule'])
+        row.seats_label.configure(text=str(self.engine.available_seats(route_id)))
+        row.trip_label.configure(text=get_distances().describe_route(route_id))
 
     def show_booking_form(self):
-        # Clear previous frames
-        for widget in self.main_frame.winfo_children()[1:]:
-            widget.destroy()
-        
+        self.screens.show('booking_form')
+
+    def build_booking_form(self):
         # Create booking container
         booking_frame = ttk.Frame(self.main_frame, style='Card.TFrame')
-        booking_frame.pack(pady=20, padx=40, ipadx=40, ipady=30)
         
         # Booking header
         ttk.Label(
@@ -555,15 +739,90 @@ class TransConnectApp:
             foreground='#424242'
         ).pack(anchor='w', padx=20, pady=(10, 5))
         
-        route_var = tk.StringVar()
-        route_combo = ttk.Combobox(
+        # Type part of a town or route name; matches resolve to route_ids
+        self.route_search_box = SearchBox(
+            booking_frame,
+            search=lambda text: [(route_id, ROUTES.name(route_id))
+                                 for route_id in self.engine.search_routes(text)],
+            on_select=self.on_route_selected,
+            height=4
+        )
+        self.route_search_box.pack(padx=20, pady=(0, 10))
+        
+        # Distance and travel time of the selected route, by table lookup
+        self.booking_trip_label = ttk.Label(
             booking_frame,
-            textvariable=route_var,
             font=("Helvetica", 11),
-            width=40
+            foreground='#616161'
+        )
+        self.booking_trip_label.pack(padx=20, pady=(0, 10))
+        
+        # Travel date, up to the engine's booking window ahead
+        ttk.Label(
+            booking_frame,
+            text="Travel Date",
+            font=("Helvetica", 11, "bold"),
+            foreground='#424242'
+        ).pack(anchor='w', padx=20, pady=(10, 5))
+        
+        self.date_var = tk.StringVar()
+        self.date_combo = ttk.Combobox(
+            booking_frame,
+            textvariable=self.date_var,
+            font=("Helvetica", 11),
+            width=40,
+            state="readonly"
         )
-        route_combo['values'] = [f"{r['name']}" for r in ROUTES.values()]
-        route_combo.pack(padx=20, pady=(0, 20))
+        self.date_combo.pack(padx=20, pady=(0, 10))
+        
+        # Passengers from remote barangays go first on a sold-out departure's waitlist
+        ttk.Label(
+            booking_frame,
+            text="Home Barangay (for waitlist priority)",
+            font=("Helvetica", 11, "bold"),
+            foreground='#424242'
+        ).pack(anchor='w', padx=20, pady=(10, 5))
+        
+        self.barangay_var = tk.StringVar()
+        ttk.Combobox(
+            booking_frame,
+            textvariable=self.barangay_var,
+            values=list(REMOTE_BARANGAYS),
+            font=("Helvetica", 11),
+            width=40
+        ).pack(padx=20, pady=(0, 10))
+        
+        # Multi-leg trips with transfers, found by the journey planner
+        ttk.Label(
+            booking_frame,
+            text="Or Plan a Trip With Transfers",
+            font=("Helvetica", 11, "bold"),
+            foreground='#424242'
+        ).pack(anchor='w', padx=20, pady=(10, 5))
+        
+        stops_frame = ttk.Frame(booking_frame)
+        stops_frame.pack(fill=tk.X, padx=20)
+        
+        self.origin_var = tk.StringVar()
+        self.destination_var = tk.StringVar()
+        self.origin_combo = ttk.Combobox(stops_frame, textvariable=self.origin_var,
+                                         font=("Helvetica", 11), width=15, state="readonly")
+        self.origin_combo.pack(side=tk.LEFT)
+        ttk.Label(stops_frame, text="to", font=("Helvetica", 11)).pack(side=tk.LEFT, padx=10)
+        self.destination_combo = ttk.Combobox(stops_frame, textvariable=self.destination_var,
+                                              font=("Helvetica", 11), width=15, state="readonly")
+        self.destination_combo.pack(side=tk.LEFT)
+        ttk.Button(
+            stops_frame,
+            text="Find Trips",
+            style='Action.TButton',
+            command=self.find_itineraries
+        ).pack(side=tk.LEFT, padx=(10, 0))
+        
+        self.itinerary_list = tk.Listbox(booking_frame, height=3, font=("Helvetica", 10),
+                                         activestyle='none')
+        self.itinerary_list.pack(fill=tk.X, padx=20, pady=(10, 0))
+        self.itineraries = []
         
         # Button container
         button_frame = ttk.Frame(booking_frame)
@@ -574,7 +833,14 @@ class TransConnectApp:
             button_frame,
             text="Confirm Booking",
             style='Action.TButton',
-            command=lambda: self.handle_booking(route_var.get())
+            command=lambda: self.handle_booking(self.route_search_box.selected)
+        ).pack(side=tk.LEFT, padx=10)
+        
+        ttk.Button(
+            button_frame,
+            text="Book Selected Trip",
+            style='Action.TButton',
+            command=self.handle_itinerary_booking
         ).pack(side=tk.LEFT, padx=10)
         
         ttk.Button(
@@ -583,15 +849,40 @@ class TransConnectApp:
             style='Action.TButton',
             command=self.show_user_dashboard
         ).pack(side=tk.LEFT, padx=10)
+        return booking_frame
+
+    def refresh_booking_form(self):
+        get_distances().refresh()
+        self.route_search_box.clear()
+        self.booking_trip_label.configure(text="")
+        dates = self.engine.bookable_dates()
+        self.date_combo['values'] = dates
+        self.date_var.set(dates[0])
+        planner = get_planner()
+        planner.refresh()
+        self.origin_combo['values'] = planner.stops
+        self.destination_combo['values'] = planner.stops
+        self.itinerary_list.delete(0, tk.END)
+        self.itineraries = []
+
+    def on_route_selected(self, route_id):
+        self.booking_trip_label.configure(text=get_distances().describe_route(route_id))
+
+    def find_itineraries(self):
+        origin, destination = self.origin_var.get(), self.destination_var.get()
+        self.itinerary_list.delete(0, tk.END)
+        self.itineraries = get_planner().itineraries(origin, destination)
+        for itinerary in self.itineraries:
+            self.itinerary_list.insert(tk.END, itinerary.describe())
+        if not self.itineraries and origin and destination:
+            self.itinerary_list.insert(tk.END, "No connections today for this trip")
 
     def show_my_bookings(self):
-        # Clear previous frames
-        for widget in self.main_frame.winfo_children()[1:]:
-            widget.destroy()
-        
+        self.screens.show('my_bookings')
+
+    def build_my_bookings(self):
         # Create bookings container
         bookings_frame = ttk.Frame(self.main_frame)
-        bookings_frame.pack(pady=20, fill=tk.BOTH, expand=True)
         
         # Header
         ttk.Label(
@@ -601,107 +892,185 @@ class TransConnectApp:
             foreground='#2196F3'
         ).pack(pady=(0, 20))
         
-        # Bookings container
-        bookings_container = ttk.Frame(bookings_frame)
-        bookings_container.pack(fill=tk.BOTH, expand=True, padx=40)
-        
-        if not users[self.current_user]['bookings']:
-            empty_frame = ttk.Frame(bookings_container, style='Card.TFrame')
-            empty_frame.pack(pady=20, ipady=30, fill=tk.X)
-            
-            ttk.Label(
-                empty_frame,
-                text="No bookings found",
-                font=("Helvetica", 14),
-                foreground='#757575'
-            ).pack()
-            
-            ttk.Label(
-                empty_frame,
-                text="Book your first trip now!",
-                font=("Helvetica", 12),
-                foreground='#757575'
-            ).pack()
-        else:
-            for booking in users[self.current_user]['bookings']:
-                booking_card = ttk.Frame(bookings_container, style='Card.TFrame')
-                booking_card.pack(pady=10, fill=tk.X, ipady=15)
-                
-                ttk.Label(
-                    booking_card,
-                    text=booking['route_name'],
-                    font=("Helvetica", 14, "bold"),
-                    foreground='#2196F3'
-                ).pack(anchor="w", padx=20, pady=(10, 5))
-                
-                # Get schedule time from ROUTES using route_id
-                schedule_time = ROUTES[booking['route_id']]['schedule']
-                
-                ttk.Label(
-                    booking_card,
-                    text=f"Travel Date: {booking['date']} at {schedule_time}",
-                    font=("Helvetica", 12),
-                    foreground='#424242'
-                ).pack(anchor="w", padx=20)
-        
         # Back button
         ttk.Button(
             bookings_frame,
             text="Back to Dashboard",
             style='Action.TButton',
             command=self.show_user_dashboard
-        ).pack(pady=30)
+        ).pack(side=tk.BOTTOM, pady=30)
+        
+        # Sold-out departures the user is waiting for
+        self.my_waitlist_label = ttk.Label(
+            bookings_frame,
+            font=("Helvetica", 12),
+            foreground='#757575'
+        )
+        self.my_waitlist_label.pack(pady=(0, 10))
+        
+        # Bookings are paged in from the engine as the list scrolls
+        self.my_bookings_list = VirtualList(
+            bookings_frame,
+            row_count=lambda: self.engine.booking_count(self.current_user),
+            fetch_rows=lambda start, stop: self.engine.bookings_page(start, stop, self.current_user),
+            create_row=self.create_my_booking_row,
+            fill_row=self.fill_my_booking_row,
+            row_height=100,
+            empty_text="No bookings found\nBook your first trip now!"
+        )
+        self.my_bookings_list.pack(fill=tk.BOTH, expand=True, padx=40)
+        return bookings_frame
 
-    def handle_booking(self, route_name):
-        if not route_name:
-            messagebox.showerror("Error", "Please select a route!")
-            return
+    def refresh_my_bookings(self):
+        self.my_waitlist_label.configure(text="\n".join(
+            f"Waitlisted: {entry['route_name']} on {entry['date']} (number {entry['position']})"
+            for entry in self.engine.waitlist_entries(self.current_user)
+        ))
+        self.my_bookings_list.refresh()
+
+    def create_booking_row(self, parent):
+        """Build one reusable booking card for the booking lists"""
+        row = ttk.Frame(parent)
+        booking_card = row.card = ttk.Frame(row, style='Card.TFrame')
+        booking_card.pack(pady=10, fill=tk.BOTH, expand=True)
+        
+        row.title_label = ttk.Label(
+            booking_card,
+            font=("Helvetica", 14, "bold"),
+            foreground='#2196F3'
+        )
+        row.title_label.pack(anchor="w", padx=20, pady=(10, 5))
         
-        # Find route_id from route_name
-        route_id = None
-        for rid, route in ROUTES.items():
-            if route['name'] == route_name:
-                route_id = rid
-                break
-        
-        if route_id and ROUTES[route_id]['seats'] > 0:
-            ROUTES[route_id]['seats'] -= 1
-            booking = {
-                'route_name': route_name,
-                'date': time.strftime('%Y-%m-%d'),
-                'route_id': route_id
-            }
-            users[self.current_user]['bookings'].append(booking)
-            messagebox.showinfo("Success", "Booking confirmed!")
-            
-            # Show route on Google Maps
-            self.show_google_maps_route(route_id)
-        else:
-            messagebox.showerror("Error", "No seats available!")
+        row.detail_label = ttk.Label(
+            booking_card,
+            font=("Helvetica", 12),
+            foreground='#424242'
+        )
+        row.detail_label.pack(anchor="w", padx=20)
+        return row
+
+    def create_my_booking_row(self, parent):
+        """Booking card with a button to cancel the booking it shows"""
+        row = self.create_booking_row(parent)
+        row.cancel_button = ttk.Button(
+            row.card,
+            text="Cancel",
+            style='Action.TButton',
+            command=lambda: self.handle_cancel_booking(row.booking)
+        )
+        row.cancel_button.place(relx=1.0, rely=0.5, anchor='e', x=-20)
+        return row
+
+    def fill_my_booking_row(self, row, booking):
+        # Get schedule time from ROUTES using route_id
+        schedule_time = ROUTES[booking['route_id']]['schedule']
+        row.booking = booking
+        row.title_label.configure(text=booking['route_name'])
+        row.detail_label.configure(
+            text=f"Travel Date: {booking['date']} at {schedule_time}    Seat {booking.get('seat') or '-'}"
+        )
+        # Past departures cannot be cancelled
+        row.cancel_button.configure(
+            state='normal' if booking['date'] >= self.engine.seats.today else 'disabled'
+        )
+
+    def fill_all_bookings_row(self, row, booking):
+        user_info = users.get(booking['email'], {})
+        schedule_time = ROUTES[booking['route_id']]['schedule']
+        row.title_label.configure(text=f"User: {user_info.get('name', '')} ({booking['email']})")
+        row.detail_label.configure(
+            text=f"Route: {booking['route_name']}    Date: {booking['date']} at {schedule_time}"
+                 f"    Seat {booking.get('seat') or '-'}"
+        )
 
-    def show_google_maps_route(self, route_id):
-        """Display the route on Google Maps in the default web browser"""
-        route = ROUTES[route_id]
+    def handle_booking(self, route_id):
+        # The search box hands over the picked route's id, no name lookup needed
+        if route_id is None or route_id not in ROUTES:
+            messagebox.showerror("Error", "Please select a route!")
+            return
         
-        # Extract coordinates
-        start_coords = route['start_gps'].replace(' ', '')
-        end_coords = route['end_gps'].replace(' ', '')
+        date = self.date_var.get()
+        try:
+            booking = self.engine.book(self.current_user, route_id, date)
+        except BookingError as e:
+            # A sold-out departure can still be waited for
+            if self.engine.available_seats(route_id, date) == 0 and messagebox.askyesno(
+                    "Sold Out", f"{e}\nJoin the waitlist for this departure?"):
+                self.handle_join_waitlist(route_id, date)
+            else:
+                messagebox.showerror("Error", str(e))
+            return
         
-        # Create Google Maps URL with route
-        maps_url = (
-            f"https://www.google.com/maps/dir/{start_coords}/{end_coords}"
-            "?travelmode=driving"
-        )
+        messagebox.showinfo("Success", f"Booking confirmed!\nSeat {booking['seat']}")
         
-        # Open in default web browser
-        webbrowser.open(maps_url)
+        # Show the route along the roads on an offline map
+        self.show_route_map(route_id)
+
+    def handle_join_waitlist(self, route_id, date):
+        try:
+            position = self.engine.join_waitlist(self.current_user, route_id, date,
+                                                 self.barangay_var.get())
+        except BookingError as e:
+            messagebox.showerror("Error", str(e))
+            return
         
-        # Show success message
         messagebox.showinfo(
-            "Route Map",
-            "The route has been opened in your web browser using Google Maps."
+            "Waitlist",
+            f"You are number {position} on the waitlist.\n"
+            f"If a seat frees up it is booked for you; check My Bookings."
         )
+
+    def handle_cancel_booking(self, booking):
+        if not messagebox.askyesno(
+                "Cancel Booking",
+                f"Cancel your trip on {booking['route_name']} on {booking['date']}?"):
+            return
+        
+        try:
+            self.engine.cancel(booking['booking_id'], self.current_user)
+        except BookingError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        
+        messagebox.showinfo("Success", "Booking cancelled!")
+        self.refresh_my_bookings()
+
+    def handle_itinerary_booking(self):
+        selection = self.itinerary_list.curselection()
+        if not selection or selection[0] >= len(self.itineraries):
+            messagebox.showerror("Error", "Please find and select a trip!")
+            return
         
+        itinerary = self.itineraries[selection[0]]
+        try:
+            journey = self.engine.book_journey(self.current_user, itinerary.route_ids,
+                                               self.date_var.get())
+        except BookingError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        
+        seats = ", ".join(f"{b['route_name']}: seat {b['seat']}" for b in journey)
+        messagebox.showinfo("Success", f"Booking confirmed!\n{itinerary.describe()}\n{seats}")
+        self.show_user_dashboard()
+
+    def show_route_map(self, route_id):
+        """Draw the route's road path on a folium map and open it in the web browser"""
+        def render():
+            # Waits for the road router if it is still loading, off the Tk thread
+            snapshot = route_map_snapshot(ROUTES, route_id, get_distances(), get_road_router())
+            path, future = route_map_renderer.request(snapshot)
+            return future.result() if future is not None else path
+        
+        def opened(future):
+            try:
+                path = future.result()
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not draw the route map: {e}")
+                return
+            import webbrowser
+            webbrowser.open('file://' + os.path.realpath(path))
+        
+        self.when_done(background.submit(render), opened)
         self.show_user_dashboard()
 
     def logout(self):
@@ -709,13 +1078,11 @@ class TransConnectApp:
         self.show_login_frame()
 
     def show_location_map(self):
-        # Clear previous frames
-        for widget in self.main_frame.winfo_children()[1:]:
-            widget.destroy()
-        
+        self.screens.show('location_map')
+
+    def build_location_map(self):
         # Create map container
         map_frame = ttk.Frame(self.main_frame)
-        map_frame.pack(pady=20, fill=tk.BOTH, expand=True)
         
         # Header
         ttk.Label(
@@ -725,50 +1092,8 @@ class TransConnectApp:
             foreground='#2196F3'
         ).pack(pady=(0, 20))
         
-        # Create a map centered on Marinduque
-        m = folium.Map(
-            location=[13.4013, 121.9694],  # Center of Marinduque
-            zoom_start=11
-        )
-        
-        # Define municipality locations with proper names and coordinates
-        municipalities = {
-            "Boac": {"coords": [13.4488, 121.8386], "color": "red"},        # Provincial Capital
-            "Mogpog": {"coords": [13.4819, 121.8637], "color": "blue"},
-            "Santa Cruz": {"coords": [13.4280, 122.0094], "color": "green"},
-            "Torrijos": {"coords": [13.3127, 122.0871], "color": "purple"},
-            "Buenavista": {"coords": [13.2574, 121.9226], "color": "orange"},
-            "Gasan": {"coords": [13.3197, 121.8685], "color": "darkblue"}
-        }
-        
-        # Add markers for each municipality
-        for name, data in municipalities.items():
-            # Add municipality marker
-            folium.Marker(
-                data["coords"],
-                popup=f"{name} Municipality",
-                tooltip=name,
-                icon=folium.Icon(color=data["color"], icon='info-sign')
-            ).add_to(m)
-        
-        # Draw routes between municipalities
-        for route_id, route in ROUTES.items():
-            # Parse start and end coordinates
-            start_coords = [float(x.strip()) for x in route['start_gps'].split(',')]
-            end_coords = [float(x.strip()) for x in route['end_gps'].split(',')]
-            
-            # Draw line between points
-            folium.PolyLine(
-                locations=[start_coords, end_coords],
-                weight=3,
-                color='red',
-                opacity=0.6,
-                popup=f"Route {route_id}: {route['name']}"
-            ).add_to(m)
-        
-        # Save map to HTML file
-        map_file = "marinduque_municipalities.html"
-        m.save(map_file)
+        # Path of the cached map HTML, set by update_location_map
+        self.map_file = None
         
         # Create info frame
         info_frame = ttk.Frame(map_frame, style='Card.TFrame')
@@ -789,14 +1114,29 @@ class TransConnectApp:
             foreground='#616161'
         ).pack(pady=(0, 10))
         
+        # Filled in by the background geocoder; never blocks the screen
+        self.location_label = ttk.Label(
+            info_frame,
+            font=("Helvetica", 11),
+            foreground='#424242'
+        )
+        self.location_label.pack(pady=(0, 10))
+        
         # Button to open map in browser
         ttk.Button(
             info_frame,
             text="Open Map in Browser",
             style='Action.TButton',
-            command=lambda: webbrowser.open('file://' + os.path.realpath(map_file))
+            command=self.open_location_map
         ).pack(pady=10)
         
+        self.map_status_label = ttk.Label(
+            info_frame,
+            font=("Helvetica", 10),
+            foreground='#757575'
+        )
+        self.map_status_label.pack(pady=(0, 10))
+        
         # Back button
         ttk.Button(
             map_frame,
@@ -804,6 +1144,51 @@ class TransConnectApp:
             style='Action.TButton',
             command=self.show_user_dashboard
         ).pack(pady=30)
+        return map_frame
+
+    def refresh_location_map(self):
+        self.update_location_map()
+        self.location_label.configure(text="Current area: looking up...")
+        
+        def show_location(location):
+            address = location.address if location else "unavailable"
+            self.location_label.configure(text=f"Current area: {address}")
+        
+        get_current_location(show_location)
+
+    def map_snapshot(self):
+        # Straight lines until the road router has loaded in the background
+        return map_snapshot(ROUTES, get_distances(), loaded_road_router())
+
+    def update_location_map(self):
+        # Reuse the cached HTML when nothing changed; otherwise keep showing
+        # the last good map while a background worker renders the new one
+        path, future = map_renderer.request(self.map_snapshot())
+        self.map_file = path
+        if future is None:
+            self.map_status_label.configure(text="")
+            return
+        
+        self.map_status_label.configure(text="Updating map...")
+        
+        def check_render():
+            if not future.done():
+                self.root.after(200, check_render)
+                return
+            try:
+                self.map_file = future.result()
+                self.map_status_label.configure(text="")
+            except Exception as e:
+                self.map_status_label.configure(text=f"Map update failed: {e}")
+        
+        self.root.after(200, check_render)
+
+    def open_location_map(self):
+        if not self.map_file:
+            messagebox.showinfo("Route Map", "The map is still being generated, please try again shortly.")
+            return
+        import webbrowser
+        webbrowser.open('file://' + os.path.realpath(self.map_file))
 
     def confirm_logout(self, logout_command):
         """Show confirmation dialog before logging out"""
@@ -811,13 +1196,11 @@ class TransConnectApp:
             logout_command()
 
     def show_admin_dashboard(self):
-        # Clear previous frames
-        for widget in self.main_frame.winfo_children()[1:]:
-            widget.destroy()
-        
+        self.screens.show('admin_dashboard')
+
+    def build_admin_dashboard(self):
         # Create modern dashboard layout
         dashboard_frame = ttk.Frame(self.main_frame)
-        dashboard_frame.pack(pady=20, fill=tk.BOTH, expand=True)
         
         # Welcome section with admin info
         welcome_frame = ttk.Frame(dashboard_frame, style='Card.TFrame')
@@ -837,6 +1220,36 @@ class TransConnectApp:
             foreground='#757575'
         ).pack()
         
+        # Ridership figures, read from counters the engine keeps up to date
+        stats_frame = ttk.Frame(dashboard_frame, style='Card.TFrame')
+        stats_frame.pack(fill=tk.X, padx=20, pady=(10, 0), ipady=10)
+        for col in range(4):
+            stats_frame.columnconfigure(col, weight=1)
+        
+        self.stats_labels = {}
+        for col, (key, title) in enumerate([("hour", "Bookings, last 24 hours"),
+                                            ("day", "Bookings, last 30 days"),
+                                            ("routes", "Highest load factor"),
+                                            ("origins", "Top origin towns")]):
+            ttk.Label(
+                stats_frame,
+                text=title,
+                font=("Helvetica", 11, "bold"),
+                foreground='#1976D2'
+            ).grid(row=0, column=col, padx=15, pady=(10, 5), sticky='w')
+            self.stats_labels[key] = ttk.Label(
+                stats_frame,
+                font=("Helvetica", 11),
+                foreground='#616161',
+                justify=tk.LEFT
+            )
+            self.stats_labels[key].grid(row=1, column=col, padx=15, sticky='nw')
+        
+        self.hourly_sparkline = Sparkline(stats_frame)
+        self.hourly_sparkline.grid(row=2, column=0, padx=15, pady=5, sticky='w')
+        self.daily_sparkline = Sparkline(stats_frame, color='#4CAF50')
+        self.daily_sparkline.grid(row=2, column=1, padx=15, pady=5, sticky='w')
+        
         # Dashboard grid layout
         grid_frame = ttk.Frame(dashboard_frame)
         grid_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
@@ -867,95 +1280,143 @@ class TransConnectApp:
         
         self.create_dashboard_card(
             grid_frame, 1, 1,
+            "Export Data",
+            "Download bookings or users as CSV/JSONL",
+            self.show_export
+        )
+        
+        self.create_dashboard_card(
+            grid_frame, 2, 0,
+            "Plan Fleet",
+            "Assign vehicles to departures from booking demand",
+            self.handle_plan_fleet
+        )
+        
+        self.create_dashboard_card(
+            grid_frame, 2, 1,
             "Logout",
             "Sign out of admin account",
             self.logout
         )
+        self.admin_dashboard_frame = dashboard_frame
+        return dashboard_frame
+
+    def refresh_admin_dashboard(self):
+        stats = self.engine.analytics
+        hourly = stats.bookings_per_hour()
+        daily = stats.bookings_per_day()
+        self.stats_labels["hour"].configure(text=f"{sum(hourly)} total, {hourly[-1]} this hour")
+        self.stats_labels["day"].configure(text=f"{sum(daily)} total, {daily[-1]} today")
+        self.hourly_sparkline.set_values(hourly)
+        self.daily_sparkline.set_values(daily)
+        
+        busiest = stats.busiest_routes(3)
+        self.stats_labels["routes"].configure(text="\n".join(
+            f"{ROUTES.name(route_id)}: {factor:.0%}" for route_id, factor in busiest
+        ) or "No bookings yet")
+        origins = stats.top_origins(3)
+        self.stats_labels["origins"].configure(text="\n".join(
+            f"{town}: {count}" for town, count in origins
+        ) or "No bookings yet")
+        
+        # Keep the figures live while the dashboard is on screen
+        if self._stats_job is not None:
+            self.root.after_cancel(self._stats_job)
+        self._stats_job = self.root.after(5000, self._refresh_stats_if_shown)
+
+    def _refresh_stats_if_shown(self):
+        self._stats_job = None
+        if self.screens.current is self.admin_dashboard_frame:
+            self.refresh_admin_dashboard()
 
     def show_seat_management(self):
-        # Clear previous frames
-        for widget in self.main_frame.winfo_children()[1:]:
-            widget.destroy()
-        
+        self.screens.show('seat_management')
+
+    def build_seat_management(self):
         # Create container
-        seats_frame = ttk.Frame(self.main_frame)
-        seats_frame.pack(pady=20, fill=tk.BOTH, expand=True)
+        management_frame = ttk.Frame(self.main_frame)
         
         # Header
         ttk.Label(
-            seats_frame,
+            management_frame,
             text="Manage Available Seats",
             font=("Helvetica", 24, "bold"),
             foreground='#2196F3'
-        ).pack(pady=(0, 20))
+        ).pack(pady=(0, 5))
         
-        # Create scrollable frame
-        canvas = tk.Canvas(seats_frame)
-        scrollbar = ttk.Scrollbar(seats_frame, orient="vertical", command=canvas.yview)
-        scrollable_frame = ttk.Frame(canvas)
+        ttk.Label(
+            management_frame,
+            text="Double-click a seat count to edit it; changed routes are highlighted until saved",
+            font=("Helvetica", 11),
+            foreground='#757575'
+        ).pack(pady=(0, 15))
         
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+        def parse_seats(text):
+            seats = int(text)
+            if seats < 0:
+                raise ValueError("Seats cannot be negative")
+            return seats
+        
+        # Only edited rows are tracked, and saved together in one transaction
+        self.seat_grid = EditableGrid(
+            management_frame,
+            columns=[
+                ("route_id", "Route", 80),
+                ("name", "Name", 320),
+                ("schedule", "Schedule", 160),
+                ("seats", "Seats per Departure", 160)
+            ],
+            edit_column="seats",
+            parse=parse_seats,
+            on_change=lambda count: self.seat_changes_label.configure(
+                text=f"{count} unsaved change{'s' if count != 1 else ''}" if count else ""
+            )
         )
+        self.seat_grid.pack(fill=tk.BOTH, expand=True, padx=40)
         
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-        
-        # Pack scrollbar and canvas
-        scrollbar.pack(side="right", fill="y")
-        canvas.pack(side="left", fill="both", expand=True, padx=(40, 0))
-        
-        # Create entry widgets for each route
-        entries = {}
-        for route_id, route_info in ROUTES.items():
-            route_card = ttk.Frame(scrollable_frame, style='Card.TFrame')
-            route_card.pack(pady=10, fill=tk.X, padx=20)
-            
-            # Route info
-            ttk.Label(
-                route_card,
-                text=f"Route {route_id}: {route_info['name']}",
-                font=("Helvetica", 14, "bold"),
-                foreground='#1976D2'
-            ).pack(pady=10, padx=20)
-            
-            # Seats entry
-            seats_frame = ttk.Frame(route_card)
-            seats_frame.pack(pady=(0, 10), padx=20)
-            
-            ttk.Label(
-                seats_frame,
-                text="Available Seats:",
-                font=("Helvetica", 12)
-            ).pack(side=tk.LEFT, padx=(0, 10))
-            
-            seats_entry = ttk.Entry(seats_frame, width=10)
-            seats_entry.insert(0, str(route_info['seats']))
-            seats_entry.pack(side=tk.LEFT)
-            
-            entries[route_id] = seats_entry
-        
-        # Update button
-        def update_seats():
+        self.seat_changes_label = ttk.Label(
+            management_frame,
+            font=("Helvetica", 11),
+            foreground='#E65100'
+        )
+        self.seat_changes_label.pack(pady=(10, 0))
+        
+        # Save button
+        def save_seats():
+            changes = self.seat_grid.changes()
+            if not changes:
+                messagebox.showinfo("Seats", "There are no changes to save.")
+                return
             try:
-                for route_id, entry in entries.items():
-                    new_seats = int(entry.get())
-                    if new_seats < 0:
-                        raise ValueError
-                    ROUTES[route_id]['seats'] = new_seats
-                messagebox.showinfo("Success", "Seats updated successfully!")
-            except ValueError:
-                messagebox.showerror("Error", "Please enter valid numbers for seats!")
-        
-        button_frame = ttk.Frame(scrollable_frame)
+                self.engine.set_seats_bulk(changes)
+            except BookingError as e:
+                messagebox.showerror("Error", str(e))
+                return
+            self.seat_grid.mark_saved()
+            messagebox.showinfo("Success", f"Seats updated for {len(changes)} route(s)!")
+        
+        button_frame = ttk.Frame(management_frame)
         button_frame.pack(pady=20)
         
         ttk.Button(
             button_frame,
-            text="Update Seats",
+            text="Save Changes",
+            style='Action.TButton',
+            command=save_seats
+        ).pack(side=tk.LEFT, padx=10)
+        
+        ttk.Button(
+            button_frame,
+            text="Import CSV...",
+            style='Action.TButton',
+            command=self.import_seats_csv
+        ).pack(side=tk.LEFT, padx=10)
+        
+        ttk.Button(
+            button_frame,
+            text="Discard Changes",
             style='Action.TButton',
-            command=update_seats
+            command=lambda: self.seat_grid.discard()
         ).pack(side=tk.LEFT, padx=10)
         
         ttk.Button(
@@ -964,15 +1425,219 @@ class TransConnectApp:
             style='Action.TButton',
             command=lambda: self.show_admin_dashboard()
         ).pack(side=tk.LEFT, padx=10)
+        return management_frame
 
-    def show_all_bookings(self):
-        # Clear previous frames
-        for widget in self.main_frame.winfo_children()[1:]:
-            widget.destroy()
+    def refresh_seat_management(self):
+        # Reload every route; unsaved edits from a previous visit are dropped
+        self.seat_grid.set_rows(
+            (route_id, (route_id, ROUTES.name(route_id), ROUTES[route_id]['schedule'],
+                        self.engine.capacity(route_id)))
+            for route_id in ROUTES
+        )
+
+    def import_seats_csv(self):
+        path = filedialog.askopenfilename(
+            title="Import seats per departure",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        
+        # The whole file is validated first and loaded as unsaved edits for review
+        try:
+            with open(path, newline='', encoding='utf-8') as f:
+                seats = read_capacity_csv(f, self.engine.find_route_id, lambda r: r in ROUTES)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Import Failed", str(e))
+            return
+        
+        self.seat_grid.set_values(seats)
+        changed = len(self.seat_grid.changes())
+        messagebox.showinfo(
+            "Import",
+            f"Loaded {len(seats)} row(s), {changed} route(s) changed.\n"
+            f"Review the highlighted rows and click Save Changes."
+        )
+
+    def show_export(self):
+        self.screens.show('export')
+
+    def build_export(self):
+        # Create export container
+        export_frame = ttk.Frame(self.main_frame, style='Card.TFrame')
+        
+        # Export header
+        ttk.Label(
+            export_frame,
+            text="Export Data",
+            font=("Helvetica", 24, "bold"),
+            foreground='#2196F3'
+        ).pack(pady=(20, 10))
+        
+        ttk.Label(
+            export_frame,
+            text="Bookings are streamed to the file, so any number can be exported",
+            font=("Helvetica", 12),
+            foreground='#757575'
+        ).pack(pady=(0, 20))
+        
+        form = ttk.Frame(export_frame)
+        form.pack(padx=20)
+        
+        # What to export
+        self.export_kind = tk.StringVar(value="bookings")
+        ttk.Label(form, text="Data:", font=("Helvetica", 11)).grid(row=0, column=0, sticky='e', padx=10, pady=8)
+        kinds = ttk.Frame(form)
+        kinds.grid(row=0, column=1, sticky='w')
+        ttk.Radiobutton(kinds, text="Bookings", value="bookings", variable=self.export_kind).pack(side=tk.LEFT)
+        ttk.Radiobutton(kinds, text="Users", value="users", variable=self.export_kind).pack(side=tk.LEFT, padx=10)
+        
+        # Booking filters
+        ttk.Label(form, text="Route:", font=("Helvetica", 11)).grid(row=1, column=0, sticky='e', padx=10, pady=8)
+        self.export_route_var = tk.StringVar()
+        self.export_route_combo = ttk.Combobox(form, textvariable=self.export_route_var,
+                                               width=30, state="readonly")
+        self.export_route_combo.grid(row=1, column=1, sticky='w')
+        
+        ttk.Label(form, text="From date:", font=("Helvetica", 11)).grid(row=2, column=0, sticky='e', padx=10, pady=8)
+        self.export_from_entry = ttk.Entry(form, width=32)
+        self.export_from_entry.grid(row=2, column=1, sticky='w')
+        
+        ttk.Label(form, text="To date:", font=("Helvetica", 11)).grid(row=3, column=0, sticky='e', padx=10, pady=8)
+        self.export_to_entry = ttk.Entry(form, width=32)
+        self.export_to_entry.grid(row=3, column=1, sticky='w')
+        
+        ttk.Label(
+            form,
+            text="Dates as YYYY-MM-DD; leave empty for all",
+            font=("Helvetica", 10),
+            foreground='#757575'
+        ).grid(row=4, column=1, sticky='w')
+        
+        self.export_status_label = ttk.Label(export_frame, font=("Helvetica", 11), foreground='#616161')
+        self.export_status_label.pack(pady=(15, 0))
+        
+        # Button container
+        button_frame = ttk.Frame(export_frame)
+        button_frame.pack(pady=25)
+        
+        self.export_button = ttk.Button(
+            button_frame,
+            text="Export...",
+            style='Action.TButton',
+            command=self.handle_export
+        )
+        self.export_button.pack(side=tk.LEFT, padx=10)
+        
+        ttk.Button(
+            button_frame,
+            text="Back to Dashboard",
+            style='Action.TButton',
+            command=self.show_admin_dashboard
+        ).pack(side=tk.LEFT, padx=10)
+        return export_frame
+
+    def refresh_export(self):
+        self.export_route_combo['values'] = ["All routes"] + [ROUTES.name(r) for r in ROUTES]
+        if not self.export_route_var.get():
+            self.export_route_var.set("All routes")
+
+    def handle_export(self):
+        kind = self.export_kind.get()
+        route_name = self.export_route_var.get()
+        route_id = None if route_name in ("", "All routes") else self.engine.find_route_id(route_name)
+        try:
+            # Normalised to YYYY-MM-DD, since the filter compares dates as strings
+            date_from, date_to = (
+                Date.fromisoformat(value).isoformat() if value else None
+                for value in (self.export_from_entry.get().strip(), self.export_to_entry.get().strip())
+            )
+        except ValueError as e:
+            messagebox.showerror("Error", f"Please enter dates as YYYY-MM-DD! ({e})")
+            return
+        
+        path = filedialog.asksaveasfilename(
+            title=f"Export {kind}",
+            initialfile=f"transconnect-{kind}.csv",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("CSV, gzipped", "*.csv.gz"),
+                       ("JSON Lines", "*.jsonl"), ("JSON Lines, gzipped", "*.jsonl.gz")]
+        )
+        if not path:
+            return
         
+        if kind == "users":
+            rows, fields = engine_users(self.engine), USER_FIELDS
+        else:
+            rows, fields = engine_bookings(self.engine, route_id, date_from, date_to), BOOKING_FIELDS
+        
+        # Write in the background; rows are paged out of the engine under its lock
+        self.export_button.configure(state=tk.DISABLED)
+        self.export_status_label.configure(text="Exporting...")
+        
+        def on_exported(future):
+            self.export_button.configure(state=tk.NORMAL)
+            try:
+                count = future.result()
+            except (OSError, ValueError) as e:
+                self.export_status_label.configure(text="")
+                messagebox.showerror("Export Failed", str(e))
+                return
+            self.export_status_label.configure(text=f"Exported {count} {kind} to {os.path.basename(path)}")
+        
+        self.when_done(background.submit(write_rows, rows, fields, path), on_exported)
+
+    def handle_plan_fleet(self):
+        path = filedialog.askopenfilename(
+            title="Fleet CSV (vehicle_id, capacity, depot)",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        
+        from fleet_scheduler import BLOCK_FIELDS, FleetScheduler, daily_demand, read_fleet_csv, schedule_rows
+        try:
+            with open(path, newline='', encoding='utf-8') as f:
+                fleet = read_fleet_csv(f, lambda name: name in ROUTES.stops.index)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Import Failed", str(e))
+            return
+        
+        out_path = filedialog.asksaveasfilename(
+            title="Save vehicle blocks",
+            initialfile="transconnect-fleet-plan.csv",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")]
+        )
+        if not out_path:
+            return
+        
+        # Demand comes from the whole booking history, read a page at a time
+        def plan():
+            scheduler = FleetScheduler(ROUTES, get_distances(), remote_stops=REMOTE_STOPS)
+            schedule = scheduler.schedule(fleet, daily_demand(engine_bookings(self.engine)))
+            write_rows(schedule_rows(schedule, ROUTES), BLOCK_FIELDS, out_path)
+            return schedule
+        
+        def on_planned(future):
+            try:
+                schedule = future.result()
+            except (OSError, ValueError) as e:
+                messagebox.showerror("Planning Failed", str(e))
+                return
+            messagebox.showinfo(
+                "Fleet Plan",
+                f"{schedule.summary()}\nSaved to {os.path.basename(out_path)}"
+            )
+        
+        self.when_done(background.submit(plan), on_planned)
+
+    def show_all_bookings(self):
+        self.screens.show('all_bookings')
+
+    def build_all_bookings(self):
         # Create bookings container
         bookings_frame = ttk.Frame(self.main_frame)
-        bookings_frame.pack(pady=20, fill=tk.BOTH, expand=True)
         
         # Header
         ttk.Label(
@@ -982,79 +1647,115 @@ class TransConnectApp:
             foreground='#2196F3'
         ).pack(pady=(0, 20))
         
-        # Create scrollable frame
-        canvas = tk.Canvas(bookings_frame)
-        scrollbar = ttk.Scrollbar(bookings_frame, orient="vertical", command=canvas.yview)
-        scrollable_frame = ttk.Frame(canvas)
-        
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-        
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-        
-        # Pack scrollbar and canvas
-        scrollbar.pack(side="right", fill="y")
-        canvas.pack(side="left", fill="both", expand=True, padx=(40, 0))
-        
-        # Show all bookings from all users
-        has_bookings = False
-        for email, user_info in users.items():
-            if not user_info.get('is_admin', False) and user_info['bookings']:
-                has_bookings = True
-                user_frame = ttk.Frame(scrollable_frame, style='Card.TFrame')
-                user_frame.pack(pady=10, fill=tk.X, padx=20)
-                
-                ttk.Label(
-                    user_frame,
-                    text=f"User: {user_info['name']} ({email})",
-                    font=("Helvetica", 14, "bold"),
-                    foreground='#1976D2'
-                ).pack(pady=10, padx=20)
-                
-                for booking in user_info['bookings']:
-                    booking_frame = ttk.Frame(user_frame)
-                    booking_frame.pack(pady=5, padx=20, fill=tk.X)
-                    
-                    ttk.Label(
-                        booking_frame,
-                        text=f"Route: {booking['route_name']}",
-                        font=("Helvetica", 12)
-                    ).pack(anchor="w")
-                    
-                    schedule_time = ROUTES[booking['route_id']]['schedule']
-                    ttk.Label(
-                        booking_frame,
-                        text=f"Date: {booking['date']} at {schedule_time}",
-                        font=("Helvetica", 12)
-                    ).pack(anchor="w")
-        
-        if not has_bookings:
-            empty_frame = ttk.Frame(scrollable_frame, style='Card.TFrame')
-            empty_frame.pack(pady=20, ipady=30, fill=tk.X)
-            
-            ttk.Label(
-                empty_frame,
-                text="No bookings found",
-                font=("Helvetica", 14),
-                foreground='#757575'
-            ).pack()
-        
         # Back button
         ttk.Button(
             bookings_frame,
             text="Back to Dashboard",
             style='Action.TButton',
             command=self.show_admin_dashboard
-        ).pack(pady=30)
+        ).pack(side=tk.BOTTOM, pady=30)
+        
+        # Show all bookings from all users; only visible rows get widgets
+        self.all_bookings_list = VirtualList(
+            bookings_frame,
+            row_count=self.engine.booking_count,
+            fetch_rows=self.engine.bookings_page,
+            create_row=self.create_booking_row,
+            fill_row=self.fill_all_bookings_row,
+            row_height=100,
+            empty_text="No bookings found"
+        )
+        self.all_bookings_list.pack(fill=tk.BOTH, expand=True, padx=(40, 0))
+        return bookings_frame
+
+# Time every show_*/handle_* call; leaves the class untouched when metrics are off
+instrument(TransConnectApp, metrics)
+
+# Seconds since this module started importing; main() adds the later stages
+STARTUP = {"import": time.perf_counter() - _IMPORT_START}
+
+def record_startup(stage: str):
+    STARTUP[stage] = time.perf_counter() - _IMPORT_START
+    if metrics.enabled:
+        metrics.observe(f"startup.{stage}", STARTUP[stage])
 
 # Update the main function to use the GUI
 def main():
+    if metrics.enabled:
+        metrics.observe("startup.import", STARTUP["import"])
+    
+    # Reload users, bookings and seat counters saved by previous runs, from
+    # the append-only journal when TRANSCONNECT_JOURNAL names one
+    storage = open_storage()
+    engine.attach_storage(storage)
+    record_startup("storage")
+    
+    # Optionally serve the HTTP API for phones and kiosks from the same data
+    api_port = os.environ.get("TRANSCONNECT_API_PORT")
+    if api_port:
+        from api_server import ApiServer
+        ApiServer(engine, auth, os.environ.get("TRANSCONNECT_API_HOST", "127.0.0.1"),
+                  int(api_port)).start_in_thread()
+    
     root = ttk.Window()
     app = TransConnectApp(root)
-    root.mainloop()
+    
+    # Once the login screen is drawn, warm up what later screens need
+    def on_first_paint():
+        record_startup("first_paint")
+        preload_in_background()
+    
+    after_first_paint(root, on_first_paint)
+    exporter = None
+    if metrics.enabled:
+        EventLoopLagProbe(root, metrics).start()
+        exporter = MetricsExporter(metrics, os.environ["TRANSCONNECT_METRICS"])
+        exporter.start()
+    try:
+        root.mainloop()
+    finally:
+        if exporter is not None:
+            exporter.stop()
+        auth.close()
+        storage.close()
+
+def export_main(argv=None):
+    """Command-line export, reading straight from the storage main() uses without the GUI
+    
+    python transconnect.py export bookings.csv.gz --route 1 --from 2026-01-01
+    """
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog="transconnect.py export",
+                                     description="Stream bookings or users to CSV/JSONL (optionally gzipped)")
+    parser.add_argument("output", help="file to write: .csv or .jsonl, optionally ending in .gz")
+    parser.add_argument("--users", action="store_true", help="export users instead of bookings")
+    parser.add_argument("--route", type=int, help="only bookings on this route_id")
+    def iso_date(value: str) -> str:
+        return Date.fromisoformat(value).isoformat()
+    
+    parser.add_argument("--from", dest="date_from", type=iso_date, help="first travel date, YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", type=iso_date, help="last travel date, YYYY-MM-DD")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file name")
+    parser.add_argument("--gzip", action="store_true", default=None, help="default: if the name ends in .gz")
+    parser.add_argument("--db", help="SQLite database; default: TRANSCONNECT_DB")
+    parser.add_argument("--journal", help="journal file; default: TRANSCONNECT_JOURNAL")
+    args = parser.parse_args(argv)
+    
+    storage = open_storage(args.db, args.journal, read_only=True)
+    try:
+        if args.users:
+            rows, fields = storage.iter_users(), USER_FIELDS
+        else:
+            rows, fields = storage.iter_bookings(args.route, args.date_from, args.date_to), BOOKING_FIELDS
+        count = write_rows(rows, fields, args.output, args.format, args.gzip)
+    finally:
+        storage.close()
+    print(f"Exported {count} {'users' if args.users else 'bookings'} to {args.output}")
 
 if __name__ == "__main__":
-    main()
+    if sys.argv[1:2] == ["export"]:
+        export_main(sys.argv[2:])
+    else:
+        main()
+
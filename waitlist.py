@@ -0,0 +1,101 @@
+"""Per-departure waitlists for sold-out routes.
+
+Each departure (route_id, date) has a binary heap of waiting passengers
+ordered by priority, then by when they joined: passengers from remote
+barangays (priority 0) come before everyone else (priority 1), and within
+a priority the first to join is the first served. Taking the next
+passenger when a seat frees up is a heap pop, O(log n).
+
+Leaving the list marks the entry as gone instead of searching the heap for
+it; gone entries are skipped when they reach the top.
+"""
+import heapq
+import itertools
+from typing import Dict, List, Optional, Set, Tuple
+
+Departure = Tuple[int, str]  # route_id, date
+
+REMOTE = 0
+REGULAR = 1
+
+
+class Waitlist:
+    def __init__(self):
+        # Heap entries are [priority, arrival, email]; email None once left
+        self._heaps: Dict[Departure, List[list]] = {}
+        self._entries: Dict[Tuple[Departure, str], list] = {}
+        # email -> departures they wait for, so waiting_for() skips other passengers
+        self._by_email: Dict[str, Set[Departure]] = {}
+        self._waiting: Dict[Departure, int] = {}
+        self._arrivals = itertools.count()
+
+    def add(self, departure: Departure, email: str, priority: int = REGULAR) -> bool:
+        """Queue a passenger; False if they are already waiting for this departure"""
+        if (departure, email) in self._entries:
+            return False
+        entry = [priority, next(self._arrivals), email]
+        heapq.heappush(self._heaps.setdefault(departure, []), entry)
+        self._entries[(departure, email)] = entry
+        self._by_email.setdefault(email, set()).add(departure)
+        self._waiting[departure] = self._waiting.get(departure, 0) + 1
+        return True
+
+    def remove(self, departure: Departure, email: str) -> bool:
+        entry = self._entries.pop((departure, email), None)
+        if entry is None:
+            return False
+        entry[2] = None
+        self._forget(departure, email)
+        self._left(departure)
+        return True
+
+    def pop(self, departure: Departure) -> Optional[str]:
+        """The next passenger to get a seat on a departure, or None"""
+        heap = self._heaps.get(departure)
+        while heap:
+            email = heapq.heappop(heap)[2]
+            if email is not None:
+                del self._entries[(departure, email)]
+                self._forget(departure, email)
+                self._left(departure)
+                return email
+        return None
+
+    def _forget(self, departure: Departure, email: str):
+        departures = self._by_email[email]
+        departures.discard(departure)
+        if not departures:
+            del self._by_email[email]
+
+    def _left(self, departure: Departure):
+        self._waiting[departure] -= 1
+        if not self._waiting[departure]:
+            del self._waiting[departure], self._heaps[departure]
+
+    def waiting(self, departure: Departure) -> int:
+        return self._waiting.get(departure, 0)
+
+    def position(self, departure: Departure, email: str) -> Optional[int]:
+        """1-based place in line (a scan of the departure's list), or None"""
+        entry = self._entries.get((departure, email))
+        if entry is None:
+            return None
+        return 1 + sum(1 for other in self._heaps[departure]
+                       if other[2] is not None and other[:2] < entry[:2])
+
+    def waiting_for(self, email: str) -> List[Departure]:
+        """Departures a passenger is waiting for"""
+        return list(self._by_email.get(email, ()))
+
+    def departures(self) -> List[Departure]:
+        """Departures with anyone waiting"""
+        return list(self._waiting)
+
+    def drop_before(self, date: str):
+        """Forget the lists of departures before ``date``"""
+        for departure in [d for d in self._waiting if d[1] < date]:
+            for entry in self._heaps.pop(departure):
+                if entry[2] is not None:
+                    del self._entries[(departure, entry[2])]
+                    self._forget(departure, entry[2])
+            del self._waiting[departure]
@@ -0,0 +1,458 @@
+"""Reusable Tk widgets for TransConnect screens."""
+import tkinter as tk
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, Sequence, Tuple
+
+import ttkbootstrap as ttk
+
+
+class VirtualList(ttk.Frame):
+    """Scrollable list that only creates widgets for the rows on screen
+
+    Rows have a fixed height. A small pool of row widgets is created with
+    ``create_row(parent)`` and recycled on scroll by calling
+    ``fill_row(widget, item)`` with the item now shown in that slot. Items are
+    paged in from the model through ``fetch_rows(start, stop)``, so opening
+    the list costs the same for 10 items or 100k.
+    """
+
+    MAX_CACHED_PAGES = 8
+
+    def __init__(self, parent,
+                 row_count: Callable[[], int],
+                 fetch_rows: Callable[[int, int], Sequence],
+                 create_row: Callable[[tk.Misc], tk.Widget],
+                 fill_row: Callable[[tk.Widget, object], None],
+                 row_height: int = 80,
+                 page_size: int = 100,
+                 empty_text: str = "Nothing to show"):
+        super().__init__(parent)
+        self.row_count = row_count
+        self.fetch_rows = fetch_rows
+        self.create_row = create_row
+        self.fill_row = fill_row
+        self.row_height = row_height
+        self.page_size = page_size
+
+        self._count = 0
+        self._top = 0  # scroll offset in pixels
+        self._rows = []
+        self._pages: "OrderedDict[int, Sequence]" = OrderedDict()
+
+        # Every widget in the list gets this bindtag so the mouse wheel
+        # works wherever the pointer is, without a global bind_all
+        self._wheel_tag = f"VirtualList{id(self)}"
+        self.bind_class(self._wheel_tag, "<MouseWheel>", self._on_mousewheel)
+        self.bind_class(self._wheel_tag, "<Button-4>", lambda e: self.scroll_rows(-3))
+        self.bind_class(self._wheel_tag, "<Button-5>", lambda e: self.scroll_rows(3))
+
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.viewport = ttk.Frame(self)
+        self.viewport.pack(side="left", fill="both", expand=True)
+        self._add_wheel_tag(self.viewport)
+
+        self.empty_label = ttk.Label(
+            self.viewport,
+            text=empty_text,
+            font=("Helvetica", 14),
+            foreground='#757575',
+            justify=tk.CENTER
+        )
+
+        self.viewport.bind("<Configure>", lambda e: self._redraw())
+        self.refresh()
+
+    def _add_wheel_tag(self, widget):
+        widget.bindtags((self._wheel_tag,) + widget.bindtags())
+        for child in widget.winfo_children():
+            self._add_wheel_tag(child)
+
+    def refresh(self):
+        """Drop cached pages and redraw, e.g. after the model changed"""
+        self._pages.clear()
+        self._count = self.row_count()
+        self._redraw()
+
+    def _item(self, index: int):
+        page_no = index // self.page_size
+        page = self._pages.get(page_no)
+        if page is None:
+            start = page_no * self.page_size
+            page = self.fetch_rows(start, start + self.page_size)
+            self._pages[page_no] = page
+            if len(self._pages) > self.MAX_CACHED_PAGES:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(page_no)
+        return page[index - page_no * self.page_size]
+
+    def _redraw(self):
+        height = self.viewport.winfo_height()
+        width = self.viewport.winfo_width()
+        total = self._count * self.row_height
+
+        if not self._count:
+            for row in self._rows:
+                row.place_forget()
+            self.empty_label.place(relx=0.5, rely=0.2, anchor="n")
+            self.scrollbar.set(0, 1)
+            return
+        self.empty_label.place_forget()
+
+        self._top = max(0, min(self._top, total - height))
+
+        # Enough pooled rows to cover the viewport plus one partially shown
+        needed = min(self._count, height // self.row_height + 2)
+        while len(self._rows) < needed:
+            row = self.create_row(self.viewport)
+            self._add_wheel_tag(row)
+            self._rows.append(row)
+
+        first = self._top // self.row_height
+        for offset, row in enumerate(self._rows):
+            index = first + offset
+            if index < self._count:
+                self.fill_row(row, self._item(index))
+                row.place(x=0, y=index * self.row_height - self._top,
+                          width=width, height=self.row_height)
+            else:
+                row.place_forget()
+
+        if total <= height:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self._top / total, (self._top + height) / total)
+
+    def scroll_to(self, pixels: int):
+        self._top = max(0, int(pixels))
+        self._redraw()
+
+    def scroll_rows(self, rows: int):
+        self.scroll_to(self._top + rows * self.row_height)
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(amount) * self._count * self.row_height)
+        elif unit == "pages":
+            self.scroll_to(self._top + int(amount) * self.viewport.winfo_height())
+        else:
+            self.scroll_rows(int(amount))
+
+    def _on_mousewheel(self, event):
+        self.scroll_rows(-1 * int(event.delta / 120) or (-1 if event.delta > 0 else 1))
+
+
+class ScreenManager:
+    """Builds each screen once and swaps screens by hiding and showing them
+
+    A screen is registered with a ``build()`` callable that returns its
+    (unpacked) top-level frame and an optional ``refresh()`` callable that
+    updates only the data-driven widgets, e.g. seat counts. ``show()`` builds
+    the screen on first use, refreshes it and packs it in place of the
+    current one.
+    """
+
+    def __init__(self):
+        self._screens = {}
+        self._frames = {}
+        self.current = None
+
+    def register(self, name: str, build: Callable[[], tk.Widget],
+                 refresh: Callable[[], None] = None, **pack_options):
+        self._screens[name] = (build, refresh, pack_options)
+
+    def show(self, name: str) -> tk.Widget:
+        build, refresh, pack_options = self._screens[name]
+        frame = self._frames.get(name)
+        if frame is None:
+            frame = self._frames[name] = build()
+
+        if refresh is not None:
+            refresh()
+        if self.current is not None and self.current is not frame:
+            self.current.pack_forget()
+        if self.current is not frame:
+            frame.pack(**pack_options)
+        self.current = frame
+        return frame
+
+    def invalidate(self, name: str):
+        """Throw away a cached screen so the next show() rebuilds it"""
+        frame = self._frames.pop(name, None)
+        if frame is not None:
+            if frame is self.current:
+                self.current = None
+            frame.destroy()
+
+
+class EditableGrid(ttk.Frame):
+    """Table with one editable column that tracks which rows were changed
+
+    Built on ttk.Treeview, which only draws the visible rows, so loading
+    thousands of rows is cheap. Double-click or Enter edits the cell of
+    ``edit_column`` in place; ``parse(text)`` turns the typed text into a
+    value or raises ValueError. Edited rows are highlighted and ``changes()``
+    returns only those, so saving touches nothing else.
+    """
+
+    def __init__(self, parent,
+                 columns: Sequence[Tuple[str, str, int]],
+                 edit_column: str,
+                 parse: Callable[[str], object],
+                 on_change: Callable[[int], None] = None,
+                 height: int = 15):
+        super().__init__(parent)
+        self.columns = [column_id for column_id, _, _ in columns]
+        self.edit_column = edit_column
+        self.parse = parse
+        self.on_change = on_change
+
+        self._keys: Dict[str, Hashable] = {}
+        self._original: Dict[Hashable, object] = {}
+        self._dirty: Dict[Hashable, object] = {}
+        self._editor = None
+
+        self.tree = ttk.Treeview(self, columns=self.columns, show="headings",
+                                 height=height, selectmode="browse")
+        for column_id, heading, width in columns:
+            self.tree.heading(column_id, text=heading)
+            self.tree.column(column_id, width=width, anchor="w")
+        self.tree.tag_configure("dirty", background="#FFF3CD")
+
+        scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.tree.bind("<Double-1>", self._on_double_click)
+        self.tree.bind("<Return>", lambda e: self._start_edit(self.tree.focus()))
+
+    def set_rows(self, rows: Iterable[Tuple[Hashable, Sequence]]):
+        """Replace every row; values follow ``columns`` and nothing is dirty"""
+        self._close_editor(commit=False)
+        self.tree.delete(*self.tree.get_children())
+        self._keys.clear()
+        self._original.clear()
+        self._dirty.clear()
+        edit_index = self.columns.index(self.edit_column)
+        for key, values in rows:
+            iid = str(key)
+            self._keys[iid] = key
+            self._original[key] = values[edit_index]
+            self.tree.insert("", "end", iid=iid, values=list(values))
+        self._changed()
+
+    def set_value(self, key: Hashable, value):
+        """Edit a row's value (as if typed); editing it back clears the mark"""
+        iid = str(key)
+        if iid not in self._keys:
+            raise KeyError(key)
+        self.tree.set(iid, self.edit_column, value)
+        if value == self._original[key]:
+            self._dirty.pop(key, None)
+            self.tree.item(iid, tags=())
+        else:
+            self._dirty[key] = value
+            self.tree.item(iid, tags=("dirty",))
+
+    def set_values(self, values: Dict[Hashable, object]):
+        for key, value in values.items():
+            self.set_value(key, value)
+        self._changed()
+
+    def changes(self) -> Dict[Hashable, object]:
+        return dict(self._dirty)
+
+    def discard(self):
+        """Put every edited row back to its original value"""
+        self._close_editor(commit=False)
+        for key in list(self._dirty):
+            self.set_value(key, self._original[key])
+        self._changed()
+
+    def mark_saved(self):
+        """Accept the edited values as the new originals"""
+        for key, value in self._dirty.items():
+            self._original[key] = value
+            self.tree.item(str(key), tags=())
+        self._dirty.clear()
+        self._changed()
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change(len(self._dirty))
+
+    # In-place editor
+
+    def _on_double_click(self, event):
+        if self.tree.identify_region(event.x, event.y) == "cell":
+            self._start_edit(self.tree.identify_row(event.y))
+
+    def _start_edit(self, iid: str):
+        if not iid:
+            return
+        self._close_editor(commit=True)
+        self.tree.see(iid)
+        self.tree.update_idletasks()
+        bbox = self.tree.bbox(iid, self.edit_column)
+        if not bbox:
+            return
+        x, y, width, height = bbox
+
+        editor = self._editor = ttk.Entry(self.tree)
+        editor.iid = iid
+        editor.insert(0, self.tree.set(iid, self.edit_column))
+        editor.select_range(0, tk.END)
+        editor.place(x=x, y=y, width=width, height=height)
+        editor.focus_set()
+        editor.bind("<Return>", lambda e: self._close_editor(commit=True))
+        editor.bind("<Escape>", lambda e: self._close_editor(commit=False))
+        editor.bind("<FocusOut>", lambda e: self._close_editor(commit=True))
+
+    def _close_editor(self, commit: bool):
+        editor, self._editor = self._editor, None
+        if editor is None:
+            return
+        if commit:
+            try:
+                value = self.parse(editor.get())
+            except ValueError:
+                # Keep the editor open on bad input
+                self._editor = editor
+                editor.bell()
+                return
+            self.set_value(self._keys[editor.iid], value)
+            self._changed()
+        editor.destroy()
+        self.tree.focus_set()
+
+
+class Sparkline(tk.Canvas):
+    """Small line chart of a series of counts, scaled to its own maximum"""
+
+    def __init__(self, parent, width: int = 220, height: int = 40,
+                 color: str = '#2196F3', **options):
+        super().__init__(parent, width=width, height=height,
+                         highlightthickness=0, **options)
+        self.color = color
+        self.values: Sequence[float] = ()
+        self.bind("<Configure>", lambda e: self._draw())
+
+    def set_values(self, values: Sequence[float]):
+        self.values = list(values)
+        self._draw()
+
+    def _draw(self):
+        self.delete("all")
+        width = self.winfo_width() if self.winfo_width() > 1 else int(self['width'])
+        height = self.winfo_height() if self.winfo_height() > 1 else int(self['height'])
+        if len(self.values) < 2:
+            return
+        top = max(self.values) or 1
+        step = (width - 4) / (len(self.values) - 1)
+        points = []
+        for i, value in enumerate(self.values):
+            points.extend((2 + i * step, height - 2 - (height - 4) * value / top))
+        self.create_line(*points, fill=self.color, width=2)
+        # Mark the latest value
+        x, y = points[-2:]
+        self.create_oval(x - 3, y - 3, x + 3, y + 3, fill=self.color, outline="")
+
+
+class SearchBox(ttk.Frame):
+    """Entry with a list of matches that follows what is typed
+
+    ``search(text)`` returns ``(key, label)`` pairs. It runs once typing
+    pauses for ``delay_ms``, so a burst of keystrokes costs one search and
+    each keystroke only moves a timer. Picking a match (click, or Enter for
+    the first one) fills in its label and calls ``on_select(key)``;
+    ``selected`` is that key until the text is edited again.
+    """
+
+    def __init__(self, parent,
+                 search: Callable[[str], Sequence[Tuple[Hashable, str]]],
+                 on_select: Callable[[Hashable], None] = None,
+                 delay_ms: int = 150,
+                 height: int = 5,
+                 font=("Helvetica", 11),
+                 width: int = 40):
+        super().__init__(parent)
+        self.search = search
+        self.on_select = on_select
+        self.delay_ms = delay_ms
+        self.selected = None
+
+        self._keys = []
+        self._job = None
+        self._filling = False
+
+        self.var = tk.StringVar()
+        self.entry = ttk.Entry(self, textvariable=self.var, font=font, width=width)
+        self.entry.pack(fill="x")
+        self.listbox = tk.Listbox(self, height=height, font=font, activestyle='none',
+                                  exportselection=False)
+        self.listbox.pack(fill="x", pady=(5, 0))
+
+        self.var.trace_add("write", self._on_type)
+        self.entry.bind("<Return>", lambda e: self._pick(0))
+        self.entry.bind("<Down>", lambda e: self._focus_list())
+        self.listbox.bind("<<ListboxSelect>>", self._on_list_select)
+        self.listbox.bind("<Return>", self._on_list_select)
+
+    def _on_type(self, *_):
+        if self._filling:
+            return
+        self.selected = None
+        if self._job is not None:
+            self.after_cancel(self._job)
+        self._job = self.after(self.delay_ms, self.update_matches)
+
+    def update_matches(self):
+        """Run the search now for the current text"""
+        self._job = None
+        matches = self.search(self.var.get())
+        self._keys = [key for key, _ in matches]
+        self.listbox.delete(0, tk.END)
+        if matches:
+            self.listbox.insert(tk.END, *(label for _, label in matches))
+
+    def _focus_list(self):
+        if self._keys:
+            self.listbox.focus_set()
+            self.listbox.selection_clear(0, tk.END)
+            self.listbox.selection_set(0)
+            self.listbox.activate(0)
+
+    def _on_list_select(self, event=None):
+        selection = self.listbox.curselection()
+        if selection:
+            self._pick(selection[0])
+
+    def _pick(self, index: int):
+        if self._job is not None:
+            # Enter pressed before the pending search ran
+            self.after_cancel(self._job)
+            self.update_matches()
+        if index >= len(self._keys):
+            return
+        self.selected = self._keys[index]
+        self._filling = True
+        try:
+            self.var.set(self.listbox.get(index))
+        finally:
+            self._filling = False
+        self.entry.icursor(tk.END)
+        if self.on_select is not None:
+            self.on_select(self.selected)
+
+    def clear(self):
+        if self._job is not None:
+            self.after_cancel(self._job)
+        self._filling = True
+        try:
+            self.var.set("")
+        finally:
+            self._filling = False
+        self.selected = None
+        self.update_matches()